@@ -1,6 +1,9 @@
 """
 TRPG 后端应用包。
 
-在 `app.main` 中创建 FastAPI 实例并挂载路由与 WebSocket。
+在 `app.main` 中创建 FastAPI 实例并挂载路由与 WebSocket；`app.boot` 为先绑定端口、后台加载 `app.main` 的启动入口。
 """
+from . import startup_profile
 
+if startup_profile.PROFILE_ENABLED:
+    startup_profile.install()
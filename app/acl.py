@@ -0,0 +1,223 @@
+"""
+频道访问控制：把 channel_store.modules 中的模组 ownerId 与子频道 userAccess 编译为按频道的查找表。
+
+- 权限为位：READ（加入频道、接收消息、读历史）、WRITE（发消息 / 掷骰）、KP（以 speakerRole="kp" 发言）；
+- 每个子频道一张表：用户键（用户 id 或用户名）→ 权限位。模组 owner 拥有全部权限；userAccess 中
+  "full" 为读写、"readonly" 为只读、"none" 为无权限；未列出的用户（含匿名连接）按 TRPG_ACL_DEFAULT（默认 full，
+  与未做权限控制时一致；设为 none 即只允许列出的用户）；模组没有 owner 时不限制 KP 身份；
+- channels 中的公共频道与不属于任何模组的频道不限制；
+- 连接 join 某频道时解析一次权限并缓存在该连接上（只缓存已加入的频道，leave / 断线时释放），
+  之后每条消息只是一次字典查找与位运算；未加入的频道每次现查，不进入缓存；
+- 发消息与掷骰共用 speak_denied：需要 WRITE，以 speakerRole="kp" 发言另需 KP；
+- 修改 owner / userAccess 须经 set_module_owner / set_user_access（或修改后调用 mark_catalog_changed）：
+  catalog_version 变化时重新编译并重新解析已缓存的权限，失去 READ 的连接经 bind 注入的回调移出频道。
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import channel_store
+
+logger = logging.getLogger(__name__)
+
+READ = 1
+WRITE = 2
+KP = 4
+ALL = READ | WRITE | KP
+
+LEVELS = {"none": 0, "readonly": READ, "full": READ | WRITE}
+ACL_DEFAULT = os.environ.get("TRPG_ACL_DEFAULT", "full")
+
+Revoke = Callable[[str, str], Awaitable[None]]
+
+
+def user_keys(user: Any) -> Tuple[str, ...]:
+    """用户在 userAccess / ownerId 中可能使用的键：用户 id 与用户名；匿名连接为空。"""
+    if user is None:
+        return ()
+    return (str(user.id), user.username)
+
+
+class _Table:
+    """单个子频道编译后的权限表。"""
+
+    __slots__ = ("bits", "default")
+
+    def __init__(self, bits: Dict[str, int], default: int) -> None:
+        self.bits = bits
+        self.default = default
+
+    def lookup(self, keys: Iterable[str]) -> int:
+        bits = self.bits
+        for key in keys:
+            found = bits.get(key)
+            if found is not None:
+                return found
+        return self.default
+
+
+class _Grant:
+    """一个连接的用户键与已加入频道的权限。"""
+
+    __slots__ = ("keys", "rights")
+
+    def __init__(self, keys: Tuple[str, ...]) -> None:
+        self.keys = keys
+        self.rights: Dict[str, int] = {}
+
+
+def compile_tables(modules: List[Dict[str, Any]], default_level: str = ACL_DEFAULT) -> Dict[str, _Table]:
+    """modules → { 子频道 id: _Table }。"""
+    default = LEVELS.get(default_level, LEVELS["full"])
+    tables: Dict[str, _Table] = {}
+    for module in modules:
+        owner = str(module.get("ownerId") or "")
+        # 没有 owner 的模组不限制 KP 身份
+        extra = 0 if owner else KP
+        for sub in module.get("subChannels") or ():
+            bits = {str(key): LEVELS.get(level, 0) | extra for key, level in (sub.get("userAccess") or {}).items()}
+            if owner:
+                bits[owner] = ALL
+            tables[str(sub["id"])] = _Table(bits, default | extra)
+    return tables
+
+
+class ChannelAcl:
+    def __init__(self) -> None:
+        self._version = -1
+        self._tables: Dict[str, _Table] = {}
+        self._grants: Dict[str, _Grant] = {}
+        self._revoke: Optional[Revoke] = None
+        self.compiles = 0
+
+    def bind(self, revoke: Revoke) -> None:
+        """注入回调 revoke(sid, channelId)：权限变更后连接失去 READ 时调用。"""
+        self._revoke = revoke
+
+    def _lookup(self, keys: Tuple[str, ...], channel_id: str) -> int:
+        table = self._tables.get(channel_id)
+        return ALL if table is None else table.lookup(keys)
+
+    def _grant(self, sid: str, user: Any) -> _Grant:
+        if self._version != channel_store.catalog_version:
+            self.refresh()
+        grant = self._grants.get(sid)
+        if grant is None:
+            grant = self._grants[sid] = _Grant(user_keys(user))
+        return grant
+
+    def rights(self, sid: str, channel_id: str, user: Any = None) -> int:
+        """连接在频道内的权限位（user 为连接 session 中的用户，匿名为 None）；已加入的频道取缓存，否则现查。"""
+        # 每条消息都会调用：版本检查与取 grant 内联
+        if self._version != channel_store.catalog_version:
+            self.refresh()
+        grant = self._grants.get(sid)
+        if grant is None:
+            grant = self._grants[sid] = _Grant(user_keys(user))
+        bits = grant.rights.get(channel_id)
+        return bits if bits is not None else self._lookup(grant.keys, channel_id)
+
+    def join(self, sid: str, channel_id: str, user: Any = None) -> int:
+        """加入频道前调用：返回权限位，有 READ 时缓存在该连接上（权限变更时随之重新解析）。"""
+        grant = self._grant(sid, user)
+        bits = grant.rights.get(channel_id)
+        if bits is None:
+            bits = self._lookup(grant.keys, channel_id)
+            if bits & READ:
+                grant.rights[channel_id] = bits
+        return bits
+
+    def leave(self, sid: str, channel_id: str) -> None:
+        grant = self._grants.get(sid)
+        if grant is not None:
+            grant.rights.pop(channel_id, None)
+
+    def check(self, user: Any, channel_id: str) -> int:
+        """不经连接缓存的权限位（REST 使用）。"""
+        if self._version != channel_store.catalog_version:
+            self.refresh()
+        return self._lookup(user_keys(user), channel_id)
+
+    def forget(self, sid: str) -> None:
+        self._grants.pop(sid, None)
+
+    def refresh(self) -> None:
+        """重新编译权限表，并重新解析各连接已缓存的权限；失去 READ 的连接交给 revoke 回调。"""
+        self._tables = compile_tables(channel_store.modules)
+        self._version = channel_store.catalog_version
+        self.compiles += 1
+        revoked: List[Tuple[str, str]] = []
+        for sid, grant in self._grants.items():
+            for channel_id, old in grant.rights.items():
+                new = grant.rights[channel_id] = self._lookup(grant.keys, channel_id)
+                if old & READ and not new & READ:
+                    revoked.append((sid, channel_id))
+        for sid, channel_id in revoked:
+            # 移出频道后不再缓存
+            self._grants[sid].rights.pop(channel_id, None)
+        if revoked and self._revoke is not None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            for sid, channel_id in revoked:
+                loop.create_task(self._send_revoke(sid, channel_id))
+
+    async def _send_revoke(self, sid: str, channel_id: str) -> None:
+        try:
+            await self._revoke(sid, channel_id)
+        except Exception:
+            logger.exception("revoking %s from channel %s failed", sid, channel_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._tables),
+            "connections": len(self._grants),
+            "compiles": self.compiles,
+        }
+
+
+channel_acl = ChannelAcl()
+
+
+def speak_denied(rights: int, speaker_role: Optional[str]) -> Optional[str]:
+    """在频道内发消息 / 掷骰的权限检查：允许时返回 None，否则返回拒绝原因。"""
+    if not rights & WRITE:
+        return "没有在该频道发言的权限"
+    if speaker_role == "kp" and not rights & KP:
+        return "只有 KP 可以以 KP 身份发言"
+    return None
+
+
+def _find_module(module_id: str) -> Optional[Dict[str, Any]]:
+    return next((m for m in channel_store.modules if m.get("id") == module_id), None)
+
+
+def set_module_owner(module_id: str, owner_id: str) -> bool:
+    """修改模组 owner（KP）；模组不存在时返回 False。"""
+    module = _find_module(module_id)
+    if module is None:
+        return False
+    module["ownerId"] = owner_id
+    channel_store.mark_catalog_changed()
+    channel_acl.refresh()
+    return True
+
+
+def set_user_access(channel_id: str, user_id: str, level: Optional[str]) -> bool:
+    """设置子频道中某用户的权限（"none" / "readonly" / "full"，None 为移除）；子频道不存在或级别无效时返回 False。"""
+    if level is not None and level not in LEVELS:
+        return False
+    for module in channel_store.modules:
+        for sub in module.get("subChannels") or ():
+            if sub.get("id") == channel_id:
+                access = sub.setdefault("userAccess", {})
+                if level is None:
+                    access.pop(user_id, None)
+                else:
+                    access[user_id] = level
+                channel_store.mark_catalog_changed()
+                channel_acl.refresh()
+                return True
+    return False
@@ -0,0 +1,117 @@
+"""
+冷启动入口：先完成 lifespan、让 uvicorn 立即绑定端口，再在后台线程中导入 app.main 并执行其启动钩子。
+
+    uvicorn app.boot:asgi_app --host 0.0.0.0 --port $PORT
+
+- 加载期间 GET /health 由本模块直接返回 200，平台健康检查与唤醒请求不必等待 FastAPI / Socket.IO 导入；
+- 其他 HTTP 与 WebSocket 请求等待加载完成后原样转交 app.main:asgi_app，加载失败时返回 503；
+- 关闭时先结束 app.main 的 lifespan（写快照、落库等），再通知 uvicorn。
+
+本模块只依赖标准库，行为与直接运行 app.main:asgi_app 一致，只是启动阶段的耗时移到了端口绑定之后。
+"""
+import asyncio
+import importlib
+import logging
+from typing import Any, Optional
+
+from . import startup_profile
+
+logger = logging.getLogger(__name__)
+
+TARGET_MODULE = "app.main"
+TARGET_ATTR = "asgi_app"
+
+_HEALTH_BODY = b'{"status":"ok"}'
+_UNAVAILABLE_BODY = '{"ok":false,"message":"服务启动失败"}'.encode("utf-8")
+
+
+class LazyApp:
+    def __init__(self) -> None:
+        self._app: Any = None
+        self._ready: Optional[asyncio.Event] = None
+        self._loader: Optional["asyncio.Task[None]"] = None
+        # app.main 的 lifespan：任务与双向消息队列
+        self._inner: Optional["asyncio.Task[None]"] = None
+        self._inner_receive: Optional[asyncio.Queue] = None
+        self._inner_send: Optional[asyncio.Queue] = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if self._app is None:
+            if scope["type"] == "http" and scope["path"] == "/health":
+                await _respond(send, 200, _HEALTH_BODY)
+                return
+            if self._ready is None:
+                # 未经 lifespan 启动（如测试客户端）时就地加载
+                self._start_loading()
+            await self._ready.wait()
+            if self._app is None:
+                if scope["type"] == "http":
+                    await _respond(send, 503, _UNAVAILABLE_BODY)
+                else:
+                    await send({"type": "websocket.close", "code": 1011})
+                return
+        await self._app(scope, receive, send)
+
+    def _start_loading(self) -> None:
+        self._ready = asyncio.Event()
+        self._loader = asyncio.create_task(self._load())
+
+    async def _load(self) -> None:
+        try:
+            module = await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, TARGET_MODULE)
+            app = getattr(module, TARGET_ATTR)
+            self._inner_receive = asyncio.Queue()
+            self._inner_send = asyncio.Queue()
+            self._inner = asyncio.create_task(
+                app(
+                    {"type": "lifespan", "asgi": {"version": "3.0", "spec_version": "2.0"}, "state": {}},
+                    self._inner_receive.get,
+                    self._inner_send.put,
+                )
+            )
+            await self._inner_receive.put({"type": "lifespan.startup"})
+            message = await self._inner_send.get()
+            if message["type"] != "lifespan.startup.complete":
+                raise RuntimeError(message.get("message") or "lifespan startup failed")
+            self._app = app
+        except Exception:
+            logger.exception("failed to load %s:%s", TARGET_MODULE, TARGET_ATTR)
+        finally:
+            self._ready.set()
+
+    async def _lifespan(self, receive, send) -> None:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            self._start_loading()
+            startup_profile.mark("port ready (boot)")
+            await send({"type": "lifespan.startup.complete"})
+            message = await receive()
+        if message["type"] == "lifespan.shutdown":
+            if self._loader is not None:
+                await self._loader
+            if self._app is not None and self._inner is not None:
+                await self._inner_receive.put({"type": "lifespan.shutdown"})
+                await self._inner_send.get()
+                await self._inner
+            await send({"type": "lifespan.shutdown.complete"})
+
+    @property
+    def ready(self) -> bool:
+        return self._app is not None
+
+
+async def _respond(send, status: int, body: bytes) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+asgi_app = LazyApp()
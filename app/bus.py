@@ -0,0 +1,307 @@
+"""
+进程间消息总线：让多个 uvicorn worker 共享 Socket.IO 房间、原始 WebSocket 房间与频道历史。
+
+- LocalBus：单进程（默认），publish 直接在本进程分发，行为与未引入总线时一致；
+- UnixSocketBus：同一台机器上的多个 worker 通过 Unix socket 互联。抢到锁文件的 worker
+  绑定 socket 文件成为中转（broker），其余 worker 连接它；每个 worker（包括 broker 自己）
+  都以客户端身份收发。broker 按到达顺序把每帧转发给所有客户端（包括发送方），
+  因此所有 worker 看到的同一 topic 消息顺序完全一致。
+  经 sequence 登记的 topic（聊天消息）由 broker 统一编号：按 payload[key] 分组写入 payload["seq"]，
+  各 worker 连上 broker 时先上报本地各组的下一个编号，broker 取最大值续编，
+  因此晚启动或重启的 worker 与其他 worker 使用同一套 seq。
+
+通过环境变量 TRPG_BUS 选择：`local`（默认）或 `unix:///tmp/trpg-bus.sock`。
+订阅回调签名为 `async def handler(payload, local)`，local 表示消息由本 worker 发出。
+"""
+import abc
+import asyncio
+import json
+import logging
+import os
+import struct
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any, bool], Awaitable[None]]
+# 本 worker 各组的下一个编号
+SeqState = Callable[[], Dict[str, int]]
+
+_HEADER = struct.Struct("!I")
+
+
+class MessageBus(abc.ABC):
+    """发布/订阅总线基类：按 topic 分发给本进程内的订阅者。"""
+
+    def __init__(self) -> None:
+        self.host_id = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = {}
+        # topic → (分组字段, 本 worker 的编号状态)
+        self._sequenced: Dict[str, Tuple[str, SeqState]] = {}
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def sequence(self, topic: str, key: str, state: SeqState) -> None:
+        """
+        登记需要跨 worker 统一编号的 topic：payload 为 dict，按 payload[key] 分组。
+        跨进程时订阅者收到的 payload["seq"] 为统一分配的编号；单进程时不写入，由订阅者自行编号。
+        """
+        self._sequenced[topic] = (key, state)
+
+    @abc.abstractmethod
+    async def publish(self, topic: str, payload: Any) -> None:
+        """发布一条消息；所有订阅者（包括本 worker）都会收到。"""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @property
+    def distributed(self) -> bool:
+        """是否跨进程分发；为 False 时无需为 Socket.IO 配置跨进程 client manager。"""
+        return False
+
+    async def _dispatch(self, topic: str, payload: Any, local: bool) -> None:
+        for handler in self._handlers.get(topic, ()):
+            try:
+                await handler(payload, local)
+            except Exception:
+                logger.exception("bus handler for %s failed", topic)
+
+
+class LocalBus(MessageBus):
+    """单进程总线。"""
+
+    async def publish(self, topic: str, payload: Any) -> None:
+        await self._dispatch(topic, payload, True)
+
+
+class UnixSocketBus(MessageBus):
+    """同机多 worker 总线，见模块说明。"""
+
+    def __init__(self, path: str, reconnect_delay: float = 0.5) -> None:
+        super().__init__()
+        self.path = path
+        self.reconnect_delay = reconnect_delay
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lock_fd: Optional[int] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # broker 为 sequence 登记的 topic 分配编号：topic → {分组: 下一个编号}
+        self._next_seq: Dict[str, Dict[str, int]] = {}
+        self._seq_prefixes: Tuple[bytes, ...] = ()
+
+    @property
+    def distributed(self) -> bool:
+        return True
+
+    @property
+    def is_broker(self) -> bool:
+        return self._server is not None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._connected = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        await self._connected.wait()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers):
+                peer.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def publish(self, topic: str, payload: Any) -> None:
+        assert self._connected is not None, "bus not started"
+        await self._connected.wait()
+        writer = self._writer
+        assert writer is not None
+        writer.write(self._frame(topic, payload))
+        await writer.drain()
+
+    def _frame(self, topic: str, payload: Any) -> bytes:
+        body = json.dumps({"t": topic, "o": self.host_id, "p": payload}, ensure_ascii=False).encode()
+        return _HEADER.pack(len(body)) + body
+
+    # ----- broker -----
+
+    async def _become_broker(self) -> bool:
+        """
+        用 socket 文件旁的锁文件选举 broker：拿到排他锁的进程绑定 socket（顺带清理遗留文件）。
+        锁随进程退出自动释放，其余 worker 重连时会重新选举。
+        """
+        import fcntl
+
+        fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        self._next_seq = {}
+        topics = (_SEQ_TOPIC, *self._sequenced)
+        self._seq_prefixes = tuple(f'{{"t": {json.dumps(t, ensure_ascii=False)},'.encode() for t in topics)
+        self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path)
+        return True
+
+    def _assign_seq(self, frame: bytes) -> Optional[bytes]:
+        """
+        broker 处理编号相关的帧：上报帧（topic _SEQ_TOPIC）合并进编号状态，不转发，返回 None；
+        sequence 登记的 topic 写入 payload["seq"] 后重新编码；其他帧原样返回。
+        """
+        # 帧体以 {"t": "<topic>", 开头（json.dumps 按插入顺序输出），按前缀判断，不需编号的帧不解析
+        if not frame.startswith(self._seq_prefixes, _HEADER.size):
+            return frame
+        msg = json.loads(frame[_HEADER.size :])
+        topic = msg["t"]
+        if topic == _SEQ_TOPIC:
+            for name, groups in msg["p"].items():
+                counters = self._next_seq.setdefault(name, {})
+                for group, value in groups.items():
+                    counters[group] = max(counters.get(group, 0), int(value))
+            return None
+        sequenced = self._sequenced.get(topic)
+        if sequenced is None or not isinstance(msg["p"], dict):
+            return frame
+        payload = msg["p"]
+        group = str(payload.get(sequenced[0]) or "general")
+        counters = self._next_seq.setdefault(topic, {})
+        payload["seq"] = counters.get(group, 0)
+        counters[group] = payload["seq"] + 1
+        body = json.dumps(msg, ensure_ascii=False).encode()
+        return _HEADER.pack(len(body)) + body
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._peers.add(writer)
+        try:
+            while True:
+                frame = await _read_frame(reader)
+                if frame is None:
+                    break
+                frame = self._assign_seq(frame)
+                if frame is None:
+                    continue
+                for peer in list(self._peers):
+                    try:
+                        peer.write(frame)
+                    except Exception:
+                        self._peers.discard(peer)
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    # ----- client -----
+
+    async def _run(self) -> None:
+        assert self._connected is not None
+        while True:
+            try:
+                if self._server is None:
+                    await self._become_broker()
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            if self._sequenced:
+                # 先上报本地编号状态，再允许 publish：broker 处理本连接的消息之前已知道本 worker 的进度
+                state = {topic: state() for topic, (_, state) in self._sequenced.items()}
+                self._writer.write(self._frame(_SEQ_TOPIC, state))
+            self._connected.set()
+            try:
+                while True:
+                    frame = await _read_frame(reader)
+                    if frame is None:
+                        break
+                    msg = json.loads(frame[_HEADER.size :])
+                    await self._dispatch(msg["t"], msg["p"], msg["o"] == self.host_id)
+            finally:
+                # broker 退出：断线期间 publish 会等待重连
+                self._connected.clear()
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+            logger.warning("bus connection lost, reconnecting")
+            await asyncio.sleep(self.reconnect_delay)
+
+
+# worker 向 broker 上报编号状态的内部 topic
+_SEQ_TOPIC = "bus.seq"
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Optional[bytes]:
+    """读取一帧（含长度头），连接关闭时返回 None。"""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+        (length,) = _HEADER.unpack(header)
+        return header + await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        return None
+
+
+class BusClientManager(AsyncPubSubManager):
+    """python-socketio 的跨进程 client manager：emit / enter_room 等经由 MessageBus 同步到其他 worker。"""
+
+    name = "trpg-bus"
+
+    def __init__(self, message_bus: MessageBus, channel: str = "socketio") -> None:
+        super().__init__(channel=channel)
+        self.bus = message_bus
+        self._inbox: Optional[asyncio.Queue] = None
+        message_bus.subscribe(channel, self._on_bus_message)
+
+    def initialize(self) -> None:
+        # 在事件循环内创建队列（由 AsyncServer 首次建立连接时调用）
+        self._inbox = asyncio.Queue()
+        super().initialize()
+
+    async def _on_bus_message(self, payload: Any, local: bool) -> None:
+        # 本进程发出的消息已在本地处理过（AsyncPubSubManager 也会按 host_id 跳过）
+        if not local and self._inbox is not None:
+            self._inbox.put_nowait(payload)
+
+    async def _publish(self, data: Any) -> None:
+        await self.bus.publish(self.channel, data)
+
+    async def _listen(self):
+        assert self._inbox is not None
+        while True:
+            yield await self._inbox.get()
+
+
+def create_bus(url: str) -> MessageBus:
+    if not url or url == "local":
+        return LocalBus()
+    if url.startswith("unix://"):
+        return UnixSocketBus(url[len("unix://") :])
+    raise ValueError(f"unsupported TRPG_BUS: {url}")
+
+
+bus = create_bus(os.environ.get("TRPG_BUS", "local"))
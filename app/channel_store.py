@@ -2,9 +2,42 @@
 频道与历史消息的内存存储。
 GET /api/channels 使用 channels + modules；
 GET /api/channels/:id/messages 使用 _messages_by_channel；
-Socket 收到 message 时调用 append_message 写入历史。
+Socket 收到 message 时调用 append_message 写入历史，并为消息分配频道内单调递增的序号 seq（从 0 开始）；
+重连时 join 带上 lastSeq，由 get_messages_since 补发缺失的消息。
+每个频道的历史为热尾 + 压缩冷块（见 history.ChannelHistory），容量由环境变量 TRPG_HISTORY_CAPACITY 配置。
+设置 TRPG_DATABASE_URL 后开启 SQLite 持久化（见 persistence.py）：内存缓冲保存最新消息，更早的分页回落到数据库。
 """
-from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .history import ChannelHistory
+from .message_record import MessageRecord
+from .search import drop_index, index_message
+from .snapshot import LazyDict
+
+if TYPE_CHECKING:
+    from .persistence import MessagePersistence
+
+logger = logging.getLogger(__name__)
+
+# 单频道内存中最多保留的消息条数，超出后淘汰最旧的消息
+HISTORY_CAPACITY = int(os.environ.get("TRPG_HISTORY_CAPACITY", "50000"))
+# 以 dict 形式保留的最新消息条数；更早的消息每 HISTORY_BLOCK_SIZE 条压缩为一个冷块
+HISTORY_HOT_SIZE = int(os.environ.get("TRPG_HISTORY_HOT", "1000"))
+HISTORY_BLOCK_SIZE = int(os.environ.get("TRPG_HISTORY_BLOCK", "256"))
+
+# join 时单次补发的最多消息条数，缺失更多时只补发最新的部分（truncated），更早的由客户端按 REST 分页拉取
+RESUME_LIMIT = int(os.environ.get("TRPG_RESUME_LIMIT", "500"))
+
+# 导出时每次读取的消息条数（与冷块大小一致时每次只解压一个冷块）
+EXPORT_CHUNK = int(os.environ.get("TRPG_EXPORT_CHUNK", "256"))
+
+# 持久化配置；DATABASE_URL 为空时仅内存存储
+DATABASE_URL = os.environ.get("TRPG_DATABASE_URL", "")
+DB_BATCH_SIZE = int(os.environ.get("TRPG_DB_BATCH_SIZE", "200"))
+DB_FLUSH_INTERVAL = float(os.environ.get("TRPG_DB_FLUSH_INTERVAL", "0.5"))
 
 # 公共频道列表（大厅等），与前端 channels 一致
 channels = [
@@ -33,33 +66,202 @@ modules = [
     },
 ]
 
-# 按 channelId 存储消息列表，每条与 Socket message 结构一致
-_messages_by_channel: Dict[str, List[Dict[str, Any]]] = {}
+# channels / modules 的版本号：修改两者后须调用 mark_catalog_changed，使 GET /api/channels 的缓存失效
+catalog_version = 0
+
+
+def mark_catalog_changed() -> None:
+    global catalog_version
+    catalog_version += 1
+
+
+# 按 channelId 存储历史，每条与 Socket message 结构一致；从快照恢复时按频道延迟解码
+_messages_by_channel: Dict[str, ChannelHistory] = LazyDict()
+
+
+def _new_history(start: int = 0) -> ChannelHistory:
+    return ChannelHistory(HISTORY_CAPACITY, start=start, hot_size=HISTORY_HOT_SIZE, block_size=HISTORY_BLOCK_SIZE)
+
+
+def _history(channel_id: str) -> ChannelHistory:
+    history = _messages_by_channel.get(channel_id)
+    if history is None:
+        history = _messages_by_channel[channel_id] = _new_history()
+    return history
+
+
+_persistence: Optional["MessagePersistence"] = None
+
+
+async def start_persistence(url: Optional[str] = None) -> None:
+    """应用启动时调用：连接数据库、恢复各频道最新消息并启动后台批量写入任务。"""
+    global _persistence
+    url = url or DATABASE_URL
+    if not url or _persistence is not None:
+        return
+    from .persistence import MessagePersistence
+
+    _persistence = MessagePersistence(url, batch_size=DB_BATCH_SIZE, flush_interval=DB_FLUSH_INTERVAL)
+    for channel_id, start, msgs in _persistence.load_tails(HISTORY_CAPACITY):
+        history = _new_history(start)
+        for msg in msgs:
+            history.append(msg)
+        _messages_by_channel[channel_id] = history
+    await _persistence.start()
 
 
-def append_message(data: Dict[str, Any]) -> None:
-    """Socket 收到 message 时调用，写入对应频道历史。"""
+async def stop_persistence() -> None:
+    """应用关闭时调用：写完剩余消息。"""
+    global _persistence
+    if _persistence is None:
+        return
+    persistence, _persistence = _persistence, None
+    await persistence.close()
+
+
+def append_message(data: Dict[str, Any], persist: bool = True, seq: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Socket 收到 message 时调用，以紧凑的 MessageRecord 写入对应频道历史，返回还原的 dict（带 seq）用于推送；
+    开启持久化时加入批量写入队列。
+    多 worker 下每个 worker 都保存一份历史，persist 为 False 表示由其他 worker 负责落库；
+    seq 为总线 broker 统一分配的序号（见 bus.py），与本地历史接不上时以该序号重新开始本频道的内存历史。
+    """
     channel_id = (data.get("channelId") or "general") or "general"
-    if channel_id not in _messages_by_channel:
-        _messages_by_channel[channel_id] = []
-    # 避免直接引用，复制一份
-    msg = dict(data)
-    if "id" not in msg and "id" in data:
-        msg["id"] = data["id"]
-    _messages_by_channel[channel_id].append(msg)
-
-
-def get_messages(channel_id: str, limit: int = 50, before: Optional[str] = None) -> List[Dict[str, Any]]:
-    """按 channelId 取历史消息，支持 limit 与 before（msgId）分页。"""
-    list_ = _messages_by_channel.get(channel_id, [])
-    # 按 time 或顺序，before 表示取该 id 之前的消息
-    if before:
-        for i, m in enumerate(list_):
-            if m.get("id") == before:
-                list_ = list_[max(0, i - limit) : i]
-                break
+    record = MessageRecord.from_wire(data)
+    history = _history(channel_id)
+    if seq is not None and seq != history.end:
+        history = _rebase(channel_id, history, seq)
+    history.append(record)
+    index_message(channel_id, record.seq, record.get("content"), history.start)
+    msg = record.to_wire()
+    if persist and _persistence is not None:
+        _persistence.enqueue(channel_id, msg["seq"], msg)
+    return msg
+
+
+def _rebase(channel_id: str, history: ChannelHistory, seq: int) -> ChannelHistory:
+    """
+    本地历史与统一序号接不上：晚启动的 worker 缺少之前的消息（seq 更大），或 broker 切换时短暂分歧（seq 更小）。
+    内存历史从 seq 重新开始，更早的部分以数据库为准（未开启持久化时按已淘汰处理），搜索索引随之重建。
+    """
+    if len(history) and seq < history.end:
+        logger.warning("channel %s history diverged from bus seq (%d < %d), rebasing", channel_id, seq, history.end)
+    history = _messages_by_channel[channel_id] = _new_history(seq)
+    drop_index(channel_id)
+    return history
+
+
+def seq_state() -> Dict[str, int]:
+    """各频道下一条消息的 seq（连接总线 broker 时上报）；快照中尚未解码的频道会在此解码。"""
+    return {channel_id: history.end for channel_id, history in _messages_by_channel.items()}
+
+
+def _fill_seq(messages: List[Dict[str, Any]], lo: int) -> List[Dict[str, Any]]:
+    # 分配 seq 之前写入（快照、数据库中）的旧消息按位置补上
+    for offset, msg in enumerate(messages):
+        if "seq" not in msg:
+            msg["seq"] = lo + offset
+    return messages
+
+
+def _read_range(channel_id: str, history: Optional[ChannelHistory], lo: int, end: int) -> List[Dict[str, Any]]:
+    """序号区间 [lo, end)：内存缓冲覆盖不到的更早部分从数据库读取。"""
+    lo = max(0, lo)
+    mem_start = history.start if history is not None else end
+    older = []
+    if _persistence is not None and lo < mem_start:
+        older = _persistence.fetch_range(channel_id, lo, min(end, mem_start))
+    if history is None:
+        return _fill_seq(older, lo)
+    if not older:
+        lo = max(lo, history.start)
+    return _fill_seq(older + history.slice(lo, end), lo)
+
+
+def next_seq(channel_id: str) -> int:
+    """频道下一条消息将获得的 seq（即已写入总数）。"""
+    history = _messages_by_channel.get(channel_id)
+    return history.end if history is not None else 0
+
+
+async def get_messages(channel_id: str, limit: int = 50, before: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    按 channelId 取历史消息，支持 limit 与 before（msgId）分页；before 找不到时返回最新一页。
+    内存缓冲覆盖不到的更早部分在线程池中从数据库读取（与 iter_messages 相同），不阻塞事件循环。
+    """
+    loop = asyncio.get_running_loop()
+    history = _messages_by_channel.get(channel_id)
+    end = history.end if history is not None else 0
+    if before is not None:
+        pos = history.position(before) if history is not None else None
+        if pos is None and _persistence is not None:
+            pos = await loop.run_in_executor(None, _persistence.position, channel_id, before)
+        if pos is not None:
+            end = pos
+        # 等待期间可能有新消息写入或淘汰，重新取一次
+        history = _messages_by_channel.get(channel_id)
+    lo = max(0, end - limit)
+    mem_start = history.start if history is not None else end
+    # 内存部分先同步取出，再等待数据库部分
+    recent = history.slice(max(lo, mem_start), end) if history is not None and end > mem_start else []
+    older: List[Dict[str, Any]] = []
+    if _persistence is not None and lo < mem_start:
+        older = await loop.run_in_executor(None, _persistence.fetch_range, channel_id, lo, min(end, mem_start))
+    if not older:
+        lo = max(lo, mem_start)
+    return _fill_seq(older + recent, lo)
+
+
+def get_messages_since(
+    channel_id: str, last_seq: int, limit: int = RESUME_LIMIT, upto: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    seq 大于 last_seq（且小于 upto，默认到最新）的消息（重连补发），返回 (messages, truncated)。
+    缺失超过 limit 条、或更早的部分已被淘汰时 truncated 为 True，只返回能提供的最新部分。
+    """
+    history = _messages_by_channel.get(channel_id)
+    end = history.end if history is not None else 0
+    if last_seq >= end:
+        # 客户端的 seq 比服务端还新：服务端历史已重置（未启用快照或持久化时重启），按全新客户端处理
+        last_seq = -1
+    if upto is not None:
+        end = min(end, upto)
+    lo = max(last_seq + 1, end - limit)
+    messages = _read_range(channel_id, history, lo, end)
+    first = messages[0]["seq"] if messages else end
+    return messages, first > max(last_seq + 1, 0)
+
+
+def get_history_stats() -> Dict[str, Dict[str, int]]:
+    """各频道历史容量、当前条数、热尾与冷块大小、累计写入与淘汰条数（只含已解码的频道，不触发快照解码）。"""
+    return {cid: h.stats() for cid, h in _messages_by_channel.loaded_items()}
+
+
+async def iter_messages(
+    channel_id: str, lo: int = 0, hi: Optional[int] = None, chunk: int = EXPORT_CHUNK
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    按 seq 升序逐块读取 [lo, hi)（hi 默认为开始时的最新 seq + 1），每次只持有一块，供导出等全量遍历使用。
+    内存中已淘汰的部分在线程池中从数据库读取；未开启持久化时跳过已淘汰的部分。
+    在事件循环内迭代，块之间让出一次，长导出不会阻塞其他请求。
+    """
+    end = next_seq(channel_id)
+    hi = end if hi is None else min(hi, end)
+    pos = max(0, lo)
+    loop = asyncio.get_running_loop()
+    while pos < hi:
+        stop = min(pos + chunk, hi)
+        history = _messages_by_channel.get(channel_id)
+        mem_start = history.start if history is not None else hi
+        if pos < mem_start:
+            if _persistence is None:
+                pos = mem_start
+                continue
+            stop = min(stop, mem_start)
+            batch = await loop.run_in_executor(None, _persistence.fetch_range, channel_id, pos, stop)
         else:
-            list_ = list_[-limit:] if len(list_) > limit else list_
-    else:
-        list_ = list_[-limit:] if len(list_) > limit else list_
-    return list_
+            batch = history.slice(pos, stop, cache=False)
+        if batch:
+            yield _fill_seq(batch, pos)
+        pos = stop
+        await asyncio.sleep(0)
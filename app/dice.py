@@ -0,0 +1,431 @@
+"""
+服务端掷骰引擎：表达式解析、批量掷骰与 COC 7th 技能检定。
+
+表达式语法（不区分大小写，忽略空白）：
+- 骰子：NdM（如 3d6），N 省略时为 1；d% 等同 d100；
+- 奖励骰 / 惩罚骰：d100b2、d100p1（b/p 后数字省略时为 1，只用于单个 d100）；
+- 四则运算与括号：3d6*5、2d10+1d4、(2d6+6)*5、1d6/2（除法向下取整）。
+
+解析结果为不可变的 Expression，按规范化后的表达式文本缓存在 LRU 中，重复掷同一表达式不再解析。
+Expression.roll() 掷一次并给出过程文本；roll_many(n) 对每个骰子节点一次性生成 n 组点数（装有 numpy
+时用 numpy 整块生成并求和，否则用一次 random.choices 生成整批），适合 KP 批量掷骰 / 批量检定。
+"""
+import random
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as _np
+except ImportError:  # numpy 为可选依赖，缺失时用纯 Python 批量生成
+    _np = None
+
+MAX_EXPRESSION_LENGTH = 200
+# 单次掷骰（一个表达式）最多的骰子数与单骰面数
+MAX_DICE = 1000
+MAX_SIDES = 10000
+# 批量掷骰次数上限，以及批量时 次数 × 每次骰子数 的上限
+MAX_TIMES = 10000
+MAX_BATCH_DICE = 1000000
+
+# 以系统熵播种；结果只在服务端生成，客户端无法自行指定点数
+_rng = random.Random()
+_np_rng = _np.random.default_rng() if _np is not None else None
+
+
+class DiceError(Exception):
+    """表达式无效或超出限制。status 为建议的 HTTP 状态码。"""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# ----- 掷骰原语 -----
+
+
+def _sums(count: int, sides: int, times: int) -> List[int]:
+    """times 组、每组 count 个 sides 面骰的点数和。"""
+    if _np_rng is not None:
+        return _np_rng.integers(1, sides + 1, size=(times, count)).sum(axis=1).tolist()
+    values = _rng.choices(range(1, sides + 1), k=times * count)
+    if count == 1:
+        return values
+    return [sum(values[i : i + count]) for i in range(0, len(values), count)]
+
+
+def _d100(extra: int, bonus: bool, times: int) -> Tuple[List[int], List[List[int]]]:
+    """
+    times 次带 extra 个奖励（bonus=True）/ 惩罚骰的 d100。
+    个位骰一次，十位骰 1 + extra 次，取最小（奖励）或最大（惩罚）的十位；00 + 0 记为 100。
+    返回 (结果列表, 每次的十位骰列表)。
+    """
+    units = _rng.choices(range(10), k=times)
+    tens_flat = _rng.choices(range(10), k=times * (1 + extra))
+    pick = min if bonus else max
+    results: List[int] = []
+    tens_groups: List[List[int]] = []
+    for i in range(times):
+        tens = tens_flat[i * (1 + extra) : (i + 1) * (1 + extra)]
+        # 十位与个位同为 0 时为 100，比较时按 100 计入
+        candidates = [t * 10 + units[i] or 100 for t in tens]
+        results.append(pick(candidates))
+        tens_groups.append(tens)
+    return results, tens_groups
+
+
+# ----- 表达式节点 -----
+
+
+class _Node:
+    __slots__ = ()
+    dice = 0
+
+    def roll(self) -> Tuple[int, str]:
+        raise NotImplementedError
+
+    def roll_many(self, times: int) -> List[int]:
+        raise NotImplementedError
+
+
+class _Number(_Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+    def roll(self) -> Tuple[int, str]:
+        return self.value, str(self.value)
+
+    def roll_many(self, times: int) -> List[int]:
+        return [self.value] * times
+
+
+class _Dice(_Node):
+    __slots__ = ("count", "sides", "dice")
+
+    def __init__(self, count: int, sides: int) -> None:
+        self.count = count
+        self.sides = sides
+        self.dice = count
+
+    def roll(self) -> Tuple[int, str]:
+        values = _rng.choices(range(1, self.sides + 1), k=self.count)
+        total = sum(values)
+        if self.count == 1:
+            return total, str(total)
+        return total, "[" + "+".join(map(str, values)) + "]"
+
+    def roll_many(self, times: int) -> List[int]:
+        return _sums(self.count, self.sides, times)
+
+
+class _BonusDice(_Node):
+    """d100 带奖励 / 惩罚骰。"""
+
+    __slots__ = ("extra", "bonus", "dice")
+
+    def __init__(self, extra: int, bonus: bool) -> None:
+        self.extra = extra
+        self.bonus = bonus
+        self.dice = 2 + extra
+
+    def roll(self) -> Tuple[int, str]:
+        results, tens = _d100(self.extra, self.bonus, 1)
+        label = "奖励骰" if self.bonus else "惩罚骰"
+        return results[0], f"{results[0]}[{label}:{','.join(str(t * 10) for t in tens[0])}]"
+
+    def roll_many(self, times: int) -> List[int]:
+        return _d100(self.extra, self.bonus, times)[0]
+
+
+def _apply(op: str, a: int, b: int) -> int:
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b
+    if op == "*":
+        return a * b
+    if b == 0:
+        raise DiceError("除数为 0")
+    return a // b
+
+
+class _BinOp(_Node):
+    __slots__ = ("op", "left", "right", "dice")
+
+    def __init__(self, op: str, left: _Node, right: _Node) -> None:
+        self.op = op
+        self.left = left
+        self.right = right
+        self.dice = left.dice + right.dice
+
+    def roll(self) -> Tuple[int, str]:
+        a, a_text = self.left.roll()
+        b, b_text = self.right.roll()
+        return _apply(self.op, a, b), f"{a_text}{self.op}{b_text}"
+
+    def roll_many(self, times: int) -> List[int]:
+        op = self.op
+        return [_apply(op, a, b) for a, b in zip(self.left.roll_many(times), self.right.roll_many(times))]
+
+
+class _Neg(_Node):
+    __slots__ = ("operand", "dice")
+
+    def __init__(self, operand: _Node) -> None:
+        self.operand = operand
+        self.dice = operand.dice
+
+    def roll(self) -> Tuple[int, str]:
+        value, text = self.operand.roll()
+        return -value, "-" + text
+
+    def roll_many(self, times: int) -> List[int]:
+        return [-v for v in self.operand.roll_many(times)]
+
+
+class _Group(_Node):
+    __slots__ = ("inner", "dice")
+
+    def __init__(self, inner: _Node) -> None:
+        self.inner = inner
+        self.dice = inner.dice
+
+    def roll(self) -> Tuple[int, str]:
+        value, text = self.inner.roll()
+        return value, "(" + text + ")"
+
+    def roll_many(self, times: int) -> List[int]:
+        return self.inner.roll_many(times)
+
+
+# ----- 解析 -----
+
+_TOKEN = re.compile(r"\d+|d%|[dbp()+\-*/]")
+
+
+class _Parser:
+    def __init__(self, text: str) -> None:
+        self.tokens = _TOKEN.findall(text)
+        if "".join(self.tokens) != text:
+            raise DiceError(f"无法识别的表达式：{text}")
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self) -> _Node:
+        node = self.expr()
+        if self.peek() is not None:
+            raise DiceError(f"多余的内容：{''.join(self.tokens[self.pos:])}")
+        return node
+
+    def expr(self) -> _Node:
+        node = self.term()
+        while self.peek() in ("+", "-"):
+            op = self.take()
+            node = _BinOp(op, node, self.term())
+        return node
+
+    def term(self) -> _Node:
+        node = self.factor()
+        while self.peek() in ("*", "/"):
+            op = self.take()
+            node = _BinOp(op, node, self.factor())
+        return node
+
+    def factor(self) -> _Node:
+        token = self.peek()
+        if token is None:
+            raise DiceError("表达式不完整")
+        if token == "-":
+            self.take()
+            return _Neg(self.factor())
+        if token == "(":
+            self.take()
+            inner = self.expr()
+            if self.peek() != ")":
+                raise DiceError("括号不匹配")
+            self.take()
+            return _Group(inner)
+        if token.isdigit():
+            self.take()
+            if self.peek() in ("d", "d%"):
+                return self.dice(int(token))
+            return _Number(int(token))
+        if token in ("d", "d%"):
+            return self.dice(1)
+        raise DiceError(f"意外的符号：{token}")
+
+    def dice(self, count: int) -> _Node:
+        token = self.take()
+        if token == "d%":
+            sides = 100
+        elif self.peek() is not None and self.peek().isdigit():
+            sides = int(self.take())
+        else:
+            raise DiceError("缺少骰子面数")
+        if count < 1 or count > MAX_DICE:
+            raise DiceError(f"骰子个数须在 1～{MAX_DICE} 之间")
+        if sides < 1 or sides > MAX_SIDES:
+            raise DiceError(f"骰子面数须在 1～{MAX_SIDES} 之间")
+        if self.peek() in ("b", "p"):
+            bonus = self.take() == "b"
+            extra = int(self.take()) if self.peek() is not None and self.peek().isdigit() else 1
+            if count != 1 or sides != 100:
+                raise DiceError("奖励骰 / 惩罚骰只能用于 1d100")
+            if extra < 1 or extra > 10:
+                raise DiceError("奖励骰 / 惩罚骰个数须在 1～10 之间")
+            return _BonusDice(extra, bonus)
+        return _Dice(count, sides)
+
+
+class Expression:
+    """已解析的掷骰表达式，可反复掷。"""
+
+    __slots__ = ("text", "root", "dice")
+
+    def __init__(self, text: str, root: _Node) -> None:
+        self.text = text
+        self.root = root
+        self.dice = root.dice
+
+    def roll(self) -> Dict[str, Any]:
+        """掷一次：{ expression, total, detail }，detail 形如 3d6*5=[2+4+5]*5=55。"""
+        total, text = self.root.roll()
+        detail = f"{self.text}={text}" if text != self.text else self.text
+        if text != str(total):
+            detail += f"={total}"
+        return {"expression": self.text, "total": total, "detail": detail}
+
+    def roll_many(self, times: int) -> List[int]:
+        """掷 times 次，只返回每次的结果。"""
+        if times < 1 or times > MAX_TIMES:
+            raise DiceError(f"批量次数须在 1～{MAX_TIMES} 之间")
+        if times * self.dice > MAX_BATCH_DICE:
+            raise DiceError("批量掷骰的骰子总数过多")
+        return self.root.roll_many(times)
+
+
+def _normalize(text: str) -> str:
+    return "".join(text.split()).lower()
+
+
+@lru_cache(maxsize=1024)
+def _compile(text: str) -> Expression:
+    root = _Parser(text).parse()
+    if root.dice > MAX_DICE:
+        raise DiceError(f"单次掷骰最多 {MAX_DICE} 个骰子")
+    return Expression(text, root)
+
+
+def compile_expression(text: Any) -> Expression:
+    """解析表达式（带缓存）；无效时抛出 DiceError。"""
+    if not isinstance(text, str) or not text.strip():
+        raise DiceError("缺少掷骰表达式")
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise DiceError("表达式过长")
+    return _compile(_normalize(text))
+
+
+# ----- COC 7th 检定 -----
+
+# 属性别名 → 角色卡字段
+_ATTRIBUTES = {
+    "力量": "str",
+    "str": "str",
+    "敏捷": "dex",
+    "dex": "dex",
+    "体型": "siz",
+    "siz": "siz",
+    "外貌": "app",
+    "app": "app",
+    "体质": "con",
+    "con": "con",
+    "智力": "int",
+    "灵感": "int",
+    "int": "int",
+    "意志": "pow",
+    "pow": "pow",
+    "教育": "edu",
+    "edu": "edu",
+    "幸运": "luc",
+    "luc": "luc",
+    "理智": "sanCurrent",
+    "san": "sanCurrent",
+}
+# 技能条目中表示最终技能值的字段，依次尝试；都没有时把各来源点数相加
+_SKILL_TOTAL_KEYS = ("total", "value", "current")
+_SKILL_PART_KEYS = ("base", "occupation", "interest", "growth")
+
+
+def _as_int(value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    return None
+
+
+def skill_value(character: Dict[str, Any], name: str) -> Optional[int]:
+    """从角色卡取技能或属性值（属性支持中文名，如 力量 / 理智）；找不到时返回 None。"""
+    key = name.strip()
+    field = _ATTRIBUTES.get(key.lower())
+    if field is not None:
+        return _as_int(character.get(field))
+    for skill in character.get("skills") or []:
+        if not isinstance(skill, dict) or str(skill.get("name", "")).strip() != key:
+            continue
+        for total_key in _SKILL_TOTAL_KEYS:
+            value = _as_int(skill.get(total_key))
+            if value is not None:
+                return value
+        parts = [_as_int(skill.get(k)) for k in _SKILL_PART_KEYS]
+        if any(p is not None for p in parts):
+            return sum(p for p in parts if p is not None)
+    return None
+
+
+def success_level(roll: int, target: int) -> str:
+    """COC 7th 成功等级：大成功 / 极难成功 / 困难成功 / 成功 / 失败 / 大失败。"""
+    fumble = roll == 100 or (target < 50 and roll >= 96)
+    if roll == 1:
+        return "大成功"
+    if fumble:
+        return "大失败"
+    if roll <= target // 5:
+        return "极难成功"
+    if roll <= target // 2:
+        return "困难成功"
+    if roll <= target:
+        return "成功"
+    return "失败"
+
+
+def check_many(targets: Sequence[int], bonus: int = 0) -> List[Dict[str, Any]]:
+    """
+    对一组目标值各做一次 d100 检定（bonus > 0 为奖励骰个数，< 0 为惩罚骰个数），
+    所有骰子一次性生成。返回 [{ target, roll, level }]。
+    """
+    if not targets:
+        return []
+    if len(targets) > MAX_TIMES:
+        raise DiceError(f"批量检定最多 {MAX_TIMES} 次")
+    if abs(bonus) > 10:
+        raise DiceError("奖励骰 / 惩罚骰个数须在 -10～10 之间")
+    if bonus:
+        rolls = _d100(abs(bonus), bonus > 0, len(targets))[0]
+    else:
+        rolls = _sums(1, 100, len(targets))
+    return [{"target": t, "roll": r, "level": success_level(r, t)} for t, r in zip(targets, rolls)]
@@ -0,0 +1,104 @@
+"""
+高频频道的 Socket 推送微批：TRPG_EMIT_BATCH_MS > 0 时开启（默认 0，逐条推送 message 事件）。
+
+- 开启后同一频道的新消息先进入缓冲，自缓冲中第一条起至多 TRPG_EMIT_BATCH_MS 毫秒、或攒够
+  TRPG_EMIT_BATCH_MAX 条（默认 64）即合并为一条 messages { channelId, messages } 推送给频道成员；
+- 每批只编码一次，每个连接只写一帧、只建一个发送任务，高频频道（如 50 人 × 20 条/秒）的编码与发送开销按批摊还；
+  单条消息因合并增加的延迟不超过 TRPG_EMIT_BATCH_MS；
+- 各频道独立计时、独立刷新，批内与批间保持写入历史的顺序。
+
+缓冲中的消息已写入历史：join 补发只到 pending_from 返回的序号为止，其后的消息由随后推送的批送达。
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+EMIT_BATCH_WINDOW = float(os.environ.get("TRPG_EMIT_BATCH_MS", "0")) / 1000
+EMIT_BATCH_MAX = int(os.environ.get("TRPG_EMIT_BATCH_MAX", "64"))
+
+Emit = Callable[[str, List[Dict[str, Any]]], Awaitable[None]]
+
+
+class _Batch:
+    __slots__ = ("messages", "handle")
+
+    def __init__(self, handle: asyncio.TimerHandle) -> None:
+        self.messages: List[Dict[str, Any]] = []
+        self.handle = handle
+
+
+class EmitBatcher:
+    def __init__(self, window: float = EMIT_BATCH_WINDOW, max_size: int = EMIT_BATCH_MAX) -> None:
+        self.window = window
+        self.max_size = max(1, max_size)
+        self._emit: Optional[Emit] = None
+        # channelId → 缓冲中的一批
+        self._pending: Dict[str, _Batch] = {}
+        # channelId → 已取出、推送任务尚未开始的各批第一条消息的 seq（按取出顺序）
+        self._inflight: Dict[str, Deque[int]] = {}
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self.batches = 0
+        self.messages = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def bind(self, emit: Emit) -> None:
+        """注入推送函数 emit(channelId, messages)。"""
+        self._emit = emit
+
+    def add(self, channel_id: str, msg: Dict[str, Any]) -> None:
+        """缓冲一条已写入历史的消息（带 seq）；须在事件循环中调用。"""
+        batch = self._pending.get(channel_id)
+        if batch is None:
+            handle = asyncio.get_running_loop().call_later(self.window, self.flush, channel_id)
+            batch = self._pending[channel_id] = _Batch(handle)
+        batch.messages.append(msg)
+        if len(batch.messages) >= self.max_size:
+            self.flush(channel_id)
+
+    def flush(self, channel_id: str) -> None:
+        """立即推送频道缓冲中的消息（在后台任务中发送）。"""
+        batch = self._pending.pop(channel_id, None)
+        if batch is None:
+            return
+        batch.handle.cancel()
+        self._inflight.setdefault(channel_id, deque()).append(batch.messages[0]["seq"])
+        self.batches += 1
+        self.messages += len(batch.messages)
+        task = asyncio.ensure_future(self._send(channel_id, batch.messages))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def pending_from(self, channel_id: str) -> Optional[int]:
+        """
+        频道中尚未推送的第一条消息的 seq；没有时返回 None。
+        join 补发只需补到这条之前：之后的消息随缓冲的批推送，新加入的连接届时已在房间中。
+        """
+        inflight = self._inflight.get(channel_id)
+        if inflight:
+            return inflight[0]
+        batch = self._pending.get(channel_id)
+        return batch.messages[0]["seq"] if batch is not None else None
+
+    async def _send(self, channel_id: str, messages: List[Dict[str, Any]]) -> None:
+        inflight = self._inflight[channel_id]
+        inflight.popleft()
+        if not inflight:
+            del self._inflight[channel_id]
+        # 出队与 emit 取房间成员之间没有 await：此后加入的连接由 join 补发，不会重复
+        try:
+            await self._emit(channel_id, messages)
+        except Exception:
+            logger.exception("batched emit to channel %s failed", channel_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": self.batches, "messages": self.messages, "pending": sum(len(b.messages) for b in self._pending.values())}
+
+
+emit_batcher = EmitBatcher()
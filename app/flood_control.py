@@ -0,0 +1,146 @@
+"""
+消息防刷：按连接、用户与频道三级令牌桶限制发消息 / 掷骰的速率。
+
+- 每级一组 TokenBuckets：每秒补充 rate 个令牌、至多存 burst 个，取值见下方 TRPG_FLOOD_* 配置，rate 为 0 时该级不限；
+- 令牌桶以 GCRA 形式保存：每个键只存一个浮点数「桶重新装满的时刻」，判断与扣减都是 O(1)。
+  该时刻已过的键与不存在等价，表增长到上次清理后的两倍时整体清理一次（摊还 O(1)），
+  表的大小不超过最近活跃键数的两倍；
+- 一条消息须三级都有余量才放行，放行时三级一起扣减；超限的消息在写入历史与广播之前丢弃，
+  调用方据 check 的返回值向发送方回警告（同一连接每 TRPG_FLOOD_NOTICE_INTERVAL 秒至多一条）。
+  连接断开时调用 forget 释放该连接的桶；用户与频道的桶装满后由清理回收。
+
+多 worker 部署时每个 worker 各自计数，频道级的上限按 worker 生效。TRPG_FLOOD=0 时关闭。
+"""
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+FLOOD_ENABLED = os.environ.get("TRPG_FLOOD", "1") != "0"
+SID_RATE = float(os.environ.get("TRPG_FLOOD_SID_RATE", "5"))
+SID_BURST = float(os.environ.get("TRPG_FLOOD_SID_BURST", "10"))
+USER_RATE = float(os.environ.get("TRPG_FLOOD_USER_RATE", "8"))
+USER_BURST = float(os.environ.get("TRPG_FLOOD_USER_BURST", "20"))
+CHANNEL_RATE = float(os.environ.get("TRPG_FLOOD_CHANNEL_RATE", "60"))
+CHANNEL_BURST = float(os.environ.get("TRPG_FLOOD_CHANNEL_BURST", "120"))
+NOTICE_INTERVAL = float(os.environ.get("TRPG_FLOOD_NOTICE_INTERVAL", "1"))
+
+SCOPES = ("sid", "user", "channel")
+
+# 低于此大小不清理
+_MIN_SWEEP = 1024
+
+
+class TokenBuckets:
+    """一组按键区分的令牌桶：每秒补充 rate 个、容量 burst 个。"""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        # 桶从空到满所需的时间
+        self._tolerance = self._interval * self.burst
+        # 键 → 桶重新装满的时刻（monotonic）；不在表中即为满桶
+        self._full_at: Dict[str, float] = {}
+        self._sweep_at = _MIN_SWEEP
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def wait(self, key: str, now: float, cost: float = 1.0) -> float:
+        """取 cost 个令牌还需等待的秒数，0 表示现在即可取（不扣减）。"""
+        full_at = self._full_at.get(key, now)
+        if full_at < now:
+            full_at = now
+        return max(0.0, full_at + cost * self._interval - now - self._tolerance)
+
+    def take(self, key: str, now: float, cost: float = 1.0) -> None:
+        """扣减 cost 个令牌（调用方已用 wait 确认有余量）。"""
+        full_at = self._full_at.get(key, now)
+        self._full_at[key] = (full_at if full_at > now else now) + cost * self._interval
+        if len(self._full_at) > self._sweep_at:
+            self.sweep(now)
+
+    def sweep(self, now: float) -> None:
+        """丢弃已装满的桶。"""
+        self._full_at = {key: full_at for key, full_at in self._full_at.items() if full_at > now}
+        self._sweep_at = max(_MIN_SWEEP, 2 * len(self._full_at))
+
+    def forget(self, key: str) -> None:
+        self._full_at.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+
+class FloodControl:
+    def __init__(
+        self,
+        enabled: bool = FLOOD_ENABLED,
+        sid: Tuple[float, float] = (SID_RATE, SID_BURST),
+        user: Tuple[float, float] = (USER_RATE, USER_BURST),
+        channel: Tuple[float, float] = (CHANNEL_RATE, CHANNEL_BURST),
+        notice_interval: float = NOTICE_INTERVAL,
+    ) -> None:
+        self.enabled = enabled
+        self.buckets: Dict[str, TokenBuckets] = {
+            "sid": TokenBuckets(*sid),
+            "user": TokenBuckets(*user),
+            "channel": TokenBuckets(*channel),
+        }
+        # 只保留启用的级别，check 时按 SCOPES 的顺序逐级判断
+        self._levels = tuple(
+            (i, scope, self.buckets[scope]) for i, scope in enumerate(SCOPES) if self.buckets[scope].enabled
+        )
+        self.notice_interval = notice_interval
+        # 连接 → 上次发出警告的时刻
+        self._noticed: Dict[str, float] = {}
+        self.allowed = 0
+        self.dropped: Dict[str, int] = {scope: 0 for scope in SCOPES}
+
+    def check(self, sid: str, user: Optional[str], channel: Optional[str]) -> Optional[Tuple[str, float]]:
+        """
+        一条消息是否放行：放行时扣减各级令牌并返回 None；
+        超限时不扣减，返回 (超限的级别 "sid" / "user" / "channel", 建议等待秒数)。user / channel 为 None 时不计该级。
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        keys = (sid, user, channel)
+        for i, scope, buckets in self._levels:
+            key = keys[i]
+            if key is not None:
+                wait = buckets.wait(key, now)
+                if wait > 0:
+                    self.dropped[scope] += 1
+                    return scope, wait
+        for i, _, buckets in self._levels:
+            key = keys[i]
+            if key is not None:
+                buckets.take(key, now)
+        self.allowed += 1
+        return None
+
+    def should_notice(self, sid: str) -> bool:
+        """该连接本次被限流时是否发警告（每 notice_interval 秒至多一次，避免警告本身被刷屏）。"""
+        now = time.monotonic()
+        last = self._noticed.get(sid)
+        if last is not None and now - last < self.notice_interval:
+            return False
+        self._noticed[sid] = now
+        return True
+
+    def forget(self, sid: str) -> None:
+        """连接断开：释放该连接的桶与警告记录。"""
+        self.buckets["sid"].forget(sid)
+        self._noticed.pop(sid, None)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "allowed": self.allowed,
+            "dropped": dict(self.dropped),
+            "buckets": {scope: len(buckets) for scope, buckets in self.buckets.items()},
+        }
+
+
+flood_control = FloodControl()
@@ -0,0 +1,243 @@
+"""
+单频道历史消息容器：热尾 + 压缩冷块 + 消息 id 索引。
+
+每条消息按写入顺序分配一个绝对序号（默认从 0 开始，单调递增），写入记录的 seq。
+- 最新的消息以 MessageRecord（__slots__ + 驻留字符串，见 message_record.py）保存在热尾 `_hot` 中，
+  读取时才还原为 dict；
+- 热尾超过 hot_size + block_size 条时，把最旧的 block_size 条冻结为一个不可变的冷块
+  （紧凑 JSON 后 zlib 压缩），热尾只保留最新的部分；
+- 冷块 + 热尾总数超过 capacity 时，整块淘汰最旧的冷块并计入淘汰统计；
+- `_index` 记录 消息 id → 绝对序号，使 before 分页为 O(1) 定位；
+  读取只解压分页涉及的冷块，解压结果放在全频道共享的小 LRU 中。
+"""
+import json
+import zlib
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from .message_record import MessageRecord
+
+Message = Dict[str, Any]
+
+
+class ColdBlock:
+    """连续 count 条消息的压缩块，覆盖序号 [start, start + count)。"""
+
+    __slots__ = ("start", "count", "data", "ids")
+
+    def __init__(self, start: int, messages: List[Message]) -> None:
+        self.start = start
+        self.count = len(messages)
+        self.data = zlib.compress(
+            json.dumps(messages, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6
+        )
+        # 淘汰整块时据此清理 id 索引（与索引共享同一批字符串对象）
+        self.ids: Tuple[Any, ...] = tuple(m.get("id") for m in messages)
+
+    @classmethod
+    def from_compressed(cls, start: int, data: bytes, ids: List[Any]) -> "ColdBlock":
+        """由已压缩的数据重建冷块（快照恢复用），不解压。"""
+        block = cls.__new__(cls)
+        block.start = start
+        block.count = len(ids)
+        block.data = data
+        block.ids = tuple(ids)
+        return block
+
+    def decode(self) -> List[Message]:
+        return json.loads(zlib.decompress(self.data))
+
+
+class _BlockCache:
+    """已解压冷块的 LRU，所有频道共享。"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, Tuple[ColdBlock, List[Message]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, block: ColdBlock, store: bool = True) -> List[Message]:
+        """取解压后的消息；store 为 False 时未命中不放入缓存（顺序扫描不挤掉分页热点）。"""
+        key = id(block)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is block:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        messages = block.decode()
+        if store and self.maxsize > 0:
+            self._entries[key] = (block, messages)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return messages
+
+    def discard(self, block: ColdBlock) -> None:
+        entry = self._entries.get(id(block))
+        if entry is not None and entry[0] is block:
+            del self._entries[id(block)]
+
+
+block_cache = _BlockCache(64)
+
+
+class ChannelHistory:
+    __slots__ = (
+        "capacity",
+        "hot_size",
+        "block_size",
+        "_hot",
+        "_hot_start",
+        "_blocks",
+        "_index",
+        "appended",
+        "evicted",
+    )
+
+    def __init__(self, capacity: int, start: int = 0, hot_size: int = 1000, block_size: int = 256) -> None:
+        self.capacity = max(1, int(capacity))
+        self.hot_size = max(1, int(hot_size))
+        self.block_size = max(1, int(block_size))
+        self._hot: List[MessageRecord] = []
+        # 热尾第一条消息的序号
+        self._hot_start = start
+        self._blocks: Deque[ColdBlock] = deque()
+        self._index: Dict[Any, int] = {}
+        self.appended = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def start(self) -> int:
+        """仍在内存中的最旧消息序号。"""
+        return self._blocks[0].start if self._blocks else self._hot_start
+
+    @property
+    def end(self) -> int:
+        """下一条消息将获得的序号（即已写入总数）。"""
+        return self._hot_start + len(self._hot)
+
+    def append(self, msg: Union[MessageRecord, Message]) -> int:
+        """写入一条消息（dict 会先转换为 MessageRecord），返回其绝对序号；必要时冻结冷块、淘汰最旧冷块。"""
+        if not isinstance(msg, MessageRecord):
+            msg = MessageRecord.from_wire(msg)
+        pos = self.end
+        msg.seq = pos
+        self._hot.append(msg)
+        msg_id = msg.msg_id
+        if msg_id is not None:
+            self._index[msg_id] = pos
+        self.appended += 1
+        if len(self._hot) >= self.hot_size + self.block_size:
+            self._freeze()
+        if len(self) > self.capacity:
+            self._evict()
+        return pos
+
+    def _freeze(self) -> None:
+        frozen = [m.to_wire() for m in self._hot[: self.block_size]]
+        del self._hot[: self.block_size]
+        self._blocks.append(ColdBlock(self._hot_start, frozen))
+        self._hot_start += len(frozen)
+
+    def _evict(self) -> None:
+        while len(self) > self.capacity:
+            if self._blocks:
+                block = self._blocks.popleft()
+                block_cache.discard(block)
+                for offset, msg_id in enumerate(block.ids):
+                    if msg_id is not None and self._index.get(msg_id) == block.start + offset:
+                        del self._index[msg_id]
+                self.evicted += block.count
+            else:
+                # 容量小于热尾时直接从热尾淘汰
+                old = self._hot.pop(0)
+                old_id = old.msg_id
+                if old_id is not None and self._index.get(old_id) == self._hot_start:
+                    del self._index[old_id]
+                self._hot_start += 1
+                self.evicted += 1
+
+    def position(self, msg_id: Any) -> Optional[int]:
+        """消息 id → 绝对序号；已淘汰或不存在时返回 None。"""
+        return self._index.get(msg_id)
+
+    def slice(self, lo: int, hi: int, cache: bool = True) -> List[Message]:
+        """
+        按绝对序号区间 [lo, hi) 取消息，自动裁剪到内存中的范围；只解压涉及的冷块。
+        cache 为 False 时解压结果不放入共享 LRU（导出等顺序扫描使用）。
+        """
+        lo = max(lo, self.start)
+        hi = min(hi, self.end)
+        if lo >= hi:
+            return []
+        result: List[Message] = []
+        if lo < self._hot_start:
+            first = self._blocks[0].start
+            i = (lo - first) // self.block_size
+            while i < len(self._blocks):
+                block = self._blocks[i]
+                if block.start >= hi:
+                    break
+                messages = block_cache.get(block, cache)
+                result.extend(messages[max(lo - block.start, 0) : hi - block.start])
+                i += 1
+        if hi > self._hot_start:
+            result.extend(m.to_wire() for m in self._hot[max(lo - self._hot_start, 0) : hi - self._hot_start])
+        return result
+
+    def tail(self, n: int) -> List[MessageRecord]:
+        """热尾中最新的至多 n 条记录（不转换，供内存估算）。"""
+        return self._hot[-n:] if n > 0 else []
+
+    def page(self, limit: int, before: Optional[Any] = None) -> List[Message]:
+        """
+        取一页历史：before 为消息 id 时返回其之前的 limit 条；
+        before 为空或找不到时返回最新的 limit 条。
+        """
+        end = self.end
+        if before is not None:
+            pos = self._index.get(before)
+            if pos is not None:
+                end = pos
+        return self.slice(end - limit, end)
+
+    def export(self) -> Tuple[int, List[ColdBlock], List[Message]]:
+        """(起始序号, 冷块列表, 热尾的 dict 副本)，供快照在其他线程中编码；冷块不可变，可直接拷贝其压缩数据。"""
+        return self.start, list(self._blocks), [m.to_wire() for m in self._hot]
+
+    def load(self, blocks: List[ColdBlock], hot: List[Message]) -> None:
+        """
+        向空的历史载入快照：冷块原样挂上（须与 block_size 一致且首尾相接），热尾逐条写入。
+        冷块不满足条件时解压后逐条写入。
+        """
+        if self._blocks or self._hot:
+            raise ValueError("history is not empty")
+        if blocks and all(b.count == self.block_size for b in blocks) and blocks[0].start == self._hot_start:
+            for block in blocks:
+                for offset, msg_id in enumerate(block.ids):
+                    if msg_id is not None:
+                        self._index[msg_id] = block.start + offset
+                self._blocks.append(block)
+                self._hot_start += block.count
+                self.appended += block.count
+        else:
+            hot = [m for b in blocks for m in b.decode()] + list(hot)
+        for msg in hot:
+            self.append(msg)
+        if len(self) > self.capacity:
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "capacity": self.capacity,
+            "size": len(self),
+            "hot": len(self._hot),
+            "coldBlocks": len(self._blocks),
+            "coldBytes": sum(len(b.data) for b in self._blocks),
+            "appended": self.appended,
+            "evicted": self.evicted,
+        }
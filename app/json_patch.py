@@ -0,0 +1,172 @@
+"""
+JSON Patch（RFC 6902）与 JSON Merge Patch（RFC 7386）。
+
+只复制被修改到的顶层字段（写时复制），其余字段与原文档共享；
+返回新文档及被修改的顶层字段名，调用方只需校验这些字段。
+任一操作失败时抛出 PatchError，原文档保持不变。
+"""
+import copy
+from typing import Any, Dict, List, Set, Tuple
+
+_MISSING = object()
+
+
+class PatchError(Exception):
+    """补丁无法应用。status 为建议的 HTTP 状态码（400 格式错误，409 test 不通过）。"""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """JSON Pointer（RFC 6901）→ 路径片段列表。"""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"无效的路径：{pointer}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in pointer[1:].split("/")]
+
+
+def _list_index(container: list, token: str, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"无效的数组下标：{token}")
+    index = int(token)
+    limit = len(container) + (1 if allow_end else 0)
+    if index >= limit:
+        raise PatchError(f"数组下标越界：{token}")
+    return index
+
+
+class _Document:
+    """顶层为 dict 的写时复制文档。"""
+
+    def __init__(self, doc: Dict[str, Any]) -> None:
+        self.root = dict(doc)
+        self.touched: Set[str] = set()
+
+    def _own(self, key: str) -> None:
+        # 首次修改某个顶层字段时深拷贝其值，避免改动原文档
+        if key not in self.touched:
+            self.touched.add(key)
+            if key in self.root:
+                self.root[key] = copy.deepcopy(self.root[key])
+
+    def _parent(self, path: List[str], write: bool) -> Tuple[Any, str]:
+        if not path:
+            raise PatchError("不支持替换整个文档")
+        if write:
+            self._own(path[0])
+        node: Any = self.root
+        for token in path[:-1]:
+            if isinstance(node, dict):
+                if token not in node:
+                    raise PatchError(f"路径不存在：/{'/'.join(path)}")
+                node = node[token]
+            elif isinstance(node, list):
+                node = node[_list_index(node, token, allow_end=False)]
+            else:
+                raise PatchError(f"路径不存在：/{'/'.join(path)}")
+        return node, path[-1]
+
+    def get(self, path: List[str]) -> Any:
+        if not path:
+            return self.root
+        parent, last = self._parent(path, write=False)
+        if isinstance(parent, dict):
+            if last not in parent:
+                raise PatchError(f"路径不存在：/{'/'.join(path)}")
+            return parent[last]
+        if isinstance(parent, list):
+            return parent[_list_index(parent, last, allow_end=False)]
+        raise PatchError(f"路径不存在：/{'/'.join(path)}")
+
+    def add(self, path: List[str], value: Any) -> None:
+        parent, last = self._parent(path, write=True)
+        if isinstance(parent, dict):
+            parent[last] = value
+        elif isinstance(parent, list):
+            parent.insert(_list_index(parent, last, allow_end=True), value)
+        else:
+            raise PatchError(f"路径不存在：/{'/'.join(path)}")
+
+    def remove(self, path: List[str]) -> Any:
+        parent, last = self._parent(path, write=True)
+        if isinstance(parent, dict):
+            if last not in parent:
+                raise PatchError(f"路径不存在：/{'/'.join(path)}")
+            return parent.pop(last)
+        if isinstance(parent, list):
+            return parent.pop(_list_index(parent, last, allow_end=False))
+        raise PatchError(f"路径不存在：/{'/'.join(path)}")
+
+    def replace(self, path: List[str], value: Any) -> None:
+        parent, last = self._parent(path, write=True)
+        if isinstance(parent, dict):
+            if last not in parent:
+                raise PatchError(f"路径不存在：/{'/'.join(path)}")
+            parent[last] = value
+        elif isinstance(parent, list):
+            parent[_list_index(parent, last, allow_end=False)] = value
+        else:
+            raise PatchError(f"路径不存在：/{'/'.join(path)}")
+
+
+def apply_json_patch(doc: Dict[str, Any], operations: Any) -> Tuple[Dict[str, Any], Set[str]]:
+    """应用 RFC 6902 操作列表，返回 (新文档, 被修改的顶层字段)。"""
+    if not isinstance(operations, list):
+        raise PatchError("JSON Patch 必须是操作数组")
+    target = _Document(doc)
+    for op in operations:
+        if not isinstance(op, dict) or "op" not in op or "path" not in op:
+            raise PatchError("每个操作必须包含 op 与 path")
+        name = op["op"]
+        path = parse_pointer(op["path"])
+        value = op.get("value", _MISSING)
+        if name in ("add", "replace", "test") and value is _MISSING:
+            raise PatchError(f"{name} 操作缺少 value")
+        if name == "add":
+            target.add(path, value)
+        elif name == "remove":
+            target.remove(path)
+        elif name == "replace":
+            target.replace(path, value)
+        elif name in ("move", "copy"):
+            if "from" not in op:
+                raise PatchError(f"{name} 操作缺少 from")
+            source = parse_pointer(op["from"])
+            if name == "move":
+                if path[: len(source)] == source and path != source:
+                    raise PatchError("不能把节点移动到其子节点下")
+                moved = target.remove(source)
+            else:
+                moved = copy.deepcopy(target.get(source))
+            target.add(path, moved)
+        elif name == "test":
+            if target.get(path) != value:
+                raise PatchError(f"test 不通过：{op['path']}", status=409)
+        else:
+            raise PatchError(f"不支持的操作：{name}")
+    return target.root, target.touched
+
+
+def _merge(target: Any, patch: Any) -> Any:
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge(result.get(key), value)
+    return result
+
+
+def apply_merge_patch(doc: Dict[str, Any], patch: Any) -> Tuple[Dict[str, Any], Set[str]]:
+    """应用 RFC 7386 merge patch，返回 (新文档, 被修改的顶层字段)。"""
+    if not isinstance(patch, dict):
+        raise PatchError("Merge Patch 必须是 JSON 对象")
+    return _merge(doc, patch), set(patch)
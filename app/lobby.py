@@ -0,0 +1,159 @@
+"""
+大厅推送：代替轮询 GET /api/game-rooms。
+
+- 客户端以 Socket 事件 lobby { keyword?, status?, module? } 订阅（条件与 GET /api/game-rooms 相同），
+  先收到一次完整列表 lobby { version, full: true, rooms }，之后只收到影响其结果的变更：
+  lobby { version, changes: [{ op: "added" | "updated" | "removed", id, room? }] }；
+- 房间从不满足条件变为满足时推送 added，反之推送 removed，都满足时推送 updated；
+- 条件相同的订阅归为一组（同一个 Socket.IO 房间 "lobby:<条件>"），每次变更按组判断一次、每组只编码推送一次，
+  推送的代价与条件的种类数成正比，与订阅人数无关；
+- 同一轮事件循环内的多次变更合并为一条推送，同一房间只取最终状态；
+- version 为本 worker 大厅的变更序号，完整列表之后 version 不大于列表 version 的 changes 已包含在列表中，可丢弃。
+
+房间为各 worker 独立的内存存储，推送只发给本 worker 的连接。
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .room_index import Room, room_matches
+
+logger = logging.getLogger(__name__)
+
+Emit = Callable[[Dict[str, Any], str], Awaitable[None]]
+
+
+class _Group:
+    """一组条件相同的订阅。"""
+
+    __slots__ = ("keyword", "statuses", "module", "sids")
+
+    def __init__(self, keyword: str, statuses: Optional[Set[str]], module: str) -> None:
+        self.keyword = keyword
+        self.statuses = statuses
+        self.module = module
+        self.sids: Set[str] = set()
+
+    def matches(self, room: Optional[Room]) -> bool:
+        return room is not None and room_matches(room, self.keyword, self.statuses, self.module)
+
+
+def parse_statuses(status: Optional[str]) -> Optional[Set[str]]:
+    """逗号分隔的 status 查询参数 → 集合（空时为 None，表示不按状态过滤）。"""
+    if not status:
+        return None
+    return {s.strip() for s in status.split(",") if s.strip()} or None
+
+
+class LobbyFeed:
+    def __init__(self) -> None:
+        self._emit: Optional[Emit] = None
+        self.version = 0
+        # 组名（Socket.IO 房间名）→ 订阅组
+        self._groups: Dict[str, _Group] = {}
+        # sid → 组名
+        self._by_sid: Dict[str, str] = {}
+        # 本轮待推送的变更：房间 id → (本轮第一次变更前的状态, 最新状态)，None 表示不存在
+        self._pending: Dict[str, Tuple[Optional[Room], Optional[Room]]] = {}
+        self._flush_handle: Optional[asyncio.Handle] = None
+        self.changes = 0
+        self.broadcasts = 0
+
+    def bind(self, emit: Emit) -> None:
+        """注入推送函数 emit(payload, 组名)。"""
+        self._emit = emit
+
+    # ----- 订阅 -----
+
+    def subscribe(
+        self, sid: str, keyword: Optional[str], status: Optional[str], module: Optional[str]
+    ) -> Tuple[Optional[str], str]:
+        """
+        登记订阅，替换该连接原有的订阅；返回 (原组名或 None, 新组名)。
+        调用方让连接离开原组、加入新组的 Socket.IO 房间，再发送 snapshot(新组名)。
+        """
+        keyword = (keyword or "").strip().lower()
+        module = (module or "").strip().lower()
+        statuses = parse_statuses(status)
+        key = "lobby:" + json.dumps([keyword, sorted(statuses or ()), module], ensure_ascii=False)
+        old = self.unsubscribe(sid)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(keyword, statuses, module)
+        group.sids.add(sid)
+        self._by_sid[sid] = key
+        return (old if old != key else None), key
+
+    def unsubscribe(self, sid: str) -> Optional[str]:
+        """取消该连接的订阅（断线时也调用），返回原组名。"""
+        key = self._by_sid.pop(sid, None)
+        if key is None:
+            return None
+        group = self._groups[key]
+        group.sids.discard(sid)
+        if not group.sids:
+            del self._groups[key]
+        return key
+
+    def snapshot(self, key: str) -> Dict[str, Any]:
+        """组内条件下的完整列表：{ version, full: true, rooms }。"""
+        from .routes_game_rooms import _index
+
+        group = self._groups[key]
+        rooms, _ = _index.query(keyword=group.keyword, statuses=group.statuses, module=group.module)
+        return {"version": self.version, "full": True, "rooms": rooms}
+
+    # ----- 变更 -----
+
+    def changed(self, before: Optional[Room], after: Optional[Room]) -> None:
+        """
+        房间新增（before 为 None）、修改或删除（after 为 None）后调用；before 须为修改前的副本。
+        只记录变更，在本轮事件循环结束时合并推送。
+        """
+        self.version += 1
+        self.changes += 1
+        if not self._groups:
+            return
+        room_id = (after or before or {}).get("id")
+        if room_id is None:
+            return
+        first = self._pending.get(room_id)
+        self._pending[room_id] = (first[0] if first is not None else before, dict(after) if after is not None else None)
+        if self._flush_handle is None:
+            try:
+                self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+            except RuntimeError:
+                self._pending.clear()
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        for key, group in self._groups.items():
+            changes: List[Dict[str, Any]] = []
+            for room_id, (before, after) in pending.items():
+                was, now = group.matches(before), group.matches(after)
+                if now:
+                    changes.append({"op": "updated" if was else "added", "id": room_id, "room": after})
+                elif was:
+                    changes.append({"op": "removed", "id": room_id})
+            if changes and self._emit is not None:
+                self.broadcasts += 1
+                asyncio.ensure_future(self._send({"version": self.version, "changes": changes}, key))
+
+    async def _send(self, payload: Dict[str, Any], key: str) -> None:
+        try:
+            await self._emit(payload, key)
+        except Exception:
+            logger.exception("lobby broadcast failed")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._by_sid),
+            "groups": len(self._groups),
+            "changes": self.changes,
+            "broadcasts": self.broadcasts,
+        }
+
+
+lobby_feed = LobbyFeed()
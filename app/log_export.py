@@ -0,0 +1,112 @@
+"""
+跑团记录导出：GET /api/channels/:channelId/export 的过滤与格式化。
+
+按 seq 顺序逐块读取频道历史（channel_store.iter_messages），过滤后每块编码为一段文本交给 StreamingResponse，
+无论记录多长，内存中只有一块消息与一段输出。
+- ndjson：每行一条与 Socket message 结构相同的 JSON；
+- text：每行「[时间] 发言者: 内容」，适合直接阅读或贴到论坛。
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .channel_store import iter_messages
+
+# tz 参数（相对 UTC 的分钟数）须在 (-TZ_LIMIT, TZ_LIMIT) 内，与 datetime.timezone 的范围一致
+TZ_LIMIT = 24 * 60
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "text": ("text/plain; charset=utf-8", "txt"),
+}
+
+
+def _time_ms(value: Any) -> Optional[float]:
+    """消息 time 字段 → 毫秒时间戳；支持数字（毫秒）与 ISO 8601 字符串，无法识别时返回 None。"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp() * 1000
+    return None
+
+
+class ExportFilter:
+    """时间范围（毫秒，闭区间）与发言者过滤；未指定的条件不生效。"""
+
+    def __init__(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        speaker_role: Optional[str] = None,
+        speaker_npc_id: Optional[str] = None,
+    ) -> None:
+        self.since = since
+        self.until = until
+        self.speaker_role = speaker_role
+        self.speaker_npc_id = speaker_npc_id
+
+    def __call__(self, msg: Dict[str, Any]) -> bool:
+        if self.speaker_role is not None and msg.get("speakerRole") != self.speaker_role:
+            return False
+        if self.speaker_npc_id is not None and msg.get("speakerNpcId") != self.speaker_npc_id:
+            return False
+        if self.since is not None or self.until is not None:
+            ts = _time_ms(msg.get("time"))
+            if ts is None:
+                return False
+            if self.since is not None and ts < self.since:
+                return False
+            if self.until is not None and ts > self.until:
+                return False
+        return True
+
+
+def _stamp(value: Any, tz: timezone) -> str:
+    """time 字段 → 本地时间文本；缺失为「-」，超出可表示范围或无法识别时原样输出，不中断导出。"""
+    if value is None:
+        return "-"
+    ts = _time_ms(value)
+    if ts is not None:
+        try:
+            return datetime.fromtimestamp(ts / 1000, tz).strftime("%Y-%m-%d %H:%M:%S")
+        except (OverflowError, OSError, ValueError):
+            pass
+    return str(value)
+
+
+def format_text_line(msg: Dict[str, Any], tz: timezone) -> str:
+    """[2024-01-01 20:00:00] 发言者: 内容；NPC 发言显示为「NPC 名（玩家名）」，多行内容缩进续行。"""
+    stamp = _stamp(msg.get("time"), tz)
+    user = msg.get("userName") or "匿名"
+    npc = msg.get("speakerNpcName")
+    speaker = f"{npc}（{user}）" if npc and npc != user else user
+    content = str(msg.get("content") or "").replace("\r\n", "\n").replace("\n", "\n    ")
+    return f"[{stamp}] {speaker}: {content}\n"
+
+
+async def export_chunks(
+    channel_id: str,
+    fmt: str,
+    lo: int = 0,
+    hi: Optional[int] = None,
+    accept: Optional[ExportFilter] = None,
+    tz_offset_minutes: int = 480,
+) -> AsyncIterator[bytes]:
+    """逐块产出导出内容（UTF-8 字节），每块对应 channel_store.iter_messages 的一批消息；tz_offset_minutes 由调用方校验。"""
+    tz = timezone(timedelta(minutes=tz_offset_minutes))
+    async for batch in iter_messages(channel_id, lo, hi):
+        if accept is not None:
+            batch = [m for m in batch if accept(m)]
+        if not batch:
+            continue
+        if fmt == "ndjson":
+            text = "".join(json.dumps(m, ensure_ascii=False, separators=(",", ":")) + "\n" for m in batch)
+        else:
+            text = "".join(format_text_line(m, tz) for m in batch)
+        yield text.encode("utf-8")
@@ -1,12 +1,18 @@
+import json
+
 import socketio
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from .realtime import room_manager
+from . import channel_store, metrics, snapshot, startup_profile
+from .bus import bus
+from .flood_control import flood_control
+from .realtime import PONG_TEXTS, room_manager
 from .routes_auth import router as auth_router
 from .routes_channels import router as channels_router
 from .routes_characters import router as characters_router
+from .routes_dice import router as dice_router
 from .routes_game_rooms import router as game_rooms_router
 from .routes_rooms import router as rooms_router
 from .socket_io import sio
@@ -39,21 +45,54 @@ app.add_middleware(
 )
 
 
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+
 # 注册 HTTP 路由
 app.include_router(auth_router)
 app.include_router(channels_router)
 app.include_router(characters_router)
+app.include_router(dice_router)
 app.include_router(game_rooms_router)
 app.include_router(rooms_router)
 
 
+@app.on_event("startup")
+async def on_startup():
+    await channel_store.start_persistence()
+    # 恢复快照（角色卡与频道历史延迟到首次访问时解码）并开始定期写快照
+    await snapshot.start()
+    # 历史恢复之后再连总线：连上 broker 时上报的各频道 seq 须包含已恢复的消息
+    await bus.start()
+    startup_profile.mark("startup hooks done")
+    startup_profile.dump()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await snapshot.stop()
+    # 关闭前写完尚未落库的聊天历史
+    await channel_store.stop_persistence()
+    await bus.stop()
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
 
+if metrics.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics_endpoint():
+        """Prometheus 文本格式指标；TRPG_METRICS=0 时不注册。"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Socket.IO 与 FastAPI 同端口：uvicorn 应运行 asgi_app（见下方）
 asgi_app = socketio.ASGIApp(sio, app)
+startup_profile.mark("app.main imported")
 
 
 @app.websocket("/ws/rooms/{room_id}")
@@ -61,12 +100,33 @@ async def websocket_room_endpoint(websocket: WebSocket, room_id: str):
     """
     房间 WebSocket（备用）：非 socket.io 的原始 WebSocket。
     前端若用 socket.io-client，请连接 asgi_app 的 /socket.io，并设置 VITE_SOCKET_URL=http://localhost:3000。
+    发送过快时丢弃该条，并回一条 {"type": "rate_limited", "scope", "retryAfter"}（见 flood_control.py）。
+    设置 TRPG_WS_IDLE_TIMEOUT 时，空闲过久服务端发 {"type": "ping"}，客户端回 {"type": "pong"}（不广播）；
+    超时无任何消息则以 1001 断开（默认关闭，只收不发的旧客户端不受影响）。
+    房间或本进程连接数已满时以 1013 拒绝（见 realtime.py）。
     """
-    await room_manager.connect(room_id, websocket)
+    # 限速键：本连接与房间（与 Socket.IO 频道区分开）
+    conn_key, room_key = f"ws:{id(websocket)}", f"room:{room_id}"
+    if not await room_manager.connect(room_id, websocket):
+        return
     try:
         while True:
             data = await websocket.receive_text()
+            room_manager.touch(room_id, websocket)
+            if data in PONG_TEXTS:
+                continue
+            limited = flood_control.check(conn_key, None, room_key)
+            if limited is not None:
+                if flood_control.should_notice(conn_key):
+                    scope, retry_after = limited
+                    notice = {"type": "rate_limited", "scope": scope, "retryAfter": round(retry_after, 2)}
+                    room_manager.send(room_id, websocket, json.dumps(notice))
+                continue
             await room_manager.broadcast(room_id, data)
     except WebSocketDisconnect:
+        pass
+    finally:
+        # 被空闲回收时已移出房间，这里重复调用无副作用
         room_manager.disconnect(room_id, websocket)
+        flood_control.forget(conn_key)
 
@@ -0,0 +1,122 @@
+"""
+聊天消息的紧凑内存表示与 Socket payload 快速校验。
+
+频道历史热尾中的每条消息原本是一个 dict：每条都带一张哈希表，channelId、userName、type、speakerRole、
+NPC 名等重复的值也各自一份。MessageRecord 按 schemas.SocketMessage 的字段生成 __slots__，
+这些重复出现的字符串经 sys.intern 共享；SocketMessage 之外的字段（如掷骰的 dice）放在 extra 中。
+只有在序列化（推送、分页返回、冻结冷块、快照）时才用 to_wire 还原为 dict。
+
+validate_message 先按字段类型做 isinstance 检查，全部符合时原样通过；
+不符合时交给 pydantic 完整校验（可做的类型转换照常转换，无法转换时抛出 ValidationError）。
+"""
+import sys
+from operator import attrgetter
+from typing import Any, Dict, FrozenSet, Optional, Tuple, Union, get_args, get_origin
+
+from .schemas import SocketMessage
+
+FIELDS: Tuple[str, ...] = tuple(SocketMessage.model_fields)
+# 取值高度重复、值得驻留的字段；id、content、time 每条不同，不驻留
+INTERNED = frozenset(("channelId", "userId", "userName", "type", "speakerRole", "speakerNpcId", "speakerNpcName"))
+
+# 未出现在 payload 中的字段记为 _MISSING，还原时省略，与原 dict 的键保持一致（显式的 null 仍还原为 null）
+_MISSING: Any = object()
+_get_fields = attrgetter(*FIELDS)
+
+
+def _accepted_types(annotation: Any) -> FrozenSet[type]:
+    """Optional[X] / Union[X, Y] → {X, Y, NoneType}；快速路径按精确类型比较（bool 不算 int）。"""
+    if get_origin(annotation) is Union:
+        return frozenset(t for t in get_args(annotation) if isinstance(t, type))
+    return frozenset((annotation, type(None))) if isinstance(annotation, type) else frozenset()
+
+
+_FIELD_TYPES: Dict[str, FrozenSet[type]] = {
+    name: _accepted_types(field.annotation) for name, field in SocketMessage.model_fields.items()
+}
+
+
+class MessageRecord:
+    __slots__ = FIELDS + ("seq", "extra")
+
+    seq: int
+    extra: Optional[Dict[str, Any]]
+
+    @classmethod
+    def from_wire(cls, data: Dict[str, Any]) -> "MessageRecord":
+        """由 wire dict 构造（不校验；重复字符串驻留），data 中的 seq 忽略，由历史写入时分配。"""
+        record = cls.__new__(cls)
+        present = 0
+        for name in FIELDS:
+            value = data.get(name, _MISSING)
+            if value is not _MISSING:
+                present += 1
+                if name in INTERNED and type(value) is str:
+                    value = sys.intern(value)
+            setattr(record, name, value)
+        record.seq = -1
+        record.extra = None
+        if len(data) > present:
+            extra = {k: v for k, v in data.items() if k not in _FIELD_TYPES and k != "seq"}
+            record.extra = extra or None
+        return record
+
+    @property
+    def msg_id(self) -> Any:
+        value = self.id
+        return None if value is _MISSING else value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """与 dict.get 相同的读取方式。"""
+        if key in _FIELD_TYPES:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        if key == "seq":
+            return self.seq
+        return self.extra.get(key, default) if self.extra else default
+
+    def to_wire(self) -> Dict[str, Any]:
+        """还原为与 Socket message 结构相同的 dict（附带 seq）。"""
+        data = {name: value for name, value in zip(FIELDS, _get_fields(self)) if value is not _MISSING}
+        if self.extra:
+            data.update(self.extra)
+        data["seq"] = self.seq
+        return data
+
+
+def _fast_ok(data: Dict[str, Any]) -> bool:
+    for key, value in data.items():
+        types = _FIELD_TYPES.get(key)
+        if types is not None and type(value) not in types:
+            return False
+    return True
+
+
+def validate_message(data: Any) -> Dict[str, Any]:
+    """
+    校验客户端发来的聊天消息，返回可写入历史的 dict；字段类型不符且无法转换时抛出 pydantic.ValidationError。
+    SocketMessage 之外的字段原样保留。
+    """
+    if isinstance(data, dict) and _fast_ok(data):
+        return data
+    model = SocketMessage.model_validate(data)
+    fixed = dict(data)
+    for name in FIELDS:
+        if name in fixed:
+            fixed[name] = getattr(model, name)
+    return fixed
+
+
+def record_bytes(record: MessageRecord) -> int:
+    """单条记录的粗略内存占用：对象本身 + 非驻留的值（驻留字符串由所有消息共享，不计入）。"""
+    total = sys.getsizeof(record)
+    for name in FIELDS:
+        if name not in INTERNED:
+            value = getattr(record, name)
+            if value is not _MISSING:
+                total += sys.getsizeof(value)
+    if record.extra:
+        total += sys.getsizeof(record.extra)
+        for value in record.extra.values():
+            total += sys.getsizeof(value)
+    return total
@@ -0,0 +1,274 @@
+"""
+Prometheus 文本格式的 /metrics 指标。
+
+- HTTP：按路由模板（如 /api/channels/{channel_id}/messages）统计请求延迟直方图与状态码计数；
+- Socket.IO：join / message 等事件的调用次数、异常次数与处理延迟直方图；
+- 抓取时现算的状态量：Socket.IO 与原始 WebSocket 房间人数、各频道消息数与估算内存、搜索索引大小、在线状态变更与广播次数、
+  密码校验排队数、角色卡与大厅房间数。
+
+所有计数都在事件循环线程内更新，使用普通 int / list 原地累加，不加锁；
+直方图 observe 只是一次 bisect 加两次自增。设置 TRPG_METRICS=0 时不注册中间件与 /metrics，
+事件装饰器直接返回原函数，热路径零开销。
+"""
+import functools
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+METRICS_ENABLED = os.environ.get("TRPG_METRICS", "1") != "0"
+
+# 延迟直方图分桶（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        # 最后一格为 +Inf
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# (method, route) → 延迟直方图；(method, route, status) → 次数
+http_latency: Dict[Tuple[str, str], Histogram] = {}
+http_requests: Dict[Tuple[str, str, int], int] = {}
+# event → 延迟直方图 / 异常次数
+sio_latency: Dict[str, Histogram] = {}
+sio_errors: Dict[str, int] = {}
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：记录每个 HTTP 请求的路由模板、状态码与耗时。"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            key = (scope["method"], route)
+            hist = http_latency.get(key)
+            if hist is None:
+                hist = http_latency[key] = Histogram()
+            hist.observe(time.perf_counter() - started)
+            counter_key = (scope["method"], route, status)
+            http_requests[counter_key] = http_requests.get(counter_key, 0) + 1
+
+
+def timed_event(name: str) -> Callable:
+    """Socket.IO 事件处理函数装饰器：统计次数、异常与延迟。放在 @sio.event 之下。"""
+
+    def decorator(func: Callable) -> Callable:
+        if not METRICS_ENABLED:
+            return func
+        hist = sio_latency.setdefault(name, Histogram())
+        sio_errors.setdefault(name, 0)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                sio_errors[name] += 1
+                raise
+            finally:
+                hist.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+# ----- 文本格式输出 -----
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: Any) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, hist: Histogram, **labels: Any) -> Iterable[str]:
+    cumulative = 0
+    for bound, count in zip(hist.buckets, hist.counts):
+        cumulative += count
+        yield f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}"
+    yield f"{name}_bucket{_labels(**labels, le='+Inf')} {hist.count}"
+    yield f"{name}_sum{_labels(**labels)} {hist.sum}"
+    yield f"{name}_count{_labels(**labels)} {hist.count}"
+
+
+def render() -> str:
+    """生成 Prometheus 文本格式的全部指标。"""
+    from . import channel_store
+    from .acl import channel_acl
+    from .emit_batcher import emit_batcher
+    from .flood_control import flood_control
+    from .lobby import lobby_feed
+    from .message_record import record_bytes
+    from .passwords import password_hasher
+    from .presence import presence_tracker
+    from .realtime import room_manager
+    from .routes_characters import _characters_by_user
+    from .routes_game_rooms import _rooms
+    from .search import stats as search_stats
+    from .socket_io import sio
+
+    lines: List[str] = []
+
+    lines.append("# HELP trpg_http_request_duration_seconds HTTP request latency by route.")
+    lines.append("# TYPE trpg_http_request_duration_seconds histogram")
+    for (method, route), hist in list(http_latency.items()):
+        lines.extend(_histogram_lines("trpg_http_request_duration_seconds", hist, method=method, route=route))
+    lines.append("# HELP trpg_http_requests_total HTTP requests by route and status.")
+    lines.append("# TYPE trpg_http_requests_total counter")
+    for (method, route, status), count in list(http_requests.items()):
+        lines.append(f"trpg_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    lines.append("# HELP trpg_socketio_event_duration_seconds Socket.IO event handler latency.")
+    lines.append("# TYPE trpg_socketio_event_duration_seconds histogram")
+    for event, hist in list(sio_latency.items()):
+        lines.extend(_histogram_lines("trpg_socketio_event_duration_seconds", hist, event=event))
+    lines.append("# HELP trpg_socketio_event_errors_total Socket.IO event handler exceptions.")
+    lines.append("# TYPE trpg_socketio_event_errors_total counter")
+    for event, count in list(sio_errors.items()):
+        lines.append(f"trpg_socketio_event_errors_total{_labels(event=event)} {count}")
+
+    lines.append("# HELP trpg_socketio_room_members Socket.IO members per room (this worker).")
+    lines.append("# TYPE trpg_socketio_room_members gauge")
+    for namespace, rooms in list(sio.manager.rooms.items()):
+        for room, members in list(rooms.items()):
+            # 跳过默认房间与每个 sid 的私有房间
+            if room is None or room in members:
+                continue
+            lines.append(f"trpg_socketio_room_members{_labels(namespace=namespace, room=room)} {len(members)}")
+
+    lines.append("# HELP trpg_ws_room_connections Raw WebSocket connections per room (this worker).")
+    lines.append("# TYPE trpg_ws_room_connections gauge")
+    for room_id, connections in list(room_manager.rooms.items()):
+        lines.append(f"trpg_ws_room_connections{_labels(room=room_id)} {len(connections)}")
+    lines.append("# HELP trpg_ws_dropped_messages_total Raw WebSocket messages dropped from full send queues.")
+    lines.append("# TYPE trpg_ws_dropped_messages_total counter")
+    lines.append(f"trpg_ws_dropped_messages_total {room_manager.dropped}")
+    lines.append("# HELP trpg_ws_connections Raw WebSocket connections (this worker).")
+    lines.append("# TYPE trpg_ws_connections gauge")
+    lines.append(f"trpg_ws_connections {room_manager.connections}")
+    lines.append("# HELP trpg_ws_reaped_total Raw WebSocket connections closed for being idle.")
+    lines.append("# TYPE trpg_ws_reaped_total counter")
+    lines.append(f"trpg_ws_reaped_total {room_manager.reaped}")
+    lines.append("# HELP trpg_ws_rejected_total Raw WebSocket connections refused by admission limits.")
+    lines.append("# TYPE trpg_ws_rejected_total counter")
+    lines.append(f"trpg_ws_rejected_total {room_manager.rejected}")
+
+    lines.append("# HELP trpg_channel_messages Messages held in memory per channel.")
+    lines.append("# TYPE trpg_channel_messages gauge")
+    lines.append("# HELP trpg_channel_memory_bytes Estimated memory of in-memory messages per channel.")
+    lines.append("# TYPE trpg_channel_memory_bytes gauge")
+    # 只统计已解码的频道；快照中尚未访问的频道见 trpg_snapshot_pending_entries，抓取指标不触发解码
+    for channel_id, history in channel_store._messages_by_channel.loaded_items():
+        size = len(history)
+        stats = history.stats()
+        # 热尾按最近至多 200 条抽样估算平均大小，冷块按压缩后字节数计
+        sample = history.tail(200)
+        estimate = sum(record_bytes(r) for r in sample) * stats["hot"] // len(sample) if sample else 0
+        estimate += stats["coldBytes"]
+        lines.append(f"trpg_channel_messages{_labels(channel=channel_id)} {size}")
+        lines.append(f"trpg_channel_memory_bytes{_labels(channel=channel_id)} {estimate}")
+
+    lines.append("# HELP trpg_search_index_bytes Estimated memory of the full-text index per channel.")
+    lines.append("# TYPE trpg_search_index_bytes gauge")
+    for channel_id, index_stats in search_stats().items():
+        lines.append(f"trpg_search_index_bytes{_labels(channel=channel_id)} {index_stats['bytes']}")
+
+    presence = presence_tracker.stats()
+    lines.append("# HELP trpg_presence_members Members tracked by presence (this worker).")
+    lines.append("# TYPE trpg_presence_members gauge")
+    lines.append(f"trpg_presence_members {presence['members']}")
+    lines.append("# HELP trpg_presence_changes_total Presence changes before coalescing.")
+    lines.append("# TYPE trpg_presence_changes_total counter")
+    lines.append(f"trpg_presence_changes_total {presence['changes']}")
+    lines.append("# HELP trpg_presence_broadcasts_total Coalesced presence diffs broadcast.")
+    lines.append("# TYPE trpg_presence_broadcasts_total counter")
+    lines.append(f"trpg_presence_broadcasts_total {presence['broadcasts']}")
+
+    batching = emit_batcher.stats()
+    lines.append("# HELP trpg_emit_batches_total Batched messages events emitted (TRPG_EMIT_BATCH_MS > 0).")
+    lines.append("# TYPE trpg_emit_batches_total counter")
+    lines.append(f"trpg_emit_batches_total {batching['batches']}")
+    lines.append("# HELP trpg_emit_batched_messages_total Chat messages delivered in batches.")
+    lines.append("# TYPE trpg_emit_batched_messages_total counter")
+    lines.append(f"trpg_emit_batched_messages_total {batching['messages']}")
+
+    flood = flood_control.stats()
+    acl = channel_acl.stats()
+    lines.append("# HELP trpg_acl_connections Connections with cached channel permissions (this worker).")
+    lines.append("# TYPE trpg_acl_connections gauge")
+    lines.append(f"trpg_acl_connections {acl['connections']}")
+    lines.append("# HELP trpg_acl_compiles_total Times channel permissions were recompiled after catalog changes.")
+    lines.append("# TYPE trpg_acl_compiles_total counter")
+    lines.append(f"trpg_acl_compiles_total {acl['compiles']}")
+
+    lobby = lobby_feed.stats()
+    lines.append("# HELP trpg_lobby_subscribers Connections subscribed to lobby updates (this worker).")
+    lines.append("# TYPE trpg_lobby_subscribers gauge")
+    lines.append(f"trpg_lobby_subscribers {lobby['subscribers']}")
+    lines.append("# HELP trpg_lobby_broadcasts_total Lobby delta events emitted (one per filter group and change batch).")
+    lines.append("# TYPE trpg_lobby_broadcasts_total counter")
+    lines.append(f"trpg_lobby_broadcasts_total {lobby['broadcasts']}")
+
+    lines.append("# HELP trpg_flood_dropped_total Messages and rolls dropped by rate limiting, by exceeded scope.")
+    lines.append("# TYPE trpg_flood_dropped_total counter")
+    for scope, count in flood["dropped"].items():
+        lines.append(f"trpg_flood_dropped_total{_labels(scope=scope)} {count}")
+    lines.append("# HELP trpg_flood_buckets Rate-limit buckets currently held, by scope.")
+    lines.append("# TYPE trpg_flood_buckets gauge")
+    for scope, count in flood["buckets"].items():
+        lines.append(f"trpg_flood_buckets{_labels(scope=scope)} {count}")
+
+    lines.append("# HELP trpg_password_hash_pending Password verifications running or queued.")
+    lines.append("# TYPE trpg_password_hash_pending gauge")
+    hasher = password_hasher.stats()
+    lines.append(f"trpg_password_hash_pending {hasher['pending']}")
+    lines.append("# HELP trpg_password_hash_rejected_total Logins rejected with 503 (queue full or timed out).")
+    lines.append("# TYPE trpg_password_hash_rejected_total counter")
+    lines.append(f"trpg_password_hash_rejected_total {hasher['rejected'] + hasher['timeouts']}")
+
+    lines.append("# HELP trpg_characters Characters of users whose data is loaded (see trpg_snapshot_pending_entries).")
+    lines.append("# TYPE trpg_characters gauge")
+    lines.append(f"trpg_characters {sum(len(v) for _, v in _characters_by_user.loaded_items())}")
+    lines.append("# HELP trpg_snapshot_pending_entries Snapshot entries restored lazily and not decoded yet, by kind.")
+    lines.append("# TYPE trpg_snapshot_pending_entries gauge")
+    lines.append(f"trpg_snapshot_pending_entries{_labels(kind='history')} {len(channel_store._messages_by_channel.pending())}")
+    lines.append(f"trpg_snapshot_pending_entries{_labels(kind='characters')} {len(_characters_by_user.pending())}")
+    lines.append("# HELP trpg_game_rooms Lobby rooms held in memory (this worker).")
+    lines.append("# TYPE trpg_game_rooms gauge")
+    lines.append(f"trpg_game_rooms {len(_rooms)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,127 @@
+"""
+密码哈希与校验：bcrypt（可选 argon2），校验放在有界线程池中执行，不占用事件循环。
+
+bcrypt 一次校验约 100ms CPU，若在事件循环内执行，登录期间所有 Socket.IO 房间都会停顿。
+PasswordHasher.verify 把校验交给 TRPG_HASH_WORKERS 个工作线程（bcrypt / argon2 计算时释放 GIL）：
+- 同时在执行或排队的校验最多 TRPG_HASH_QUEUE 个，超出时直接拒绝；
+- 排队等待工作线程超过 TRPG_HASH_TIMEOUT 秒时放弃；
+两种情况都抛出 HasherBusy，登录接口返回 503。TRPG_HASH_WORKERS=0 时在事件循环内直接校验（仅用于对比）。
+
+生成哈希：python -m app.passwords <password>
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+try:
+    import argon2
+except ImportError:  # argon2-cffi 为可选依赖，仅在校验 $argon2 哈希时需要
+    argon2 = None
+
+HASH_WORKERS = int(os.environ.get("TRPG_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE = int(os.environ.get("TRPG_HASH_QUEUE", "64"))
+HASH_TIMEOUT = float(os.environ.get("TRPG_HASH_TIMEOUT", "2.0"))
+BCRYPT_ROUNDS = int(os.environ.get("TRPG_BCRYPT_ROUNDS", "10"))
+
+
+class HasherBusy(Exception):
+    """校验排队已满或等待超时。"""
+
+
+def _secret(password: str) -> bytes:
+    # bcrypt 只使用前 72 字节；新版 bcrypt 对更长的输入直接报错，这里按传统行为截断
+    return password.encode("utf-8")[:72]
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """生成 bcrypt 哈希（同步，供脚本与初始化使用）。"""
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds)).decode("ascii")
+
+
+def verify_password_sync(password: str, hashed: str) -> bool:
+    """同步校验，支持 bcrypt（$2a$ / $2b$ / $2y$）与 argon2（$argon2...，需安装 argon2-cffi）。"""
+    if hashed.startswith("$argon2"):
+        if argon2 is None:
+            return False
+        try:
+            return argon2.PasswordHasher().verify(hashed, password)
+        except argon2.exceptions.VerificationError:
+            return False
+        except argon2.exceptions.InvalidHashError:
+            return False
+    try:
+        return bcrypt.checkpw(_secret(password), hashed.encode("ascii"))
+    except ValueError:
+        return False
+
+
+# 用户不存在时用它做一次同样代价的校验，避免通过响应时间判断用户名是否存在
+_DUMMY_HASH = "$2b$10$ChLbiygDl20vm8KkrcR3LuT7EHRELZgiXRKilXGHu/fZeXXghJYXy"
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = HASH_WORKERS, max_queue: int = HASH_QUEUE, timeout: float = HASH_TIMEOUT) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 工作线程名额；在事件循环内首次使用时创建
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.completed = 0
+
+    async def verify(self, password: str, hashed: Optional[str]) -> bool:
+        """在线程池中校验密码；hashed 为 None（用户不存在）时校验占位哈希并返回 False。"""
+        if self.workers <= 0:
+            ok = verify_password_sync(password, hashed or _DUMMY_HASH)
+            self.completed += 1
+            return ok and hashed is not None
+        if self._pending >= self.max_queue:
+            self.rejected += 1
+            raise HasherBusy()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._pending += 1
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise HasherBusy()
+            try:
+                ok = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, verify_password_sync, password, hashed or _DUMMY_HASH
+                )
+            finally:
+                self._slots.release()
+        finally:
+            self._pending -= 1
+        self.completed += 1
+        return ok and hashed is not None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self._pending,
+            "maxQueue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+password_hasher = PasswordHasher()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python -m app.passwords <password>", file=sys.stderr)
+        sys.exit(2)
+    print(hash_password(sys.argv[1]))
@@ -0,0 +1,238 @@
+"""
+聊天历史的 SQLite 持久化（write-behind）。
+
+- channel_store.append_message 只调用 enqueue 把消息放入内存待写队列，不阻塞事件循环；
+- 后台 asyncio 任务在攒够 batch_size 条或等待 flush_interval 秒后，
+  在单独的写线程中批量 INSERT（SQLite WAL 模式，读写互不阻塞）；
+- 启动时 load_tails 恢复各频道最新一段消息到内存，更早的分页走 (channel_id, seq) 索引查询；
+- 关闭时 close 会把剩余消息全部写完；
+- 写入失败时整批放回队首，按指数退避重试至多 max_retries 次；之后（以及违反唯一索引等不可重试的错误时）
+  改为逐条写入，仍失败的消息记录日志后丢弃，不会让一批坏数据堵住之后的全部写入。
+
+由环境变量 TRPG_DATABASE_URL 开启，例如 `sqlite:///./trpg.db`。
+"""
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    event,
+    func,
+    insert,
+    select,
+)
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+messages_table = Table(
+    "channel_messages",
+    metadata,
+    Column("pk", Integer, primary_key=True, autoincrement=True),
+    Column("channel_id", String(128), nullable=False),
+    # 频道内序号，与内存中 ChannelHistory 的绝对序号一致
+    Column("seq", Integer, nullable=False),
+    Column("msg_id", String(128)),
+    Column("body", Text, nullable=False),
+    Index("ix_channel_messages_channel_seq", "channel_id", "seq", unique=True),
+    Index("ix_channel_messages_channel_msg", "channel_id", "msg_id"),
+)
+
+
+def _set_sqlite_pragma(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _decode(body: str) -> Dict[str, Any]:
+    return json.loads(body)
+
+
+class MessagePersistence:
+    def __init__(
+        self,
+        url: str,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        max_retries: int = 5,
+        max_backoff: float = 30.0,
+    ) -> None:
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, connect_args=connect_args)
+        if url.startswith("sqlite"):
+            event.listen(self.engine, "connect", _set_sqlite_pragma)
+        metadata.create_all(self.engine)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max(0, max_retries)
+        self.max_backoff = max_backoff
+        # 队首批次连续失败的次数
+        self._failures = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # 单线程写入，保证批次按顺序落库
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trpg-db-writer")
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    # ----- 写入 -----
+
+    def enqueue(self, channel_id: str, seq: int, msg: Dict[str, Any]) -> None:
+        """加入待写队列；达到批量大小时唤醒后台任务。"""
+        msg_id = msg.get("id")
+        self._pending.append(
+            {
+                "channel_id": channel_id,
+                "seq": seq,
+                "msg_id": None if msg_id is None else str(msg_id),
+                "body": json.dumps(msg, ensure_ascii=False),
+            }
+        )
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                delay = min(self.flush_interval * 2 ** self._failures, self.max_backoff)
+                logger.exception("写入聊天历史失败（第 %d 次），%.1f 秒后重试", self._failures, delay)
+                await asyncio.sleep(delay)
+
+    async def flush(self) -> None:
+        """
+        把当前待写队列分批交给写线程。可重试的失败把该批放回队首并抛出，由 _run 退避后重试；
+        违反约束或已重试 max_retries 次的批次逐条写入，写不进的消息丢弃。
+        """
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = self._pending[: self.batch_size]
+            del self._pending[: len(batch)]
+            try:
+                await loop.run_in_executor(self._executor, self._write, batch)
+            except IntegrityError:
+                await loop.run_in_executor(self._executor, self._write_each, batch)
+            except Exception:
+                self._failures += 1
+                if self._failures <= self.max_retries:
+                    self._pending[:0] = batch
+                    raise
+                await loop.run_in_executor(self._executor, self._write_each, batch)
+            self._failures = 0
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(insert(messages_table), batch)
+        self.written += len(batch)
+        self.batches += 1
+
+    def _write_each(self, batch: List[Dict[str, Any]]) -> None:
+        """逐条各自提交；失败的行记录日志后丢弃。"""
+        for row in batch:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(messages_table), [row])
+            except Exception:
+                self.dropped += 1
+                logger.exception(
+                    "丢弃无法写入的消息 channel=%s seq=%s id=%s body=%.200s",
+                    row["channel_id"],
+                    row["seq"],
+                    row["msg_id"],
+                    row["body"],
+                )
+            else:
+                self.written += 1
+        self.batches += 1
+
+    async def close(self) -> None:
+        """停止后台任务并写完剩余消息（关闭钩子）。"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+        self.engine.dispose()
+
+    # ----- 读取 -----
+
+    def load_tails(self, limit: int) -> Iterator[Tuple[str, int, List[Dict[str, Any]]]]:
+        """启动恢复：逐频道返回 (channel_id, 首条序号, 最新 limit 条消息)。"""
+        with self.engine.connect() as conn:
+            tops = conn.execute(
+                select(messages_table.c.channel_id, func.max(messages_table.c.seq)).group_by(
+                    messages_table.c.channel_id
+                )
+            ).all()
+            for channel_id, max_seq in tops:
+                start = max(0, max_seq + 1 - limit)
+                rows = conn.execute(
+                    select(messages_table.c.seq, messages_table.c.body)
+                    .where(messages_table.c.channel_id == channel_id, messages_table.c.seq >= start)
+                    .order_by(messages_table.c.seq)
+                ).all()
+                if rows:
+                    yield channel_id, rows[0][0], [_decode(body) for _, body in rows]
+
+    def position(self, channel_id: str, msg_id: str) -> Optional[int]:
+        """消息 id → 频道内序号。"""
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(func.max(messages_table.c.seq)).where(
+                    messages_table.c.channel_id == channel_id,
+                    messages_table.c.msg_id == str(msg_id),
+                )
+            ).scalar()
+
+    def fetch_range(self, channel_id: str, lo: int, hi: int) -> List[Dict[str, Any]]:
+        """按序号区间 [lo, hi) 读取消息，走 (channel_id, seq) 索引。"""
+        if hi <= lo:
+            return []
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(messages_table.c.body)
+                .where(
+                    messages_table.c.channel_id == channel_id,
+                    messages_table.c.seq >= lo,
+                    messages_table.c.seq < hi,
+                )
+                .order_by(messages_table.c.seq)
+            ).scalars()
+            return [_decode(body) for body in rows]
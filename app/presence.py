@@ -0,0 +1,211 @@
+"""
+频道在线状态（presence）：每个频道的在线成员、正在输入状态与当前发言角色。
+
+- 成员按用户区分（已登录为 "u:<username>"，匿名连接为 "s:<sid>"），同一用户多个连接合并为一个成员；
+- join / leave / 断线 / 输入状态 / 切换角色只标记「脏」成员，不立即广播；
+- 每 TRPG_PRESENCE_WINDOW 秒（默认 0.25）合并一次：逐个比较脏成员的当前状态与上次广播的状态，
+  每个频道至多发一条 diff：{ channelId, joined: [...], updated: [...], left: [id...] }。
+  窗口内断开又重连的成员状态不变，不产生任何事件，避免 30 人房间网络抖动后的 O(n²) 事件风暴；
+- 正在输入状态 TRPG_TYPING_TTL 秒（默认 6）未刷新自动清除。
+
+多 worker 部署时每个 worker 只跟踪本 worker 的连接：diff 经总线推送给所有 worker 上的频道成员，
+join 时的成员快照与 GET /api/channels/:channelId/presence 只含本 worker 的成员。
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_WINDOW = float(os.environ.get("TRPG_PRESENCE_WINDOW", "0.25"))
+TYPING_TTL = float(os.environ.get("TRPG_TYPING_TTL", "6"))
+
+# (userName, character, typing)
+State = Tuple[str, Optional[str], bool]
+Emit = Callable[[Dict[str, Any], str], Awaitable[None]]
+
+
+class _Member:
+    __slots__ = ("id", "user_name", "character", "typing_until", "sids", "published")
+
+    def __init__(self, member_id: str, user_name: str) -> None:
+        self.id = member_id
+        self.user_name = user_name
+        self.character: Optional[str] = None
+        self.typing_until = 0.0
+        self.sids: Set[str] = set()
+        # 上次广播出去的状态；None 表示客户端尚不知道该成员
+        self.published: Optional[State] = None
+
+    def state(self, now: float) -> State:
+        return (self.user_name, self.character, self.typing_until > now)
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {"id": self.id, "userName": self.user_name, "character": self.character, "typing": self.typing_until > now}
+
+
+class PresenceTracker:
+    def __init__(self, window: float = PRESENCE_WINDOW, typing_ttl: float = TYPING_TTL) -> None:
+        self.window = window
+        self.typing_ttl = typing_ttl
+        self._emit: Optional[Emit] = None
+        # channelId → { memberId → _Member }
+        self._channels: Dict[str, Dict[str, _Member]] = {}
+        # sid → { channelId: memberId }
+        self._by_sid: Dict[str, Dict[str, str]] = {}
+        # channelId → 待比较的成员（包括已离开、仍需广播 left 的成员）
+        self._dirty: Dict[str, Dict[str, _Member]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.changes = 0
+        self.broadcasts = 0
+
+    def bind(self, emit: Emit) -> None:
+        """注入广播函数 emit(diff, channelId)。"""
+        self._emit = emit
+
+    # ----- 状态变更（只标脏） -----
+
+    def join(self, channel_id: str, sid: str, member_id: str, user_name: str, character: Optional[str] = None) -> None:
+        members = self._channels.setdefault(channel_id, {})
+        member = members.get(member_id)
+        if member is None:
+            # 窗口内刚离开的成员仍在 _dirty 中，复用以保留 published，重连不产生事件
+            member = self._dirty.get(channel_id, {}).get(member_id) or _Member(member_id, user_name)
+            members[member_id] = member
+        member.sids.add(sid)
+        if character is not None:
+            member.character = character
+        self._by_sid.setdefault(sid, {})[channel_id] = member_id
+        self._mark(channel_id, member)
+
+    def leave(self, channel_id: str, sid: str) -> None:
+        member_id = self._by_sid.get(sid, {}).pop(channel_id, None)
+        if member_id is None:
+            return
+        if not self._by_sid[sid]:
+            del self._by_sid[sid]
+        members = self._channels.get(channel_id, {})
+        member = members.get(member_id)
+        if member is None:
+            return
+        member.sids.discard(sid)
+        if not member.sids:
+            del members[member_id]
+            if not members:
+                del self._channels[channel_id]
+            member.typing_until = 0.0
+        self._mark(channel_id, member)
+
+    def disconnect(self, sid: str) -> None:
+        for channel_id in list(self._by_sid.get(sid, {})):
+            self.leave(channel_id, sid)
+
+    def update(self, channel_id: str, sid: str, typing: Optional[bool] = None, character: Optional[str] = None) -> None:
+        """修改输入状态 / 发言角色；sid 未加入该频道时忽略。"""
+        member = self._member(channel_id, sid)
+        if member is None:
+            return
+        changed = False
+        if typing:
+            member.typing_until = time.monotonic() + self.typing_ttl
+            self._expire_later(channel_id, member)
+            changed = True
+        elif typing is not None and member.typing_until:
+            member.typing_until = 0.0
+            changed = True
+        if character is not None and (character or None) != member.character:
+            member.character = character or None
+            changed = True
+        if changed:
+            self._mark(channel_id, member)
+
+    def _member(self, channel_id: str, sid: str) -> Optional[_Member]:
+        member_id = self._by_sid.get(sid, {}).get(channel_id)
+        if member_id is None:
+            return None
+        return self._channels.get(channel_id, {}).get(member_id)
+
+    def _expire_later(self, channel_id: str, member: _Member) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        # 到期时重新比较一次；期间若已刷新 typing，比较结果不变即不广播
+        loop.call_later(self.typing_ttl + 0.01, self._mark, channel_id, member)
+
+    def _mark(self, channel_id: str, member: _Member) -> None:
+        self.changes += 1
+        self._dirty.setdefault(channel_id, {})[member.id] = member
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self.window > 0:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        else:
+            self._flush_handle = loop.call_soon(self._flush)
+
+    # ----- 合并广播 -----
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        dirty, self._dirty = self._dirty, {}
+        now = time.monotonic()
+        for channel_id, candidates in dirty.items():
+            diff = self._diff(channel_id, candidates, now)
+            if diff is not None and self._emit is not None:
+                self.broadcasts += 1
+                asyncio.ensure_future(self._send(diff, channel_id))
+
+    def _diff(self, channel_id: str, candidates: Dict[str, _Member], now: float) -> Optional[Dict[str, Any]]:
+        members = self._channels.get(channel_id, {})
+        joined: List[Dict[str, Any]] = []
+        updated: List[Dict[str, Any]] = []
+        left: List[str] = []
+        for member_id, member in candidates.items():
+            present = members.get(member_id) is member
+            if not present:
+                if member.published is not None:
+                    left.append(member_id)
+                    member.published = None
+                continue
+            state = member.state(now)
+            if state == member.published:
+                continue
+            (updated if member.published is not None else joined).append(member.to_dict(now))
+            member.published = state
+        if not (joined or updated or left):
+            return None
+        return {"channelId": channel_id, "joined": joined, "updated": updated, "left": left}
+
+    async def _send(self, diff: Dict[str, Any], channel_id: str) -> None:
+        try:
+            await self._emit(diff, channel_id)
+        except Exception:
+            logger.exception("presence broadcast failed")
+
+    # ----- 查询 -----
+
+    def members(self, channel_id: str) -> List[Dict[str, Any]]:
+        """频道当前在线成员（完整列表）。"""
+        now = time.monotonic()
+        return [m.to_dict(now) for m in self._channels.get(channel_id, {}).values()]
+
+    def snapshot(self, channel_id: str) -> Dict[str, Any]:
+        """完整状态，加入频道时单独发给该连接：{ channelId, full: true, members: [...] }。"""
+        return {"channelId": channel_id, "full": True, "members": self.members(channel_id)}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._channels),
+            "members": sum(len(m) for m in self._channels.values()),
+            "changes": self.changes,
+            "broadcasts": self.broadcasts,
+        }
+
+
+presence_tracker = PresenceTracker()
@@ -1,42 +1,283 @@
 from __future__ import annotations
 
-from typing import Dict, Set
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
 
 from fastapi import WebSocket
 
+from .bus import MessageBus, bus
+from .timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+# 慢消费者策略：队列满时
+# - drop_oldest：丢弃队列中最旧的一条再入队
+# - coalesce：丢弃全部积压，只保留最新一条
+# - disconnect：断开该连接
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+# 空闲检测（idle_timeout > 0 时开启，默认关闭）：连接空闲 idle_timeout / 2 秒时发一条 PING_TEXT，
+# idle_timeout 秒内仍没有收到任何消息即断开。客户端回复 PONG_TEXTS 中的任一文本（不广播）或发送任何消息都算活动；
+# 协议层的 ping 帧由 ASGI 服务器处理，应用收不到，不算活动，因此只适合会回 pong 的客户端
+PING_TEXT = json.dumps({"type": "ping"})
+PONG_TEXTS = frozenset((json.dumps({"type": "pong"}), '{"type":"pong"}'))
+
+
+class _Outbox:
+    """单个连接的发送队列与专属写协程。"""
+
+    __slots__ = ("websocket", "room_id", "queue", "ready", "task", "sent", "dropped", "last_active", "pinged")
+
+    def __init__(self, websocket: WebSocket, room_id: str) -> None:
+        self.websocket = websocket
+        self.room_id = room_id
+        self.queue: Deque[str] = deque()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        # 最后一次收到客户端消息的时刻（monotonic），以及此后是否已发过 ping
+        self.last_active = time.monotonic()
+        self.pinged = False
+
 
 class RoomConnectionManager:
     """
     简单的内存版房间连接管理器：
-    - 每个 room_id 对应一个 WebSocket 连接集合
+    - 每个 room_id 对应一组 WebSocket 连接
     - 提供加入 / 离开 / 广播等方法
+    - 广播只把消息放入各连接的有界队列，由每个连接自己的写协程发送，
+      慢客户端不会拖慢同房间其他人，也不会阻塞调用方的接收循环
+    - 广播经由消息总线（topic "ws.room"）发布，多 worker 时其他 worker 上的同房间连接也会收到
+    - 空闲检测：所有连接共用一个时间轮与一个定时协程（见 timing_wheel.py），每格只检查到期的连接；
+      空闲过半时发 ping，超过 idle_timeout 断开（半开的移动端连接不会一直留在 rooms 中拖慢广播）
+    - 准入：每个房间至多 max_per_room 个、本进程至多 max_connections 个连接（0 为不限），超出时以 1013 拒绝
     """
 
-    def __init__(self) -> None:
-        self.rooms: Dict[str, Set[WebSocket]] = {}
+    def __init__(
+        self,
+        queue_size: int = 64,
+        policy: str = "drop_oldest",
+        message_bus: Optional[MessageBus] = None,
+        idle_timeout: float = 0.0,
+        tick: float = 1.0,
+        max_per_room: int = 0,
+        max_connections: int = 0,
+    ) -> None:
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"unknown slow consumer policy: {policy}")
+        self.queue_size = max(1, queue_size)
+        self.policy = policy
+        self.rooms: Dict[str, Dict[WebSocket, _Outbox]] = {}
+        self.connections = 0
+        self.idle_timeout = idle_timeout
+        self.max_per_room = max_per_room
+        self.max_connections = max_connections
+        self._tick = tick
+        self._wheel: Optional[TimingWheel] = None
+        self._ticker: Optional[asyncio.Task] = None
+        # 累计计数
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.rejected = 0
+        self.pings = 0
+        self.reaped = 0
+        self.bus = message_bus
+        if message_bus is not None:
+            message_bus.subscribe("ws.room", self._on_bus_message)
 
-    async def connect(self, room_id: str, websocket: WebSocket) -> None:
+    async def connect(self, room_id: str, websocket: WebSocket) -> bool:
+        """接受连接并加入房间；超出准入上限时以 1013 关闭并返回 False。"""
+        room = self.rooms.get(room_id)
+        if (self.max_connections and self.connections >= self.max_connections) or (
+            self.max_per_room and room is not None and len(room) >= self.max_per_room
+        ):
+            self.rejected += 1
+            await websocket.accept()
+            await self._close(websocket, 1013)
+            return False
         await websocket.accept()
-        self.rooms.setdefault(room_id, set()).add(websocket)
+        outbox = _Outbox(websocket, room_id)
+        outbox.task = asyncio.create_task(self._writer(room_id, outbox))
+        self.rooms.setdefault(room_id, {})[websocket] = outbox
+        self.connections += 1
+        if self.idle_timeout > 0:
+            self._watch(outbox)
+        return True
+
+    def touch(self, room_id: str, websocket: WebSocket) -> None:
+        """收到客户端消息时调用：刷新最后活动时间（O(1)，不移动时间轮中的位置）。"""
+        outbox = self.rooms.get(room_id, {}).get(websocket)
+        if outbox is not None:
+            outbox.last_active = time.monotonic()
+            outbox.pinged = False
 
     def disconnect(self, room_id: str, websocket: WebSocket) -> None:
         connections = self.rooms.get(room_id)
         if not connections:
             return
-        connections.discard(websocket)
+        outbox = connections.pop(websocket, None)
+        if outbox is not None:
+            self.connections -= 1
+            if self._wheel is not None:
+                self._wheel.cancel(outbox)
+            if outbox.task is not None and outbox.task is not asyncio.current_task():
+                outbox.task.cancel()
         if not connections:
             # 房间无人时清理
             self.rooms.pop(room_id, None)
 
-    async def broadcast(self, room_id: str, message: str) -> None:
-        connections = self.rooms.get(room_id, set()).copy()
-        for ws in connections:
+    # ----- 空闲检测 -----
+
+    def _watch(self, outbox: _Outbox) -> None:
+        if self._wheel is None:
+            # 跨度覆盖 idle_timeout，另留两格余量
+            slots = int(self.idle_timeout / self._tick) + 2
+            self._wheel = TimingWheel(self._tick, slots, time.monotonic())
+        if self._ticker is None or self._ticker.done():
+            # 定时协程在无连接时退出；重新启动前把时间轮推进到当前时刻
+            self._wheel.advance(time.monotonic())
+            self._ticker = asyncio.create_task(self._run_wheel())
+        self._wheel.schedule(outbox, outbox.last_active + self.idle_timeout / 2)
+
+    async def _run_wheel(self) -> None:
+        while self.connections:
+            await asyncio.sleep(self._tick)
             try:
-                await ws.send_text(message)
+                self.check_idle(time.monotonic())
             except Exception:
-                # 异常时移除连接
-                self.disconnect(room_id, ws)
+                logger.exception("idle connection check failed")
+
+    def check_idle(self, now: float) -> None:
+        """处理时间轮中到期的连接：空闲过半发 ping，超时断开，否则按最后活动时间重新排期。"""
+        wheel = self._wheel
+        if wheel is None:
+            return
+        half = self.idle_timeout / 2
+        for outbox in wheel.advance(now):
+            if self.rooms.get(outbox.room_id, {}).get(outbox.websocket) is not outbox:
+                continue
+            idle = now - outbox.last_active
+            if idle >= self.idle_timeout:
+                self.reaped += 1
+                self.disconnect(outbox.room_id, outbox.websocket)
+                asyncio.create_task(self._close(outbox.websocket, 1001))
+                continue
+            if idle >= half and not outbox.pinged:
+                outbox.pinged = True
+                self.pings += 1
+                self.send(outbox.room_id, outbox.websocket, PING_TEXT)
+            deadline = outbox.last_active + (self.idle_timeout if outbox.pinged else half)
+            wheel.schedule(outbox, deadline)
+
+    def send(self, room_id: str, websocket: WebSocket, message: str) -> None:
+        """只发给一个连接（经该连接的发送队列；队列已满时丢弃）。"""
+        outbox = self.rooms.get(room_id, {}).get(websocket)
+        if outbox is None or len(outbox.queue) >= self.queue_size:
+            return
+        outbox.queue.append(message)
+        outbox.ready.set()
+
+    async def broadcast(self, room_id: str, message: str) -> None:
+        if self.bus is None:
+            self._fanout(room_id, message)
+        else:
+            await self.bus.publish("ws.room", {"room": room_id, "text": message})
+
+    async def _on_bus_message(self, payload: Dict[str, str], local: bool) -> None:
+        self._fanout(payload["room"], payload["text"])
+
+    def _fanout(self, room_id: str, message: str) -> None:
+        """把消息放入本 worker 上该房间每个连接的发送队列。"""
+        connections = self.rooms.get(room_id)
+        if not connections:
+            return
+        slow = []
+        for outbox in connections.values():
+            queue = outbox.queue
+            if len(queue) >= self.queue_size:
+                if self.policy == "drop_oldest":
+                    queue.popleft()
+                    outbox.dropped += 1
+                    self.dropped += 1
+                elif self.policy == "coalesce":
+                    outbox.dropped += len(queue)
+                    self.dropped += len(queue)
+                    queue.clear()
+                else:
+                    slow.append(outbox)
+                    continue
+            queue.append(message)
+            outbox.ready.set()
+        for outbox in slow:
+            self._drop_slow(room_id, outbox)
+
+    def _drop_slow(self, room_id: str, outbox: _Outbox) -> None:
+        self.slow_disconnects += 1
+        self.dropped += len(outbox.queue) + 1
+        self.disconnect(room_id, outbox.websocket)
+        # 1013 Try Again Later：提示客户端稍后重连
+        asyncio.create_task(self._close(outbox.websocket, 1013))
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int) -> None:
+        try:
+            # 半开连接上的关闭握手可能一直等不到回应
+            await asyncio.wait_for(websocket.close(code=code), 5)
+        except Exception:
+            pass
+
+    async def _writer(self, room_id: str, outbox: _Outbox) -> None:
+        queue = outbox.queue
+        websocket = outbox.websocket
+        try:
+            while True:
+                if not queue:
+                    outbox.ready.clear()
+                    await outbox.ready.wait()
+                    continue
+                await websocket.send_text(queue.popleft())
+                outbox.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # 异常时移除连接
+            self.disconnect(room_id, websocket)
 
+    def stats(self) -> Dict[str, object]:
+        """各房间连接数、排队深度，以及累计丢弃与因过慢被断开的次数。"""
+        rooms = {}
+        for room_id, connections in self.rooms.items():
+            depths = [len(o.queue) for o in connections.values()]
+            rooms[room_id] = {
+                "connections": len(depths),
+                "queued": sum(depths),
+                "maxQueueDepth": max(depths, default=0),
+            }
+        return {
+            "policy": self.policy,
+            "queueSize": self.queue_size,
+            "connections": self.connections,
+            "dropped": self.dropped,
+            "slowDisconnects": self.slow_disconnects,
+            "rejected": self.rejected,
+            "pings": self.pings,
+            "reaped": self.reaped,
+            "rooms": rooms,
+        }
 
-room_manager = RoomConnectionManager()
 
+room_manager = RoomConnectionManager(
+    queue_size=int(os.environ.get("TRPG_WS_QUEUE_SIZE", "64")),
+    policy=os.environ.get("TRPG_WS_SLOW_POLICY", "drop_oldest"),
+    message_bus=bus,
+    idle_timeout=float(os.environ.get("TRPG_WS_IDLE_TIMEOUT", "0")),
+    tick=float(os.environ.get("TRPG_WS_WHEEL_TICK", "1")),
+    max_per_room=int(os.environ.get("TRPG_WS_MAX_PER_ROOM", "0")),
+    max_connections=int(os.environ.get("TRPG_WS_MAX_CONNECTIONS", "0")),
+)
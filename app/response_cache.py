@@ -0,0 +1,153 @@
+"""
+读多写少接口的响应缓存：数据只序列化一次为 JSON bytes，附带强 ETag。
+
+- 客户端带 If-None-Match 且与当前 ETag 一致时直接返回 304；
+- 正文超过 MIN_COMPRESS_SIZE 时按 Accept-Encoding 协商 br（需安装 brotli）或 gzip，压缩结果同样缓存；
+- 数据变化时调用 invalidate(key)，或在 respond 时传入 version，版本号变化即自动重建。
+
+用法（路由内，鉴权依赖照常执行）：
+
+    return response_cache.respond(request, "game-rooms:tags", lambda: {"ok": True, "tags": AVAILABLE_TAGS})
+"""
+import gzip
+import hashlib
+import json
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024
+
+
+class _Entry:
+    __slots__ = ("version", "body", "etag", "encoded")
+
+    def __init__(self, version: Optional[Hashable], body: bytes) -> None:
+        self.version = version
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        # content-coding → (压缩后正文, 该表示的 ETag)
+        self.encoded: Dict[str, tuple] = {}
+
+    def variant(self, coding: str) -> tuple:
+        cached = self.encoded.get(coding)
+        if cached is None:
+            if coding == "br":
+                data = brotli.compress(self.body)
+            else:
+                data = gzip.compress(self.body, compresslevel=6)
+            # 不同编码是不同的表示，强 ETag 需区分
+            cached = self.encoded[coding] = (data, self.etag[:-1] + "-" + coding + '"')
+        return cached
+
+    def etags(self):
+        yield self.etag
+        for _, etag in self.encoded.values():
+            yield etag
+
+
+def _accepted_codings(request: Request) -> set:
+    """Accept-Encoding 中 q 值大于 0 的编码。"""
+    codings = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        codings.add(token)
+    return codings
+
+
+def _matching_etag(request: Request, entry: _Entry) -> Optional[str]:
+    """If-None-Match 命中某个表示时返回其 ETag。"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    if header.strip() == "*":
+        return entry.etag
+    tags = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        tags.add(tag[2:] if tag.startswith("W/") else tag)
+    for etag in entry.etags():
+        if etag in tags:
+            return etag
+    return None
+
+
+class ResponseCache:
+    def __init__(self, min_compress_size: int = MIN_COMPRESS_SIZE) -> None:
+        self.min_compress_size = min_compress_size
+        self._entries: Dict[str, _Entry] = {}
+        self.hits = 0
+        self.builds = 0
+        self.not_modified = 0
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """使某个 key（缺省为全部）的缓存失效，下次请求重新序列化。"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _entry(self, key: str, build: Callable[[], Any], version: Optional[Hashable]) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            self.hits += 1
+            return entry
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = self._entries[key] = _Entry(version, body)
+        self.builds += 1
+        return entry
+
+    def respond(
+        self,
+        request: Request,
+        key: str,
+        build: Callable[[], Any],
+        version: Optional[Hashable] = None,
+    ) -> Response:
+        entry = self._entry(key, build, version)
+        headers = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+        matched = _matching_etag(request, entry)
+        if matched is not None:
+            self.not_modified += 1
+            headers["ETag"] = matched
+            return Response(status_code=304, headers=headers)
+
+        body, etag = entry.body, entry.etag
+        if len(body) >= self.min_compress_size:
+            codings = _accepted_codings(request)
+            coding = None
+            if brotli is not None and "br" in codings:
+                coding = "br"
+            elif "gzip" in codings:
+                coding = "gzip"
+            if coding is not None:
+                body, etag = entry.variant(coding)
+                headers["Content-Encoding"] = coding
+        headers["ETag"] = etag
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "builds": self.builds,
+            "notModified": self.not_modified,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,255 @@
+"""
+大厅房间的内存索引，供 GET /api/game-rooms 过滤与分页。
+
+- 每个房间按创建顺序分配序号 seq，游标分页即“从某个 seq 之后取 limit 条”；
+- status 为精确匹配的二级索引（status → 升序 seq 列表）；
+- keyword / module 为子串匹配，用字符 n-gram（单字 + 相邻二字）倒排索引（gram → 升序 seq 列表）求候选，
+  再对候选逐个校验子串，结果与逐个 `in` 比较完全一致；按字符切分对“亡蝶葬仪”这类中文名同样有效；
+- 查询时各倒排列表从游标处二分定位，逐个跳到共同的下一个 seq（多个 status 取并），凑满一页即停止，
+  带过滤条件的一页耗时与页大小相关，与房间总数基本无关。
+"""
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+Room = Dict[str, Any]
+
+# 参与 keyword 搜索的字段（与原 list_rooms 一致）
+KEYWORD_FIELDS = ("name", "description", "owner", "module")
+# 参与 module 过滤的字段
+MODULE_FIELDS = ("module", "moduleIcon")
+
+
+def _grams(texts: Iterable[str]) -> Set[str]:
+    grams: Set[str] = set()
+    for text in texts:
+        text = text.lower()
+        grams.update(text)
+        grams.update(text[i : i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def _insert(postings: Dict[str, List[int]], key: str, seq: int) -> None:
+    posting = postings.get(key)
+    if posting is None:
+        postings[key] = [seq]
+    elif posting[-1] < seq:
+        # 新建房间的 seq 最大，直接追加
+        posting.append(seq)
+    else:
+        insort(posting, seq)
+
+
+def _delete(postings: Dict[str, List[int]], key: str, seq: int) -> None:
+    posting = postings.get(key)
+    if posting is None:
+        return
+    i = bisect_left(posting, seq)
+    if i < len(posting) and posting[i] == seq:
+        del posting[i]
+        if not posting:
+            del postings[key]
+
+
+def _next_at_least(group: List[List[int]], seq: int) -> Optional[int]:
+    """group 内各升序列表的并集中 >= seq 的最小值，没有时返回 None。"""
+    found = None
+    for posting in group:
+        i = bisect_left(posting, seq)
+        if i < len(posting) and (found is None or posting[i] < found):
+            found = posting[i]
+    return found
+
+
+class NgramIndex:
+    """n-gram → 升序 seq 列表的倒排索引，每个字段单独切分，不产生跨字段的 gram。"""
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, List[int]] = {}
+
+    def add(self, seq: int, texts: Iterable[str]) -> None:
+        for g in _grams(texts):
+            _insert(self._postings, g, seq)
+
+    def remove(self, seq: int, texts: Iterable[str]) -> None:
+        for g in _grams(texts):
+            _delete(self._postings, g, seq)
+
+    def replace(self, seq: int, old_texts: Iterable[str], new_texts: Iterable[str]) -> None:
+        """只增删前后不同的 gram（常见 gram 的列表很长，增删要移动整段）。"""
+        old, new = _grams(old_texts), _grams(new_texts)
+        for g in old - new:
+            _delete(self._postings, g, seq)
+        for g in new - old:
+            _insert(self._postings, g, seq)
+
+    def postings(self, query: str) -> Optional[List[List[int]]]:
+        """
+        可能包含 query（已小写）的房间须同时出现在返回的各列表中（交集是真实结果的超集），
+        按长度升序；某个 gram 不存在时返回 None。
+        """
+        if len(query) == 1:
+            grams = [query]
+        else:
+            grams = list({query[i : i + 2] for i in range(len(query) - 1)})
+        postings = []
+        for g in grams:
+            posting = self._postings.get(g)
+            if not posting:
+                return None
+            postings.append(posting)
+        postings.sort(key=len)
+        return postings
+
+
+def _field_texts(room: Room, fields: Tuple[str, ...]) -> List[str]:
+    return [room.get(f) or "" for f in fields]
+
+
+def _contains(room: Room, fields: Tuple[str, ...], query: str) -> bool:
+    return any(query in (room.get(f) or "").lower() for f in fields)
+
+
+def room_matches(
+    room: Room, keyword: Optional[str] = None, statuses: Optional[Set[str]] = None, module: Optional[str] = None
+) -> bool:
+    """单个房间是否满足与 RoomIndex.query 相同的过滤条件（供大厅推送判断变更影响哪些订阅）。"""
+    if statuses and (room.get("status") or "") not in statuses:
+        return False
+    k = (keyword or "").strip().lower()
+    if k and not _contains(room, KEYWORD_FIELDS, k):
+        return False
+    m = (module or "").strip().lower()
+    return not m or _contains(room, MODULE_FIELDS, m)
+
+
+class RoomIndex:
+    def __init__(self, rooms: Dict[str, Room]) -> None:
+        # rooms 为对外的 id → room 存储，本索引与之保持同步
+        self.rooms = rooms
+        self._seq_by_id: Dict[str, int] = {}
+        # 下标即 seq，删除的房间留空位
+        self._ids: List[Optional[str]] = []
+        self._by_status: Dict[str, List[int]] = {}
+        self._keyword = NgramIndex()
+        self._module = NgramIndex()
+        for room in list(rooms.values()):
+            self.add(room)
+
+    def __len__(self) -> int:
+        return len(self._seq_by_id)
+
+    def _index(self, seq: int, room: Room) -> None:
+        _insert(self._by_status, room.get("status") or "", seq)
+        self._keyword.add(seq, _field_texts(room, KEYWORD_FIELDS))
+        self._module.add(seq, _field_texts(room, MODULE_FIELDS))
+
+    def _unindex(self, seq: int, room: Room) -> None:
+        _delete(self._by_status, room.get("status") or "", seq)
+        self._keyword.remove(seq, _field_texts(room, KEYWORD_FIELDS))
+        self._module.remove(seq, _field_texts(room, MODULE_FIELDS))
+
+    def add(self, room: Room) -> None:
+        room_id = room["id"]
+        if room_id in self._seq_by_id:
+            self.remove(room_id)
+        seq = len(self._ids)
+        self._ids.append(room_id)
+        self._seq_by_id[room_id] = seq
+        self.rooms[room_id] = room
+        self._index(seq, room)
+
+    def update(self, room_id: str, changes: Dict[str, Any]) -> Optional[Room]:
+        """修改房间字段（如 status、currentPlayers）并重建该房间的索引项，保持原有顺序。"""
+        room = self.rooms.get(room_id)
+        if room is None:
+            return None
+        seq = self._seq_by_id[room_id]
+        status = room.get("status") or ""
+        keyword_texts = _field_texts(room, KEYWORD_FIELDS)
+        module_texts = _field_texts(room, MODULE_FIELDS)
+        room.update(changes)
+        # 只重建变化了的索引项：人数等不参与过滤的字段变化时不动倒排表
+        if (room.get("status") or "") != status:
+            _delete(self._by_status, status, seq)
+            _insert(self._by_status, room.get("status") or "", seq)
+        new_texts = _field_texts(room, KEYWORD_FIELDS)
+        if new_texts != keyword_texts:
+            self._keyword.replace(seq, keyword_texts, new_texts)
+        new_texts = _field_texts(room, MODULE_FIELDS)
+        if new_texts != module_texts:
+            self._module.replace(seq, module_texts, new_texts)
+        return room
+
+    def remove(self, room_id: str) -> Optional[Room]:
+        room = self.rooms.pop(room_id, None)
+        seq = self._seq_by_id.pop(room_id, None)
+        if room is None or seq is None:
+            return room
+        self._ids[seq] = None
+        self._unindex(seq, room)
+        return room
+
+    def query(
+        self,
+        keyword: Optional[str] = None,
+        statuses: Optional[Set[str]] = None,
+        module: Optional[str] = None,
+        after: int = -1,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Room], Optional[int]]:
+        """
+        按条件取 seq > after 的房间，按创建顺序返回至多 limit 条；
+        第二个返回值为下一页的 after（没有更多时为 None）。
+        """
+        k = (keyword or "").strip().lower()
+        m = (module or "").strip().lower()
+        # 每组内取并、组间取交：statuses 为一组，keyword / module 的每个 gram 各为一组
+        groups: List[List[List[int]]] = []
+        if statuses:
+            group = [self._by_status[s] for s in statuses if s in self._by_status]
+            if not group:
+                return [], None
+            groups.append(group)
+        for index, query in ((self._keyword, k), (self._module, m)):
+            if query:
+                postings = index.postings(query)
+                if postings is None:
+                    return [], None
+                groups.extend([posting] for posting in postings)
+
+        page: List[Room] = []
+        last = after
+        for seq in self._walk(groups, max(after, -1) + 1):
+            room_id = self._ids[seq]
+            if room_id is None:
+                continue
+            room = self.rooms[room_id]
+            if k and not _contains(room, KEYWORD_FIELDS, k):
+                continue
+            if m and not _contains(room, MODULE_FIELDS, m):
+                continue
+            if limit is not None and len(page) >= limit:
+                return page, last
+            page.append(room)
+            last = seq
+        return page, None
+
+    def _walk(self, groups: List[List[List[int]]], seq: int) -> Iterable[int]:
+        """按升序逐个产出 >= seq 且出现在每一组中的 seq（惰性求交，调用方取够即停）。"""
+        if not groups:
+            yield from range(seq, len(self._ids))
+            return
+        while True:
+            # 依次让每组跳到 >= seq 的下一个值；某组跳过了 seq 就从头再对齐
+            aligned = True
+            for group in groups:
+                found = _next_at_least(group, seq)
+                if found is None:
+                    return
+                if found != seq:
+                    seq = found
+                    aligned = False
+                    break
+            if aligned:
+                yield seq
+                seq += 1
@@ -1,15 +1,21 @@
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 
+from .passwords import HasherBusy, password_hasher
 from .schemas import LoginRequest, Token, User
 
 SECRET_KEY = "CHANGE_ME_TO_A_RANDOM_SECRET"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+# 已验证 token 缓存条数，设为 0 关闭缓存
+TOKEN_CACHE_SIZE = int(os.environ.get("TRPG_TOKEN_CACHE_SIZE", "4096"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -17,21 +23,21 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 
 
 # 为了简单起见，这里用内存中的单用户，后续可以接数据库。
-# 当前仅用于开发联调，不做真正的密码加密。
+# 密码只保存 bcrypt 哈希（python -m app.passwords <password> 生成）；开发账号 admin / 123456。
 fake_user_db = {
     "admin": {
         "id": 1,
         "username": "admin",
-        "password": "123456",
+        "password_hash": "$2b$10$ChLbiygDl20vm8KkrcR3LuT7EHRELZgiXRKilXGHu/fZeXXghJYXy",
     }
 }
 
 
-def authenticate_user(username: str, password: str) -> Optional[User]:
+async def authenticate_user(username: str, password: str) -> Optional[User]:
+    """校验用户名与密码（哈希校验在线程池中执行）；线程池繁忙时抛出 HasherBusy。"""
     user_record = fake_user_db.get(username)
-    if not user_record:
-        return None
-    if password != user_record["password"]:
+    hashed = user_record["password_hash"] if user_record else None
+    if not await password_hasher.verify(password, hashed) or not user_record:
         return None
     return User(id=user_record["id"], username=user_record["username"])
 
@@ -44,21 +50,106 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="未登录或登录已过期",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+class TokenCache:
+    """
+    已验证 token → User 的 LRU 缓存：命中时跳过 jwt.decode 与 User 构造。
+    条目在 token 自身的 exp 到期；revoke 的 token 在其 exp 之前一律拒绝（即使已被挤出缓存）。
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[User, float]]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[User]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, exp = entry
+        if exp <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def put(self, token: str, user: User, exp: float) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[token] = (user, exp)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def revoke(self, token: str, exp: Optional[float] = None) -> None:
+        """吊销 token；exp 缺省时取缓存中的到期时间，再缺省则按最长有效期保留。"""
+        entry = self._entries.pop(token, None)
+        if exp is None:
+            exp = entry[1] if entry else time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        now = time.time()
+        # 顺带清理已自然过期的吊销记录
+        for t in [t for t, e in self._revoked.items() if e <= now]:
+            del self._revoked[t]
+        self._revoked[token] = exp
+
+    def is_revoked(self, token: str) -> bool:
+        exp = self._revoked.get(token)
+        return exp is not None and exp > time.time()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / total if total else 0.0,
+            "revoked": len(self._revoked),
+        }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+def verify_token(token: str) -> Optional[User]:
+    """校验 JWT 并返回用户，无效、过期或已吊销时返回 None。HTTP 鉴权与 Socket.IO connect 共用。"""
+    if not token or token_cache.is_revoked(token):
+        return None
+    user = token_cache.get(token)
+    if user is not None:
+        return user
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("uid")
-        if username is None or user_id is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    return User(id=user_id, username=username)
+        return None
+    username: str = payload.get("sub")
+    user_id: int = payload.get("uid")
+    exp = payload.get("exp")
+    if username is None or user_id is None:
+        return None
+    user = User(id=user_id, username=username)
+    if exp is not None:
+        token_cache.put(token, user, float(exp))
+    return user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    user = verify_token(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="未登录或登录已过期",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
 
 
 @router.post("/login")
@@ -80,12 +171,21 @@ async def login(body: LoginRequest, response: Response):
     HTTP 401
     { "ok": false, "message": "用户名或密码错误" }
 
+    登录请求过多（密码校验排队已满或超时）：
+    HTTP 503，带 Retry-After
+    { "ok": false, "message": "登录人数过多，请稍后重试" }
+
     服务器异常：
     HTTP 500
     { "ok": false, "message": "登录失败，请稍后重试" }
     """
     try:
-        user = authenticate_user(body.username, body.password)
+        try:
+            user = await authenticate_user(body.username, body.password)
+        except HasherBusy:
+            response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+            response.headers["Retry-After"] = "1"
+            return {"ok": False, "message": "登录人数过多，请稍后重试"}
         if not user:
             response.status_code = status.HTTP_401_UNAUTHORIZED
             return {"ok": False, "message": "用户名或密码错误"}
@@ -106,3 +206,9 @@ async def read_current_user(current_user: User = Depends(get_current_user)):
     """GET /api/auth/me，返回 { "ok": true, "user": { "username": "string" } }"""
     return {"ok": True, "user": {"username": current_user.username}}
 
+
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme), current_user: User = Depends(get_current_user)):
+    """POST /api/auth/logout，吊销当前 token，返回 { "ok": true }"""
+    token_cache.revoke(token)
+    return {"ok": True}
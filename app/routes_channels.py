@@ -1,23 +1,43 @@
 """
-频道与历史消息 REST：GET /api/channels、GET /api/channels/:channelId/messages
-与文档第五节「频道与子频道（可选 REST）」一致；需鉴权。
+频道与历史消息 REST：GET /api/channels、GET /api/channels/:channelId/messages、GET /api/channels/:channelId/presence、
+GET /api/channels/:channelId/export（流式导出跑团记录）、GET /api/channels/:channelId/search（全文搜索）
+与文档第五节「频道与子频道（可选 REST）」一致；需鉴权，模组子频道另需读权限（见 acl.py）。
 """
 from typing import Optional
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from . import channel_store
+from .acl import READ, channel_acl
 from .channel_store import channels, get_messages, modules
+from .log_export import FORMATS, TZ_LIMIT, ExportFilter, export_chunks
+from .presence import presence_tracker
+from .response_cache import response_cache
 from .routes_auth import get_current_user
 from .schemas import User
+from .search import SEARCH_ENABLED, search_messages
 
 router = APIRouter(prefix="/api/channels", tags=["channels"])
 
 
 @router.get("")
-async def list_channels(current_user: User = Depends(get_current_user)):
-    """GET /api/channels — 频道列表 + 模组及子频道。"""
-    return {"ok": True, "channels": channels, "modules": modules}
+async def list_channels(request: Request, current_user: User = Depends(get_current_user)):
+    """GET /api/channels — 频道列表 + 模组及子频道（预序列化 + ETag，频道结构变化时重建）。"""
+    return response_cache.respond(
+        request,
+        "channels",
+        lambda: {"ok": True, "channels": channels, "modules": modules},
+        version=channel_store.catalog_version,
+    )
+
+
+def _forbidden(user: User, channel_id: str) -> Optional[JSONResponse]:
+    """没有频道读权限时返回 403 响应。"""
+    if channel_acl.check(user, channel_id) & READ:
+        return None
+    return JSONResponse(status_code=403, content={"ok": False, "message": "没有访问该频道的权限"})
 
 
 @router.get("/{channel_id}/messages")
@@ -31,5 +51,79 @@ async def list_messages(
     GET /api/channels/:channelId/messages?limit=50&before=msgId
     历史消息，单条结构与 Socket message 一致。
     """
-    messages = get_messages(channel_id, limit=limit, before=before)
+    denied = _forbidden(current_user, channel_id)
+    if denied is not None:
+        return denied
+    messages = await get_messages(channel_id, limit=limit, before=before)
     return {"ok": True, "messages": messages}
+
+
+@router.get("/{channel_id}/presence")
+async def list_presence(channel_id: str, current_user: User = Depends(get_current_user)):
+    """GET /api/channels/:channelId/presence — 频道当前在线成员（本 worker），结构同 Socket presence 的 members。"""
+    denied = _forbidden(current_user, channel_id)
+    if denied is not None:
+        return denied
+    return {"ok": True, "members": presence_tracker.members(channel_id)}
+
+
+@router.get("/{channel_id}/export")
+async def export_messages(
+    channel_id: str,
+    format: str = "ndjson",
+    fromSeq: int = 0,
+    toSeq: Optional[int] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    speakerRole: Optional[str] = None,
+    speakerNpcId: Optional[str] = None,
+    tz: int = 480,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    GET /api/channels/:channelId/export?format=ndjson|text — 流式导出完整跑团记录。
+    fromSeq / toSeq 为 seq 闭区间，since / until 为毫秒时间戳闭区间，speakerRole / speakerNpcId 过滤发言者；
+    text 格式的时间按 tz（相对 UTC 的分钟数，默认 480 即北京时间）显示。
+    """
+    denied = _forbidden(current_user, channel_id)
+    if denied is not None:
+        return denied
+    if format not in FORMATS:
+        return JSONResponse(status_code=400, content={"ok": False, "message": "format 只支持 ndjson 或 text"})
+    if not -TZ_LIMIT < tz < TZ_LIMIT:
+        # 响应开始后再出错只能截断输出，参数须在开始流式响应之前校验
+        return JSONResponse(status_code=400, content={"ok": False, "message": "tz 须在 -1439 到 1439 分钟之间"})
+    media_type, ext = FORMATS[format]
+    accept = None
+    if since is not None or until is not None or speakerRole is not None or speakerNpcId is not None:
+        accept = ExportFilter(since, until, speakerRole, speakerNpcId)
+    hi = toSeq + 1 if toSeq is not None else None
+    return StreamingResponse(
+        export_chunks(channel_id, format, fromSeq, hi, accept, tz),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(channel_id)}.{ext}"},
+    )
+
+
+@router.get("/{channel_id}/search")
+async def search_channel(
+    channel_id: str,
+    q: str = "",
+    limit: int = 20,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    GET /api/channels/:channelId/search?q=钥匙&limit=20&offset=0 — 全文搜索内存中的频道历史。
+    返回 { ok, results: [{ score, message }], total, truncated, nextOffset }，按相关度排序。
+    """
+    if not SEARCH_ENABLED:
+        return JSONResponse(status_code=404, content={"ok": False, "message": "搜索未开启"})
+    denied = _forbidden(current_user, channel_id)
+    if denied is not None:
+        return denied
+    if not q.strip():
+        return JSONResponse(status_code=400, content={"ok": False, "message": "请输入搜索关键词"})
+    limit = max(1, min(limit, 100))
+    result = await search_messages(channel_id, q, limit=limit, offset=max(0, offset))
+    return {"ok": True, **result}
@@ -1,27 +1,78 @@
 """
-角色卡 CRUD：GET/POST/PUT/DELETE /api/characters
+角色卡 CRUD：GET/POST/PUT/PATCH/DELETE /api/characters
 与前端 src/stores/characters.js 对接，当前为内存存储，后续可接数据库。
+
+每张角色卡有版本号，通过 ETag 返回；PUT / PATCH 可带 If-Match 做乐观并发控制，版本不符返回 412。
+PATCH 支持 JSON Patch（application/json-patch+json）与 Merge Patch（application/merge-patch+json），
+只校验被修改到的顶层字段，适合 HP/SAN 等小字段的频繁自动保存。
 """
+import json
 import uuid
 from datetime import date
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Set
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
 
+from .json_patch import PatchError, apply_json_patch, apply_merge_patch
 from .routes_auth import get_current_user
 from .schemas import Character, User
+from .snapshot import LazyDict
 
 router = APIRouter(prefix="/api/characters", tags=["characters"])
 
-# 内存存储：{ username: { character_id: character_dict } }
-_characters_by_user: Dict[str, Dict[str, Dict[str, Any]]] = {}
+# 内存存储：{ username: { character_id: character_dict } }；从快照恢复时按用户延迟解码
+_characters_by_user: Dict[str, Dict[str, Dict[str, Any]]] = LazyDict()
+# 角色卡版本号：{ character_id: version }
+_versions: Dict[str, int] = {}
+
+# PATCH 时按字段（JSON 名）校验，与 Character 模型的字段类型一致；未声明的额外字段不校验
+_FIELD_ADAPTERS: Dict[str, TypeAdapter] = {
+    (field.alias or name): TypeAdapter(field.annotation) for name, field in Character.model_fields.items()
+}
+_READONLY_FIELDS = {"id", "updated"}
 
 
 def _today() -> str:
     return date.today().strftime("%Y-%m-%d")
 
 
+def _etag(character_id: str) -> str:
+    return f'"{_versions.get(character_id, 1)}"'
+
+
+def _if_match_failed(request: Request, character_id: str) -> bool:
+    """If-Match 存在且与当前版本不符时返回 True。"""
+    header = request.headers.get("if-match")
+    if not header or header.strip() == "*":
+        return False
+    return _etag(character_id) not in {t.strip() for t in header.split(",")}
+
+
+def _precondition_failed(character_id: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=412,
+        content={"ok": False, "message": "角色卡已被修改，请刷新后重试"},
+        headers={"ETag": _etag(character_id)},
+    )
+
+
+def _validate_fields(doc: Dict[str, Any], touched: Set[str]) -> Optional[str]:
+    """校验被修改的顶层字段，通过时就地写回规范化后的值；失败返回错误说明。"""
+    for key in touched:
+        if key in _READONLY_FIELDS:
+            return f"字段 {key} 不可修改"
+        adapter = _FIELD_ADAPTERS.get(key)
+        if adapter is None or key not in doc:
+            continue
+        try:
+            doc[key] = adapter.validate_python(doc[key])
+        except ValidationError as e:
+            return f"字段 {key} 无效：{e.errors()[0].get('msg', '')}"
+    return None
+
+
 @router.get("")
 async def list_characters(current_user: User = Depends(get_current_user)):
     """GET /api/characters — 获取当前用户角色卡列表，需鉴权。"""
@@ -33,21 +84,24 @@ async def list_characters(current_user: User = Depends(get_current_user)):
 @router.get("/{character_id}")
 async def get_character(
     character_id: str,
+    response: Response,
     current_user: User = Depends(get_current_user),
 ):
-    """GET /api/characters/:id — 获取单条角色卡详情，需鉴权。"""
+    """GET /api/characters/:id — 获取单条角色卡详情，需鉴权。响应头 ETag 为当前版本。"""
     user_list = _characters_by_user.get(current_user.username, {})
     if character_id not in user_list:
         return JSONResponse(
             status_code=404,
             content={"ok": False, "message": "角色卡不存在"},
         )
+    response.headers["ETag"] = _etag(character_id)
     return {"ok": True, "character": user_list[character_id]}
 
 
 @router.post("")
 async def create_character(
     body: Character,
+    response: Response,
     current_user: User = Depends(get_current_user),
 ):
     """POST /api/characters — 创建角色卡，需鉴权。Body 为完整角色表（可不含 id、updated）。"""
@@ -60,6 +114,8 @@ async def create_character(
     if current_user.username not in _characters_by_user:
         _characters_by_user[current_user.username] = {}
     _characters_by_user[current_user.username][character_id] = raw
+    _versions[character_id] = 1
+    response.headers["ETag"] = _etag(character_id)
     return {"ok": True, "id": character_id, "character": raw}
 
 
@@ -67,15 +123,19 @@ async def create_character(
 async def update_character(
     character_id: str,
     body: Character,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
 ):
-    """PUT /api/characters/:id — 更新角色卡，需鉴权。Body 为完整或部分角色表。"""
+    """PUT /api/characters/:id — 更新角色卡，需鉴权。Body 为完整或部分角色表；可带 If-Match。"""
     user_list = _characters_by_user.get(current_user.username, {})
     if character_id not in user_list:
         return JSONResponse(
             status_code=404,
             content={"ok": False, "message": "角色卡不存在"},
         )
+    if _if_match_failed(request, character_id):
+        return _precondition_failed(character_id)
     updated = _today()
     raw = body.model_dump(by_alias=True, exclude_none=False)
     raw["id"] = character_id
@@ -86,9 +146,68 @@ async def update_character(
         if v is not None or k in ("id", "updated"):
             existing[k] = v
     existing["updated"] = updated
+    _versions[character_id] = _versions.get(character_id, 1) + 1
+    response.headers["ETag"] = _etag(character_id)
     return {"ok": True, "character": existing}
 
 
+@router.patch("/{character_id}")
+async def patch_character(
+    character_id: str,
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    PATCH /api/characters/:id — 局部更新角色卡，需鉴权。
+    - Content-Type: application/json-patch+json，Body 为操作数组，如 [{ "op": "replace", "path": "/hpCurrent", "value": 9 }]
+    - Content-Type: application/merge-patch+json，Body 为部分对象，如 { "hpCurrent": 9 }（null 表示删除字段）
+    可带 If-Match: "<version>"，版本不符返回 412；成功返回新的 ETag。
+    带 Prefer: return=minimal 时响应体只含 id 与 updated，不回传整张角色卡。
+    """
+    # 先读完请求体：await 期间角色卡可能被其他请求修改或删除，
+    # 之后的存在性检查、If-Match、应用补丁与版本号递增之间不再 await
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        patch = json.loads(await request.body())
+    except ValueError:
+        return JSONResponse(status_code=400, content={"ok": False, "message": "请求体不是有效的 JSON"})
+
+    user_list = _characters_by_user.get(current_user.username, {})
+    if character_id not in user_list:
+        return JSONResponse(
+            status_code=404,
+            content={"ok": False, "message": "角色卡不存在"},
+        )
+    if _if_match_failed(request, character_id):
+        return _precondition_failed(character_id)
+    try:
+        if content_type == "application/json-patch+json" or (
+            content_type == "application/json" and isinstance(patch, list)
+        ):
+            doc, touched = apply_json_patch(user_list[character_id], patch)
+        elif content_type in ("application/merge-patch+json", "application/json"):
+            doc, touched = apply_merge_patch(user_list[character_id], patch)
+        else:
+            return JSONResponse(
+                status_code=415,
+                content={"ok": False, "message": "仅支持 application/json-patch+json 或 application/merge-patch+json"},
+            )
+    except PatchError as e:
+        return JSONResponse(status_code=e.status, content={"ok": False, "message": e.message})
+    error = _validate_fields(doc, touched)
+    if error:
+        return JSONResponse(status_code=422, content={"ok": False, "message": error})
+
+    doc["updated"] = _today()
+    user_list[character_id] = doc
+    _versions[character_id] = _versions.get(character_id, 1) + 1
+    response.headers["ETag"] = _etag(character_id)
+    if "return=minimal" in request.headers.get("prefer", ""):
+        return {"ok": True, "id": character_id, "updated": doc["updated"]}
+    return {"ok": True, "character": doc}
+
+
 @router.delete("/{character_id}")
 async def delete_character(
     character_id: str,
@@ -102,4 +221,5 @@ async def delete_character(
             content={"ok": False, "message": "角色卡不存在"},
         )
     del user_list[character_id]
+    _versions.pop(character_id, None)
     return {"ok": True}
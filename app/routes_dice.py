@@ -0,0 +1,109 @@
+"""
+掷骰 REST：POST /api/dice/roll，需鉴权。与 Socket.IO 的 roll 事件共用 perform_roll。
+
+点数只在服务端生成；请求带 channelId 时，结果作为 type="dice" 的消息经总线 topic "chat.message"
+广播到该频道并写入历史，与普通聊天消息走同一条路径。
+"""
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+
+from .acl import channel_acl, speak_denied
+from .bus import bus
+from .dice import DiceError, check_many, compile_expression, skill_value
+from .routes_auth import get_current_user
+from .routes_characters import _characters_by_user
+from .schemas import RollRequest, User
+
+router = APIRouter(prefix="/api/dice", tags=["dice"])
+
+
+def _character(username: Optional[str], character_id: str) -> Dict[str, Any]:
+    character = _characters_by_user.get(username or "", {}).get(character_id)
+    if character is None:
+        raise DiceError("角色卡不存在", status=404)
+    return character
+
+
+def _roll(req: RollRequest, username: Optional[str]) -> Dict[str, Any]:
+    """按请求掷骰 / 检定，返回结果与消息正文。"""
+    if req.targets:
+        results = check_many([t.target for t in req.targets], req.bonus)
+        for t, r in zip(req.targets, results):
+            r["name"] = t.name
+        lines = [f"{r['name'] or '#' + str(i + 1)} {r['roll']}/{r['target']} {r['level']}" for i, r in enumerate(results)]
+        return {"kind": "check", "bonus": req.bonus, "results": results, "content": "批量检定：" + "；".join(lines)}
+
+    if req.skill is not None or req.target is not None:
+        target = req.target
+        skill = (req.skill or "").strip()
+        if target is None:
+            if not req.characterId:
+                raise DiceError("检定需要 target 或 characterId")
+            target = skill_value(_character(username, req.characterId), skill)
+            if target is None:
+                raise DiceError(f"角色卡中没有技能：{skill}")
+        times = max(1, req.times)
+        results = check_many([target] * times, req.bonus)
+        dice = "1d100" if not req.bonus else f"1d100{'b' if req.bonus > 0 else 'p'}{abs(req.bonus)}"
+        label = f"{skill} 检定" if skill else "检定"
+        content = f"{label} {dice}=" + "、".join(f"{r['roll']}/{target} {r['level']}" for r in results)
+        return {"kind": "check", "skill": skill, "bonus": req.bonus, "results": results, "content": content}
+
+    expression = compile_expression(req.expression)
+    if req.times > 1:
+        totals = expression.roll_many(req.times)
+        content = f"掷骰 {expression.text} ×{req.times}：" + "、".join(map(str, totals))
+        return {"kind": "roll", "expression": expression.text, "times": req.times, "totals": totals, "content": content}
+    result = expression.roll()
+    return {"kind": "roll", **result, "content": "掷骰 " + result["detail"]}
+
+
+async def perform_roll(req: RollRequest, username: Optional[str], user_name: str) -> Dict[str, Any]:
+    """
+    掷骰并在 channelId 非空时广播。username 为已登录用户（用于读取角色卡，匿名为 None），
+    user_name 为消息中显示的发言者。失败时抛出 DiceError。
+    """
+    result = _roll(req, username)
+    content = result.pop("content")
+    if req.reason:
+        content = f"{req.reason}：{content}"
+    if req.channelId:
+        msg = {
+            "id": uuid.uuid4().hex,
+            "channelId": req.channelId,
+            "userName": user_name,
+            "content": content,
+            "time": int(time.time() * 1000),
+            "type": "dice",
+            "dice": result,
+        }
+        for key in ("speakerRole", "speakerNpcId", "speakerNpcName"):
+            value = getattr(req, key)
+            if value is not None:
+                msg[key] = value
+        await bus.publish("chat.message", msg)
+    return {"content": content, **result}
+
+
+@router.post("/roll")
+async def roll(body: RollRequest, current_user: User = Depends(get_current_user)):
+    """
+    POST /api/dice/roll — 掷骰或 COC 检定。
+    - { "expression": "3d6*5" } / { "expression": "1d100", "times": 20 }
+    - { "skill": "侦查", "characterId": "...", "bonus": 1 } / { "target": 50 }
+    - { "targets": [{ "name": "NPC1", "target": 45 }, ...] }（批量 SAN 检定等）
+    带 channelId 时结果同时广播到频道并写入历史（需该频道的写权限，speakerRole="kp" 另需 KP 权限）。
+    """
+    if body.channelId:
+        denied = speak_denied(channel_acl.check(current_user, body.channelId), body.speakerRole)
+        if denied is not None:
+            return JSONResponse(status_code=403, content={"ok": False, "message": denied})
+    try:
+        result = await perform_roll(body, current_user.username, current_user.username)
+    except DiceError as e:
+        return JSONResponse(status_code=e.status, content={"ok": False, "message": e.message})
+    return {"ok": True, "result": result}
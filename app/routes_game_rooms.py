@@ -1,22 +1,27 @@
 """
-大厅（跑团房间）接口：GET/POST /api/game-rooms、申请加入、modules/tags
+大厅（跑团房间）接口：GET/POST /api/game-rooms、PATCH/DELETE /api/game-rooms/:id（房主）、申请加入、modules/tags
 与前端 src/stores/gameRooms.js、GameRoomsView、GameRoomCreateView 对接。
-当前为内存存储。
+当前为内存存储，列表查询走 room_index.RoomIndex（状态 / 模组 / 关键词索引 + 游标分页）；
+房间的增删改同时通知 lobby.lobby_feed，推送给订阅大厅的 Socket 连接。
 """
 import uuid
 from datetime import date
 from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import JSONResponse
 
+from .lobby import lobby_feed, parse_statuses
+from .response_cache import response_cache
+from .room_index import RoomIndex
 from .routes_auth import get_current_user
-from .schemas import GameRoom, GameRoomCreate, User
+from .schemas import GameRoom, GameRoomCreate, GameRoomUpdate, User
 
 router = APIRouter(prefix="/api/game-rooms", tags=["game-rooms"])
 
-# 房间存储：id -> room dict
+# 房间存储：id -> room dict（只读；增改须经 _index 以保持索引同步）
 _rooms: Dict[str, Dict[str, Any]] = {}
+_index = RoomIndex(_rooms)
 
 # 前端文档中的模组与标签（可后续改为后端配置或数据库）
 AVAILABLE_MODULES = [
@@ -32,15 +37,15 @@ def _today() -> str:
 
 
 @router.get("/modules")
-async def get_modules(current_user: User = Depends(get_current_user)):
-    """GET /api/game-rooms/modules — 创建房间时的模组列表。"""
-    return {"ok": True, "modules": AVAILABLE_MODULES}
+async def get_modules(request: Request, current_user: User = Depends(get_current_user)):
+    """GET /api/game-rooms/modules — 创建房间时的模组列表（预序列化 + ETag）。"""
+    return response_cache.respond(request, "game-rooms:modules", lambda: {"ok": True, "modules": AVAILABLE_MODULES})
 
 
 @router.get("/tags")
-async def get_tags(current_user: User = Depends(get_current_user)):
-    """GET /api/game-rooms/tags — 创建房间时的标签列表。"""
-    return {"ok": True, "tags": AVAILABLE_TAGS}
+async def get_tags(request: Request, current_user: User = Depends(get_current_user)):
+    """GET /api/game-rooms/tags — 创建房间时的标签列表（预序列化 + ETag）。"""
+    return response_cache.respond(request, "game-rooms:tags", lambda: {"ok": True, "tags": AVAILABLE_TAGS})
 
 
 @router.get("")
@@ -48,36 +53,36 @@ async def list_rooms(
     keyword: Optional[str] = None,
     status: Optional[str] = None,
     module: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
 ):
     """
     GET /api/game-rooms
     查询参数：keyword（搜索）、status（逗号分隔 recruiting,full,started）、module（模组 id 或名称）
+    分页：limit（每页条数，不传返回全部）、cursor（上一页返回的 nextCursor）
     """
-    list_ = list(_rooms.values())
-    if keyword:
-        k = keyword.strip().lower()
-        list_ = [
-            r
-            for r in list_
-            if k in (r.get("name") or "").lower()
-            or k in (r.get("description") or "").lower()
-            or k in (r.get("owner") or "").lower()
-            or k in (r.get("module") or "").lower()
-        ]
-    if status:
-        allowed = {s.strip() for s in status.split(",") if s.strip()}
-        if allowed:
-            list_ = [r for r in list_ if (r.get("status") or "") in allowed]
-    if module:
-        m = module.strip().lower()
-        list_ = [
-            r
-            for r in list_
-            if m in (r.get("module") or "").lower()
-            or m in (r.get("moduleIcon") or "").lower()
-        ]
-    return {"ok": True, "list": list_}
+    after = -1
+    if cursor:
+        # nextCursor 只会是非负整数；负数会让 range 从末尾取，返回重复的房间
+        if not (cursor.isascii() and cursor.isdigit()):
+            return JSONResponse(
+                status_code=400,
+                content={"ok": False, "message": "cursor 无效"},
+            )
+        after = int(cursor)
+    list_, next_after = _index.query(
+        keyword=keyword,
+        statuses=parse_statuses(status),
+        module=module,
+        after=after,
+        limit=max(1, limit) if limit is not None else None,
+    )
+    return {
+        "ok": True,
+        "list": list_,
+        "nextCursor": str(next_after) if next_after is not None else None,
+    }
 
 
 @router.get("/{room_id}")
@@ -114,7 +119,8 @@ async def create_room(
         "tags": body.tags or [],
         "createdAt": _today(),
     }
-    _rooms[room_id] = room
+    _index.add(room)
+    lobby_feed.changed(None, room)
     return {"ok": True, "room": room}
 
 
@@ -131,3 +137,75 @@ async def apply_room(
         )
     # 简化逻辑：仅返回成功提示，实际审核可后续扩展
     return {"ok": True, "message": "已申请加入，等待 KP 审核"}
+
+
+def _owner_check(room_id: str, current_user: User) -> Optional[JSONResponse]:
+    """房间不存在返回 404，当前用户不是房主返回 403，通过时返回 None。"""
+    room = _rooms.get(room_id)
+    if room is None:
+        return JSONResponse(
+            status_code=404,
+            content={"ok": False, "message": "房间不存在"},
+        )
+    if room.get("owner") != current_user.username:
+        return JSONResponse(
+            status_code=403,
+            content={"ok": False, "message": "只有房主可以修改房间"},
+        )
+    return None
+
+
+@router.patch("/{room_id}")
+async def patch_room(
+    room_id: str,
+    body: GameRoomUpdate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    PATCH /api/game-rooms/:id — 房主修改房间（状态、人数、名称等），只改传入的字段。
+    订阅大厅的连接按各自条件收到 updated / added / removed。
+    """
+    denied = _owner_check(room_id, current_user)
+    if denied is not None:
+        return denied
+    changes = body.model_dump(exclude_none=True)
+    room = _rooms[room_id]
+    max_players = changes.get("maxPlayers", room.get("maxPlayers", 6))
+    if changes.get("currentPlayers", room.get("currentPlayers", 0)) > max_players:
+        return JSONResponse(
+            status_code=400,
+            content={"ok": False, "message": "当前人数不能超过人数上限"},
+        )
+    return {"ok": True, "room": update_room(room_id, **changes)}
+
+
+@router.delete("/{room_id}")
+async def delete_room(
+    room_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """DELETE /api/game-rooms/:id — 房主删除房间；订阅大厅且原先能看到该房间的连接收到 removed。"""
+    denied = _owner_check(room_id, current_user)
+    if denied is not None:
+        return denied
+    remove_room(room_id)
+    return {"ok": True}
+
+
+def update_room(room_id: str, **changes: Any) -> Optional[Dict[str, Any]]:
+    """修改房间字段（状态、人数等）并同步索引与大厅推送；房间不存在时返回 None。"""
+    before = _rooms.get(room_id)
+    if before is None:
+        return None
+    before = dict(before)
+    room = _index.update(room_id, changes)
+    lobby_feed.changed(before, room)
+    return room
+
+
+def remove_room(room_id: str) -> Optional[Dict[str, Any]]:
+    """删除房间并同步索引与大厅推送；返回被删除的房间。"""
+    room = _index.remove(room_id)
+    if room is not None:
+        lobby_feed.changed(room, None)
+    return room
@@ -1,7 +1,7 @@
-from datetime import datetime
-from typing import Any, List, Optional
+from datetime import datetime, timezone
+from typing import Any, List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class User(BaseModel):
@@ -102,6 +102,17 @@ class GameRoomCreate(BaseModel):
     tags: List[str] = []
 
 
+class GameRoomUpdate(BaseModel):
+    """PATCH /api/game-rooms/:id：只修改传入的字段。"""
+
+    name: Optional[str] = None
+    description: Optional[str] = None
+    maxPlayers: Optional[int] = Field(default=None, ge=1)
+    currentPlayers: Optional[int] = Field(default=None, ge=0)
+    status: Optional[Literal["recruiting", "full", "started"]] = None
+    tags: Optional[List[str]] = None
+
+
 # ----- Socket 聊天消息（与前端 message 事件 payload 一致） -----
 class SocketMessage(BaseModel):
     id: Optional[str] = None
@@ -109,9 +120,51 @@ class SocketMessage(BaseModel):
     userId: Optional[str] = None
     userName: Optional[str] = None
     content: Optional[str] = None
+    # 毫秒时间戳（前端 Date.now()）；带小数的时间戳与 ISO 8601 字符串在校验时统一转为整数毫秒
     time: Optional[int] = None
     type: Optional[str] = "text"
     speakerRole: Optional[str] = None
     speakerNpcId: Optional[str] = None
     speakerNpcName: Optional[str] = None
 
+    @field_validator("time", mode="before")
+    @classmethod
+    def _time_to_ms(cls, value: Any) -> Any:
+        if isinstance(value, float) and value == value and abs(value) != float("inf"):
+            return int(value)
+        if isinstance(value, str) and not value.strip().lstrip("-").isdigit():
+            try:
+                parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+            except ValueError:
+                raise ValueError("time 须为毫秒时间戳或 ISO 8601 字符串") from None
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return int(parsed.timestamp() * 1000)
+        return value
+
+
+# ----- 掷骰 -----
+class DiceTarget(BaseModel):
+    name: str = ""
+    target: int
+
+
+class RollRequest(BaseModel):
+    """
+    expression：掷骰表达式（如 3d6*5），times > 1 时批量掷；
+    skill / target / targets：COC 检定（skill 配合 characterId 从角色卡取值，targets 为批量检定）；
+    channelId 非空时结果作为 type="dice" 的消息广播到该频道并写入历史。
+    """
+
+    expression: Optional[str] = None
+    times: int = 1
+    skill: Optional[str] = None
+    target: Optional[int] = None
+    targets: Optional[List[DiceTarget]] = None
+    bonus: int = 0
+    characterId: Optional[str] = None
+    channelId: Optional[str] = None
+    reason: str = ""
+    speakerRole: Optional[str] = None
+    speakerNpcId: Optional[str] = None
+    speakerNpcName: Optional[str] = None
@@ -0,0 +1,296 @@
+"""
+频道历史全文搜索：每个频道一个增量维护的倒排索引，供 GET /api/channels/:channelId/search 使用。
+
+- 切词：中日文连续汉字 / 假名按相邻二字切分（单字成段时保留单字），英文与数字按单词切分并转小写；
+  另为每个汉字 / 假名记一条单字倒排（同一条消息只记一次），单字查询（如「钥」）直接查它，不必合并二字词；
+- 倒排表：词 → 升序的 seq 数组（array('I')，每项 4 字节）；词频绝大多数为 1，只为出现多次的 (词, seq) 另记词频；
+  另有按 seq 的消息长度数组。新消息只需在各词的数组尾部追加；
+- 查询：所有词都须出现（AND）。以最短的倒排表为主，从最新的消息往回分段与其他倒排表求交，
+  至多取 TRPG_SEARCH_CANDIDATES 条（默认 1000）最新的匹配，按 BM25 打分排序后分页；
+- 索引只覆盖内存中的历史：消息被淘汰后，倒排表在淘汰量累计超过一定比例时整体裁剪。
+
+索引在频道第一次被搜索时建立：在事件循环中取历史的冷块与热尾副本，交给线程池切词建表，完成后在事件循环中
+补上建表期间新写入的消息，此后 channel_store.append_message 每写入一条就增量更新。TRPG_SEARCH=0 时关闭搜索。
+"""
+import asyncio
+import math
+import os
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from .history import ColdBlock
+
+SEARCH_ENABLED = os.environ.get("TRPG_SEARCH", "1") != "0"
+SEARCH_CANDIDATES = int(os.environ.get("TRPG_SEARCH_CANDIDATES", "1000"))
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[0-9a-z]+")
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+# 每个词的固定开销估算：空数组对象、二字词字符串与字典槽位
+_TERM_OVERHEAD = sys.getsizeof(array("I")) + sys.getsizeof("钥匙") + 48
+
+_NO_FREQS: Dict[int, int] = {}
+
+# 求交时每次从主倒排表取的条数
+_WINDOW = 4096
+
+# BM25 参数
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> Dict[str, int]:
+    """文本 → {词: 出现次数}。"""
+    counts: Dict[str, int] = {}
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run) and len(run) > 1:
+            for i in range(len(run) - 1):
+                gram = run[i : i + 2]
+                counts[gram] = counts.get(gram, 0) + 1
+        else:
+            counts[run] = counts.get(run, 0) + 1
+    return counts
+
+
+class SearchIndex:
+    def __init__(self, start: int = 0) -> None:
+        # _lengths[0] 对应的 seq；小于它的消息已裁剪
+        self.base = start
+        # 下一条待索引消息的 seq
+        self.end = start
+        self._postings: Dict[str, array] = {}
+        # 词 → {seq: 词频}，只记录词频大于 1 的项
+        self._freqs: Dict[str, Dict[int, int]] = {}
+        self._lengths = array("H")
+        self._total_length = 0
+        self._posting_count = 0
+
+    def add(self, seq: int, text: Optional[str]) -> None:
+        """索引一条消息；seq 须大于已索引的所有消息，没有正文的消息只占位。"""
+        if seq < self.end:
+            return
+        if seq > self.end:
+            self._lengths.extend([0] * (seq - self.end))
+        counts = tokenize(text) if isinstance(text, str) and text else {}
+        length = min(sum(counts.values()), 0xFFFF)
+        self._lengths.append(length)
+        self._total_length += length
+        for term, tf in counts.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = array("I")
+            posting.append(seq)
+            if tf > 1:
+                self._freqs.setdefault(term, {})[seq] = tf
+        # 单字倒排：二字词中出现的字（单字成段的已在上面记过）
+        chars = set(_CJK_RE.findall(text.lower())).difference(counts) if counts else ()
+        for char in chars:
+            posting = self._postings.get(char)
+            if posting is None:
+                posting = self._postings[char] = array("I")
+            posting.append(seq)
+        self._posting_count += len(counts) + len(chars)
+        self.end = seq + 1
+
+    def prune(self, start: int) -> None:
+        """丢弃 seq < start 的索引项（消息已被淘汰）。"""
+        if start <= self.base:
+            return
+        drop = min(start, self.end) - self.base
+        self._total_length -= sum(self._lengths[:drop])
+        del self._lengths[:drop]
+        self.base += drop
+        for term in list(self._postings):
+            posting = self._postings[term]
+            cut = bisect_left(posting, start)
+            self._posting_count -= cut
+            if cut == len(posting):
+                del self._postings[term]
+            elif cut:
+                del posting[:cut]
+        for term in list(self._freqs):
+            kept = {seq: tf for seq, tf in self._freqs[term].items() if seq >= start}
+            if kept:
+                self._freqs[term] = kept
+            else:
+                del self._freqs[term]
+
+    def search(self, query: str, start: int, limit: int = SEARCH_CANDIDATES) -> Tuple[List[Tuple[float, int]], bool]:
+        """
+        返回 ([(score, seq)] 按分数降序, truncated)。只考虑 seq >= start 的消息，
+        匹配超过 limit 条时只为最新的 limit 条打分，truncated 为 True。
+        """
+        terms = list(tokenize(query))
+        if not terms:
+            return [], False
+        postings = []
+        for term in terms:
+            posting = self._postings.get(term)
+            if not posting:
+                return [], False
+            postings.append((term, posting))
+        postings.sort(key=lambda item: len(item[1]))
+        lo = max(start, self.base)
+        driver = postings[0][1]
+        others = [p for _, p in postings[1:]]
+
+        # 从最新的消息往回，每次取主倒排表的一段，在 seq 范围内与其他倒排表求交（集合运算在 C 中完成），
+        # 凑够 limit 条即停止，常见词也不必遍历整张倒排表
+        matched: List[int] = []
+        bounds = [len(p) for p in others]
+        hi = len(driver)
+        while hi > 0 and len(matched) <= limit:
+            low = max(0, hi - _WINDOW)
+            seq_lo = driver[low]
+            common = set(driver[low:hi])
+            for k, posting in enumerate(others):
+                j = bisect_left(posting, seq_lo, 0, bounds[k])
+                common.intersection_update(posting[j : bounds[k]])
+                bounds[k] = j
+                if not common:
+                    break
+            matched.extend(sorted(common, reverse=True))
+            hi = low
+            if seq_lo < lo:
+                break
+        matched = [seq for seq in matched if seq >= lo]
+        truncated = len(matched) > limit
+        del matched[limit:]
+
+        docs = max(self.end - lo, 1)
+        avg_length = max(self._total_length / max(self.end - self.base, 1), 1.0)
+        weights = [
+            (self._freqs.get(term, _NO_FREQS), math.log(1 + (docs - len(posting) + 0.5) / (len(posting) + 0.5)))
+            for term, posting in postings
+        ]
+        lengths = self._lengths
+        base = self.base
+        hits: List[Tuple[float, int]] = []
+        for seq in matched:
+            norm = _K1 * (1 - _B + _B * lengths[seq - base] / avg_length)
+            score = 0.0
+            for freqs, idf in weights:
+                tf = freqs.get(seq, 1)
+                score += idf * tf * (_K1 + 1) / (tf + norm)
+            hits.append((score, seq))
+        # 分数相同的按新到旧
+        hits.sort(key=lambda hit: (-hit[0], -hit[1]))
+        return hits, truncated
+
+    def nbytes(self) -> int:
+        """逐个词统计的内存占用：词典、倒排数组与长度数组（O(词数)，供基准使用）。"""
+        total = sys.getsizeof(self._postings) + sys.getsizeof(self._freqs) + sys.getsizeof(self._lengths)
+        for term, posting in self._postings.items():
+            total += sys.getsizeof(term) + sys.getsizeof(posting)
+        for freqs in self._freqs.values():
+            total += sys.getsizeof(freqs) + sum(sys.getsizeof(seq) for seq in freqs)
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        """消息数、词数、倒排项数与估算字节数（按计数估算，O(1)，供 /metrics 抓取）。"""
+        terms = len(self._postings)
+        estimate = terms * _TERM_OVERHEAD + self._posting_count * 4 + len(self._lengths) * 2
+        return {
+            "messages": self.end - self.base,
+            "terms": terms,
+            "postings": self._posting_count,
+            "bytes": estimate,
+        }
+
+
+def _build(start: int, blocks: List[ColdBlock], hot: List[Dict[str, Any]]) -> SearchIndex:
+    """由历史的冷块与热尾副本建索引（只读冷块的不可变数据，可在线程池中执行）。"""
+    index = SearchIndex(start)
+    for block in blocks:
+        for offset, msg in enumerate(block.decode()):
+            index.add(block.start + offset, msg.get("content"))
+    seq = blocks[-1].start + blocks[-1].count if blocks else start
+    for offset, msg in enumerate(hot):
+        index.add(seq + offset, msg.get("content"))
+    return index
+
+
+_indexes: Dict[str, SearchIndex] = {}
+_building: Dict[str, "asyncio.Future[SearchIndex]"] = {}
+
+
+def index_message(channel_id: str, seq: int, text: Optional[str], start: int) -> None:
+    """append_message 写入后调用：频道已建索引时增量更新，并在淘汰累计较多时裁剪。"""
+    index = _indexes.get(channel_id)
+    if index is None:
+        return
+    index.add(seq, text)
+    # 已淘汰部分超过索引范围的 1/8 时裁剪一次，摊还为每条消息 O(1)
+    if (start - index.base) * 8 > index.end - index.base:
+        index.prune(start)
+
+
+def drop_index(channel_id: str) -> None:
+    """频道历史被替换（序号重新开始）时丢弃索引，下次搜索时重建。"""
+    _indexes.pop(channel_id, None)
+
+
+async def get_index(channel_id: str) -> Optional[SearchIndex]:
+    """取频道索引，首次调用时在线程池中建立；频道不存在时返回 None。"""
+    from . import channel_store
+
+    index = _indexes.get(channel_id)
+    if index is not None:
+        return index
+    pending = _building.get(channel_id)
+    if pending is not None:
+        return await asyncio.shield(pending)
+    history = channel_store._messages_by_channel.get(channel_id)
+    if history is None:
+        return None
+    future: "asyncio.Future[SearchIndex]" = asyncio.get_running_loop().create_future()
+    _building[channel_id] = future
+    try:
+        index = await asyncio.get_running_loop().run_in_executor(None, _build, *history.export())
+        # 补上建表期间写入的消息；此后由 index_message 增量维护（以下无 await，不会漏掉消息）
+        history = channel_store._messages_by_channel.get(channel_id)
+        for msg in history.slice(index.end, history.end):
+            index.add(msg["seq"], msg.get("content"))
+        index.prune(history.start)
+        # 建表期间历史被替换为更早的序号时不缓存，下次搜索重建
+        if index.end <= history.end:
+            _indexes[channel_id] = index
+        future.set_result(index)
+    except BaseException as e:
+        future.set_exception(e)
+        # 没有其他等待者时避免 "exception was never retrieved"
+        future.exception()
+        raise
+    finally:
+        del _building[channel_id]
+    return index
+
+
+async def search_messages(channel_id: str, query: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """
+    搜索频道历史，返回 { results: [{ score, message }], total, truncated, nextOffset }。
+    total 为参与排序的匹配数（truncated 时只含最新的 TRPG_SEARCH_CANDIDATES 条）。
+    """
+    from . import channel_store
+
+    index = await get_index(channel_id)
+    history = channel_store._messages_by_channel.get(channel_id)
+    if index is None or history is None:
+        return {"results": [], "total": 0, "truncated": False, "nextOffset": None}
+    hits, truncated = index.search(query, history.start)
+    results = []
+    for score, seq in hits[offset : offset + limit]:
+        found = history.slice(seq, seq + 1)
+        if found:
+            results.append({"score": round(score, 4), "message": found[0]})
+    next_offset = offset + limit if offset + limit < len(hits) else None
+    return {"results": results, "total": len(hits), "truncated": truncated, "nextOffset": next_offset}
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """各已建索引频道的消息数、词数、倒排项数与估算字节数。"""
+    return {channel_id: index.stats() for channel_id, index in _indexes.items()}
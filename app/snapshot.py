@@ -0,0 +1,334 @@
+"""
+内存状态快照：把大厅房间、角色卡（含版本号）与频道历史定期写入一个紧凑的二进制文件，启动时恢复。
+
+设置 TRPG_SNAPSHOT_PATH 后开启：每 TRPG_SNAPSHOT_INTERVAL 秒（默认 60）及进程关闭时写一次快照
+（先写临时文件再原子替换）。文件格式：
+
+    b"TRPGSNP1" | u32 索引长度 | 索引 JSON | 各条目
+
+条目按 key 分开："rooms"、"characters/<username>" 为 zlib 压缩的 JSON；"history/<channelId>" 为
+u32 元数据长度 | zlib 压缩的元数据 JSON（起始序号、各冷块的序号 / 字节数 / 消息 id、热尾消息）| 各冷块的压缩数据，
+冷块原样拷贝，写快照与恢复时都不解压。启动时只读入索引并 mmap 文件，
+房间在启动时解码（大厅列表需要完整索引），每个用户的角色卡、每个频道的历史在第一次被访问时才解码
+（见 LazyDict），因此服务无需等全部数据解码即可接受请求。尚未被访问过的条目在下次写快照时原样拷贝压缩字节，
+不做解码。
+
+开启 TRPG_DATABASE_URL 时频道历史以数据库为准，快照不保存也不恢复历史。
+"""
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .history import ChannelHistory, ColdBlock
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.environ.get("TRPG_SNAPSHOT_PATH", "")
+SNAPSHOT_INTERVAL = float(os.environ.get("TRPG_SNAPSHOT_INTERVAL", "60"))
+# 设为 0 时启动即解码全部条目（用于对比）
+SNAPSHOT_LAZY = os.environ.get("TRPG_SNAPSHOT_LAZY", "1") != "0"
+
+MAGIC = b"TRPGSNP1"
+_HEADER = struct.Struct("<I")
+
+
+def _encode(payload: Any) -> bytes:
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _decode(raw: bytes) -> Any:
+    return json.loads(zlib.decompress(raw))
+
+
+def _encode_history(start: int, blocks: List[ColdBlock], hot: List[Dict[str, Any]]) -> bytes:
+    meta = _encode(
+        {"start": start, "blocks": [[b.start, len(b.data), list(b.ids)] for b in blocks], "hot": hot}
+    )
+    return _HEADER.pack(len(meta)) + meta + b"".join(b.data for b in blocks)
+
+
+class _Blob:
+    """快照文件中的一个条目：raw() 取原始字节，调用时交给 build 构造内存对象。"""
+
+    __slots__ = ("buffer", "offset", "length", "build")
+
+    def __init__(self, buffer: mmap.mmap, offset: int, length: int, build: Callable[[bytes], Any]) -> None:
+        self.buffer = buffer
+        self.offset = offset
+        self.length = length
+        self.build = build
+
+    def raw(self) -> bytes:
+        return self.buffer[self.offset : self.offset + self.length]
+
+    def __call__(self) -> Any:
+        return self.build(self.raw())
+
+
+class LazyDict(dict):
+    """
+    值可延迟解码的 dict：defer(key, loader) 登记的 key 在第一次 get / [] / setdefault / pop 时才调用 loader。
+    in 与 len 不触发解码；遍历（keys / values / items / for）时解码全部，只看已解码部分用 loaded_items。
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._pending: Dict[Any, Callable[[], Any]] = {}
+
+    def defer(self, key: Any, loader: Callable[[], Any]) -> None:
+        if not dict.__contains__(self, key):
+            self._pending[key] = loader
+
+    def pending(self) -> Dict[Any, Callable[[], Any]]:
+        return dict(self._pending)
+
+    def _load(self, key: Any) -> None:
+        if self._pending:
+            loader = self._pending.pop(key, None)
+            if loader is not None:
+                dict.__setitem__(self, key, loader())
+
+    def loaded_items(self) -> List[Tuple[Any, Any]]:
+        """已解码的条目（不触发解码；尚未解码的见 pending）。"""
+        return list(dict.items(self))
+
+    def load_all(self) -> None:
+        for key in list(self._pending):
+            self._load(key)
+
+    def __getitem__(self, key: Any) -> Any:
+        self._load(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        self._load(key)
+        return dict.get(self, key, default)
+
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        self._load(key)
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key: Any, *default: Any) -> Any:
+        self._load(key)
+        return dict.pop(self, key, *default)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._pending or dict.__contains__(self, key)
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._pending.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key: Any) -> None:
+        self._load(key)
+        dict.__delitem__(self, key)
+
+    def __len__(self) -> int:
+        return dict.__len__(self) + len(self._pending)
+
+    def __iter__(self) -> Iterator[Any]:
+        self.load_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self.load_all()
+        return dict.keys(self)
+
+    def values(self):
+        self.load_all()
+        return dict.values(self)
+
+    def items(self):
+        self.load_all()
+        return dict.items(self)
+
+    def clear(self) -> None:
+        self._pending.clear()
+        dict.clear(self)
+
+
+# ----- 写快照 -----
+
+
+def _capture() -> Tuple[List[Tuple[str, bytes]], List[Tuple[str, Any]]]:
+    """
+    在事件循环线程内取当前状态：房间与角色卡会被原地修改，在此直接编码；
+    频道历史只取冷块引用与热尾副本，交给后台线程编码。未解码过的条目直接取原始字节。
+    """
+    from . import channel_store
+    from .routes_characters import _characters_by_user, _versions
+    from .routes_game_rooms import _rooms
+
+    ready: List[Tuple[str, bytes]] = [("rooms", _encode(list(dict.values(_rooms))))]
+    for username, loader in _characters_by_user.pending().items():
+        ready.append(("characters/" + username, loader.raw()))
+    for username, characters in dict.items(_characters_by_user):
+        versions = {cid: _versions[cid] for cid in characters if cid in _versions}
+        ready.append(("characters/" + username, _encode({"characters": characters, "versions": versions})))
+
+    deferred: List[Tuple[str, Any]] = []
+    if not channel_store.DATABASE_URL:
+        for channel_id, loader in channel_store._messages_by_channel.pending().items():
+            ready.append(("history/" + channel_id, loader.raw()))
+        for channel_id, history in dict.items(channel_store._messages_by_channel):
+            deferred.append(("history/" + channel_id, history.export()))
+    return ready, deferred
+
+
+def _write_file(path: str, ready: List[Tuple[str, bytes]], deferred: List[Tuple[str, Any]]) -> int:
+    """编码剩余条目并原子写入快照文件，返回文件大小。可在线程池中执行。"""
+    entries = list(ready)
+    for key, parts in deferred:
+        entries.append((key, _encode_history(*parts)))
+
+    index: Dict[str, List[int]] = {}
+    offset = 0
+    for key, blob in entries:
+        index[key] = [offset, len(blob)]
+        offset += len(blob)
+    header = json.dumps({"created": int(time.time()), "entries": index}, ensure_ascii=False).encode("utf-8")
+
+    # 临时文件名带 pid：多个 worker 同时写快照时互不覆盖（最终以最后一次替换为准）
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER.pack(len(header)))
+        f.write(header)
+        for _, blob in entries:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(MAGIC) + _HEADER.size + len(header) + offset
+
+
+def write_snapshot(path: Optional[str] = None) -> int:
+    """同步写一次快照（在当前线程完成全部编码），返回文件大小。"""
+    ready, deferred = _capture()
+    return _write_file(path or SNAPSHOT_PATH, ready, deferred)
+
+
+# ----- 恢复 -----
+
+
+def _build_characters(raw: bytes) -> Dict[str, Dict[str, Any]]:
+    from .routes_characters import _versions
+
+    payload = _decode(raw)
+    _versions.update(payload.get("versions") or {})
+    return payload.get("characters") or {}
+
+
+def _build_history(raw: bytes) -> ChannelHistory:
+    from . import channel_store
+
+    (meta_len,) = _HEADER.unpack_from(raw, 0)
+    offset = _HEADER.size + meta_len
+    meta = _decode(raw[_HEADER.size : offset])
+    blocks = []
+    for start, length, ids in meta["blocks"]:
+        blocks.append(ColdBlock.from_compressed(start, raw[offset : offset + length], ids))
+        offset += length
+    history = channel_store._new_history(meta["start"])
+    history.load(blocks, meta["hot"])
+    return history
+
+
+def restore_snapshot(path: Optional[str] = None, lazy: bool = SNAPSHOT_LAZY) -> bool:
+    """
+    从快照恢复：读索引、mmap 文件，房间立即载入，角色卡与频道历史登记为延迟解码。
+    文件不存在或损坏时返回 False（从空状态启动）。
+    """
+    from . import channel_store
+    from .routes_characters import _characters_by_user
+    from .routes_game_rooms import _index
+
+    path = path or SNAPSHOT_PATH
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return False
+    try:
+        if buffer[: len(MAGIC)] != MAGIC:
+            raise ValueError("bad magic")
+        (header_len,) = _HEADER.unpack_from(buffer, len(MAGIC))
+        data_start = len(MAGIC) + _HEADER.size + header_len
+        header = json.loads(buffer[len(MAGIC) + _HEADER.size : data_start])
+        entries = header["entries"]
+    except (ValueError, KeyError, struct.error):
+        logger.warning("snapshot %s is unreadable, starting empty", path)
+        return False
+
+    for key, (offset, length) in entries.items():
+        kind, _, name = key.partition("/")
+        if kind == "rooms":
+            for room in _Blob(buffer, data_start + offset, length, _decode)():
+                _index.add(room)
+        elif kind == "characters":
+            _characters_by_user.defer(name, _Blob(buffer, data_start + offset, length, _build_characters))
+        elif kind == "history" and not channel_store.DATABASE_URL:
+            channel_store._messages_by_channel.defer(name, _Blob(buffer, data_start + offset, length, _build_history))
+    if not lazy:
+        _characters_by_user.load_all()
+        channel_store._messages_by_channel.load_all()
+    return True
+
+
+# ----- 定期快照 -----
+
+_task: Optional["asyncio.Task[None]"] = None
+# 定期写入与关闭时的写入不能同时进行（共用同一个临时文件）；在事件循环内首次使用时创建
+_lock: Optional[asyncio.Lock] = None
+
+
+async def save() -> None:
+    """写一次快照：在事件循环内取状态，编码与写文件放到线程池。"""
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        ready, deferred = _capture()
+        started = time.perf_counter()
+        size = await asyncio.get_running_loop().run_in_executor(None, _write_file, SNAPSHOT_PATH, ready, deferred)
+        logger.info("snapshot written: %d bytes in %.3fs", size, time.perf_counter() - started)
+
+
+async def _run() -> None:
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        try:
+            await save()
+        except Exception:
+            logger.exception("snapshot failed")
+
+
+async def start() -> None:
+    """应用启动时调用：恢复快照并启动定期写入任务；未配置 TRPG_SNAPSHOT_PATH 时什么也不做。"""
+    global _task
+    if not SNAPSHOT_PATH or _task is not None:
+        return
+    restore_snapshot()
+    if SNAPSHOT_INTERVAL > 0:
+        _task = asyncio.create_task(_run())
+
+
+async def stop() -> None:
+    """应用关闭时调用：停止定期任务并写最后一次快照。"""
+    global _task
+    if not SNAPSHOT_PATH:
+        return
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    await save()
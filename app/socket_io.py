@@ -1,42 +1,281 @@
 """
 Socket.IO 服务端：与前端 socket.io-client 对接。
 前端通过 VITE_SOCKET_URL 连接（建议与 API 同域，如 http://localhost:3000）。
-事件：join(channelId)、message（聊天消息，按 channelId 广播）。
+事件：join(channelId, lastSeq)、leave(channelId)、message（聊天消息，按 channelId 广播；TRPG_EMIT_BATCH_MS > 0 时
+按频道合并为 messages 批量推送，见 emit_batcher.py）、roll（服务端掷骰，结果以 type="dice" 消息广播）、
+presence（输入状态 / 发言角色）；服务端合并后推送 presence diff，见 presence.py。
+模组子频道按 acl.py 编译的权限控制 join（读）、message / roll（写）与 KP 身份发言。
+lobby / lobby_leave 订阅大厅房间列表的推送（完整列表 + 变更），见 lobby.py。
+message 与 roll 按连接 / 用户 / 频道限速，超限时丢弃并向发送方推送 rate_limited，见 flood_control.py。
+多 worker 部署时（TRPG_BUS=unix://...），房间成员与 emit 经由 bus.BusClientManager 在 worker 间同步，
+聊天消息经总线 topic "chat.message" 按统一顺序写入每个 worker 的频道历史并推送给本 worker 的连接。
 """
 import socketio
+from pydantic import ValidationError
+
+from .acl import READ, channel_acl, speak_denied
+from .bus import BusClientManager, bus
+from .channel_store import append_message, get_messages_since, next_seq, seq_state
+from .dice import DiceError
+from .emit_batcher import emit_batcher
+from .flood_control import flood_control
+from .lobby import lobby_feed
+from .message_record import validate_message
+from .metrics import timed_event
+from .presence import presence_tracker
+from .routes_auth import verify_token
+from .routes_dice import perform_roll
+from .schemas import RollRequest
 
 # 与前端 CORS 一致
 sio = socketio.AsyncServer(
     async_mode="asgi",
     cors_allowed_origins=["http://localhost:8089", "http://localhost:3000"],
+    client_manager=BusClientManager(bus) if bus.distributed else None,
 )
 
 
 @sio.event
 async def connect(sid, environ, auth):
-    pass
+    """
+    连接鉴权：auth = { "token": "<jwt>" } 时校验（与 HTTP 共用已验证 token 缓存），无效则拒绝连接；
+    未携带 token 的连接仍允许匿名接入。
+    """
+    token = auth.get("token") if isinstance(auth, dict) else None
+    if token:
+        user = verify_token(token)
+        if user is None:
+            raise socketio.exceptions.ConnectionRefusedError("未登录或登录已过期")
+        await sio.save_session(sid, {"user": user})
 
 
 @sio.event
 async def disconnect(sid):
-    pass
+    presence_tracker.disconnect(sid)
+    flood_control.forget(sid)
+    lobby_feed.unsubscribe(sid)
+    channel_acl.forget(sid)
 
 
 @sio.event
+@timed_event("join")
 async def join(sid, data):
-    """客户端加入频道：data = { "channelId": "general" }，用于按频道广播消息。"""
+    """
+    客户端加入频道：data = { "channelId": "general", "lastSeq"?: 123, "character"?: "发言角色名" }，用于按频道广播消息。
+    带 lastSeq（已收到的最后一条消息的 seq，没有任何消息时为 -1）时，先以一条
+    messages { channelId, messages, lastSeq, truncated, reset } 补发之后的全部消息，再开始实时推送，不丢不重。
+    加入后立即向该连接发送一次完整在线列表 presence { channelId, full: true, members }，其他成员稍后收到合并的 diff。
+    没有该频道的读权限时不加入，ack 返回 { ok: false, message }。
+    """
+    if not (isinstance(data, dict) and data.get("channelId")):
+        return
+    channel_id = str(data["channelId"])
+    last_seq = data.get("lastSeq")
+    session = await sio.get_session(sid)
+    user = session.get("user") if session else None
+    if not channel_acl.join(sid, channel_id, user) & READ:
+        return {"ok": False, "message": "没有访问该频道的权限"}
+    await sio.enter_room(sid, channel_id)
+    if isinstance(last_seq, int) and not isinstance(last_seq, bool):
+        # 本 worker 的连接 enter_room 不会让出事件循环，入房、取补发区间与 emit 之间没有其他消息写入：
+        # 之前写入的消息都在补发中，之后写入的消息实时推送且排在补发之后。
+        # 开启推送微批时，已写入但仍在缓冲中的消息不补发，由稍后推送的批送达（此时该连接已在房间中）
+        upto = emit_batcher.pending_from(channel_id) if emit_batcher.enabled else None
+        reset = last_seq >= next_seq(channel_id)
+        missed, truncated = get_messages_since(channel_id, last_seq, upto=upto)
+        await sio.emit(
+            "messages",
+            {
+                "channelId": channel_id,
+                "messages": missed,
+                "lastSeq": (next_seq(channel_id) if upto is None else upto) - 1,
+                "truncated": truncated,
+                "reset": reset,
+            },
+            to=sid,
+            ignore_queue=True,
+        )
+    if user is not None:
+        member_id, user_name = f"u:{user.username}", user.username
+    else:
+        name = data.get("userName")
+        member_id, user_name = f"s:{sid}", name if isinstance(name, str) and name else "匿名"
+    character = data.get("character")
+    presence_tracker.join(channel_id, sid, member_id, user_name, character if isinstance(character, str) else None)
+    await sio.emit("presence", presence_tracker.snapshot(channel_id), to=sid, ignore_queue=True)
+
+
+@sio.event
+@timed_event("leave")
+async def leave(sid, data):
+    """客户端离开频道：data = { "channelId": "general" }。"""
     if isinstance(data, dict) and data.get("channelId"):
-        await sio.enter_room(sid, str(data["channelId"]))
+        channel_id = str(data["channelId"])
+        await sio.leave_room(sid, channel_id)
+        presence_tracker.leave(channel_id, sid)
+        channel_acl.leave(sid, channel_id)
+
+
+@sio.on("presence")
+@timed_event("presence")
+async def presence(sid, data):
+    """
+    更新本连接在频道内的状态：data = { "channelId", "typing"?: bool, "character"?: "发言角色名" }。
+    typing 需在 TRPG_TYPING_TTL 秒内重复发送，否则自动清除；发出 message 时也会清除。
+    """
+    if not (isinstance(data, dict) and data.get("channelId")):
+        return
+    typing = data.get("typing")
+    character = data.get("character")
+    presence_tracker.update(
+        str(data["channelId"]),
+        sid,
+        typing=typing if isinstance(typing, bool) else None,
+        character=character if isinstance(character, str) else None,
+    )
+
+
+@sio.event
+@timed_event("lobby")
+async def lobby(sid, data):
+    """
+    订阅大厅：data = { "keyword"?, "status"?: "recruiting,full", "module"? }，条件同 GET /api/game-rooms，需登录。
+    再次发送即替换条件。立即推送 lobby { version, full: true, rooms }，之后推送 lobby { version, changes }。
+    ack 返回 { ok: true } 或 { ok: false, message }。
+    """
+    session = await sio.get_session(sid)
+    if not (session and session.get("user")):
+        return {"ok": False, "message": "未登录或登录已过期"}
+    data = data if isinstance(data, dict) else {}
+    values = [data.get(k) for k in ("keyword", "status", "module")]
+    keyword, status, module = (v if isinstance(v, str) else None for v in values)
+    old, group = lobby_feed.subscribe(sid, keyword, status, module)
+    if old is not None:
+        await sio.leave_room(sid, old)
+    # 入组与取完整列表之间不让出事件循环：列表之后的变更都会推送给该连接
+    await sio.enter_room(sid, group)
+    await sio.emit("lobby", lobby_feed.snapshot(group), to=sid, ignore_queue=True)
+    return {"ok": True}
+
+
+@sio.event
+@timed_event("lobby_leave")
+async def lobby_leave(sid, data=None):
+    """取消大厅订阅（离开大厅页面时调用）。"""
+    group = lobby_feed.unsubscribe(sid)
+    if group is not None:
+        await sio.leave_room(sid, group)
 
 
 @sio.event
+@timed_event("message")
 async def message(sid, data):
     """
     客户端发聊天消息。服务端广播到同频道（channelId）所有连接，并写入历史供 GET /api/channels/:id/messages 拉取。
+    字段类型不符合 SocketMessage、没有该频道的写权限（以 KP 身份发言需 KP 权限）或发送过快时不广播，
+    ack 返回 { ok: false, message }。
     """
-    if not isinstance(data, dict):
-        return
+    try:
+        data = validate_message(data)
+    except ValidationError:
+        return {"ok": False, "message": "消息格式无效"}
+    channel_id = str(data.get("channelId") or "general")
+    session = await sio.get_session(sid)
+    user = session.get("user") if session else None
+    denied = speak_denied(channel_acl.rights(sid, channel_id, user), data.get("speakerRole"))
+    if denied is not None:
+        return {"ok": False, "message": denied}
+    rejected = await _shed(sid, channel_id, user)
+    if rejected is not None:
+        return rejected
+    presence_tracker.update(channel_id, sid, typing=False)
+    await bus.publish("chat.message", data)
+
+
+@sio.event
+@timed_event("roll")
+async def roll(sid, data):
+    """
+    服务端掷骰：data 与 POST /api/dice/roll 的请求体相同（通常带 channelId），
+    结果作为 type="dice" 的消息广播到频道并写入历史（权限同 message）；ack 返回 { ok, result } 或 { ok: false, message }。
+    读取角色卡技能（characterId）需要连接时携带 token。
+    """
+    try:
+        req = RollRequest.model_validate(data)
+    except ValidationError:
+        return {"ok": False, "message": "参数无效"}
+    session = await sio.get_session(sid)
+    user = session.get("user") if session else None
+    if req.channelId:
+        denied = speak_denied(channel_acl.rights(sid, req.channelId, user), req.speakerRole)
+        if denied is not None:
+            return {"ok": False, "message": denied}
+    rejected = await _shed(sid, req.channelId or None, user)
+    if rejected is not None:
+        return rejected
+    username = user.username if user is not None else None
+    user_name = username or (data.get("userName") if isinstance(data.get("userName"), str) else None) or "匿名"
+    try:
+        result = await perform_roll(req, username, user_name)
+    except DiceError as e:
+        return {"ok": False, "message": e.message}
+    return {"ok": True, "result": result}
+
+
+async def _shed(sid, channel_id, user):
+    """
+    限速：放行时返回 None；超限时返回给 ack 的错误，并（限频地）向该连接推送
+    rate_limited { channelId, scope, retryAfter }。
+    """
+    limited = flood_control.check(sid, f"u:{user.username}" if user is not None else None, channel_id)
+    if limited is None:
+        return None
+    scope, retry_after = limited
+    if flood_control.should_notice(sid):
+        await sio.emit(
+            "rate_limited",
+            {"channelId": channel_id, "scope": scope, "retryAfter": round(retry_after, 2)},
+            to=sid,
+            ignore_queue=True,
+        )
+    return {"ok": False, "message": "发送过于频繁，请稍后再试"}
+
+
+async def _on_chat_message(data, local):
+    """总线分发的聊天消息：写入本 worker 的历史（仅发出方落库），再推送给本 worker 上的频道成员。"""
     channel_id = data.get("channelId") or "general"
-    from .channel_store import append_message
-    append_message(data)
-    await sio.emit("message", data, room=channel_id)
+    # 跨进程总线由 broker 统一分配 seq；单进程时由本地历史分配（客户端带来的 seq 不采用）
+    msg = append_message(data, persist=local, seq=data.get("seq") if bus.distributed else None)
+    if emit_batcher.enabled:
+        emit_batcher.add(channel_id, msg)
+    else:
+        await sio.emit("message", msg, room=channel_id, ignore_queue=True)
+
+
+async def _emit_batch(channel_id, messages):
+    await sio.emit("messages", {"channelId": channel_id, "messages": messages}, room=channel_id, ignore_queue=True)
+
+
+async def _revoke_channel(sid, channel_id):
+    """权限变更后失去读权限：移出频道并通知该连接 access_revoked { channelId }。"""
+    await sio.leave_room(sid, channel_id)
+    presence_tracker.leave(channel_id, sid)
+    await sio.emit("access_revoked", {"channelId": channel_id}, to=sid, ignore_queue=True)
+
+
+async def _emit_lobby(payload, group):
+    # 房间为各 worker 独立存储，只推送给本 worker 的订阅者
+    await sio.emit("lobby", payload, room=group, ignore_queue=True)
+
+
+async def _emit_presence(diff, channel_id):
+    # 不加 ignore_queue：多 worker 时经总线推送给所有 worker 上的频道成员
+    await sio.emit("presence", diff, room=channel_id)
+
+
+bus.subscribe("chat.message", _on_chat_message)
+bus.sequence("chat.message", "channelId", seq_state)
+presence_tracker.bind(_emit_presence)
+emit_batcher.bind(_emit_batch)
+lobby_feed.bind(_emit_lobby)
+channel_acl.bind(_revoke_channel)
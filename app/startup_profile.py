@@ -0,0 +1,137 @@
+"""
+启动耗时分析：记录每个模块的导入耗时（含子模块的累计耗时与扣除子模块后的自身耗时）以及启动各阶段的时间点。
+
+设置 TRPG_STARTUP_PROFILE=1 时由 app/__init__.py 在最早的时机安装导入计时器，启动完成后
+把阶段耗时与自身耗时最高的模块打印到日志；TRPG_STARTUP_PROFILE_OUT=<path> 时另存完整结果为 JSON。
+只依赖标准库，未开启时不安装任何钩子。
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from importlib.abc import MetaPathFinder
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENABLED = os.environ.get("TRPG_STARTUP_PROFILE", "0") not in ("", "0")
+PROFILE_OUT = os.environ.get("TRPG_STARTUP_PROFILE_OUT", "")
+PROFILE_TOP = int(os.environ.get("TRPG_STARTUP_PROFILE_TOP", "25"))
+
+# 计时起点：本模块被导入的时刻（即 app 包被导入时，uvicorn 自身的导入不计入）
+_origin = time.perf_counter()
+# 模块名 → [累计耗时, 自身耗时]（秒）
+_modules: Dict[str, List[float]] = {}
+# 阶段名 → 距起点的秒数
+_phases: Dict[str, float] = {}
+_local = threading.local()
+_dumped = False
+
+
+class _TimedLoader:
+    """包装真实 loader，只对 exec_module 计时，其余属性原样转发。"""
+
+    def __init__(self, loader: Any, name: str) -> None:
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._loader, item)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        # 还原 loader，避免后续代码看到包装对象
+        module.__loader__ = self._loader
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self._loader
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            _modules[self._name] = [elapsed, elapsed - children]
+
+
+class _ImportTimer(MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        if getattr(_local, "finding", False):
+            return None
+        _local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            _local.finding = False
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, name)
+        return spec
+
+
+_timer: Optional[_ImportTimer] = None
+
+
+def install() -> None:
+    """在 sys.meta_path 最前面安装导入计时器（重复调用无效）。"""
+    global _timer
+    if _timer is None:
+        _timer = _ImportTimer()
+        sys.meta_path.insert(0, _timer)
+
+
+def uninstall() -> None:
+    global _timer
+    if _timer is not None:
+        sys.meta_path.remove(_timer)
+        _timer = None
+
+
+def mark(phase: str) -> None:
+    """记录启动阶段的时间点（未开启时为空操作）。"""
+    if PROFILE_ENABLED:
+        _phases[phase] = time.perf_counter() - _origin
+
+
+def report(top: int = PROFILE_TOP) -> Dict[str, Any]:
+    """阶段耗时与按自身耗时排序的模块列表（毫秒）。"""
+    ranked: List[Tuple[str, List[float]]] = sorted(_modules.items(), key=lambda kv: kv[1][1], reverse=True)
+    return {
+        "phasesMs": {k: round(v * 1000, 1) for k, v in _phases.items()},
+        "modules": len(_modules),
+        "importTotalMs": round(sum(v[1] for v in _modules.values()) * 1000, 1),
+        "topSelfMs": [{"module": k, "selfMs": round(v[1] * 1000, 2), "cumulativeMs": round(v[0] * 1000, 2)} for k, v in ranked[:top]],
+    }
+
+
+def dump() -> None:
+    """启动完成时调用一次：卸下计时器，打印报告并按需写入 JSON 文件。"""
+    global _dumped
+    if not PROFILE_ENABLED or _dumped:
+        return
+    _dumped = True
+    uninstall()
+    result = report()
+    logger.warning("startup phases (ms since app import): %s", result["phasesMs"])
+    logger.warning("imported %d modules, %.1f ms total", result["modules"], result["importTotalMs"])
+    for row in result["topSelfMs"]:
+        logger.warning("  %8.2f ms self %8.2f ms cumulative  %s", row["selfMs"], row["cumulativeMs"], row["module"])
+    if PROFILE_OUT:
+        result["allModules"] = {k: [round(v[0] * 1000, 3), round(v[1] * 1000, 3)] for k, v in _modules.items()}
+        with open(PROFILE_OUT, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,64 @@
+"""
+哈希时间轮：大量对象的超时检查共用一个定时器，不必为每个对象建立定时任务。
+
+- 时间按 tick 秒分格，共 slots 格，环形复用；对象按到期时间放入对应的格子（集合），schedule / cancel 均为 O(1)；
+- advance(now) 依次处理从上次到 now 之间经过的格子，取出其中的全部对象；
+  每个对象每次到期只被处理一次，时间轮本身不额外遍历未到期的对象；
+- 到期时间超过时间轮跨度（tick × slots）的对象放在最远的一格，取出后由调用方检查实际期限并重新 schedule。
+
+时间轮只负责「到时间了再看一眼」：调用方在取出的对象上判断是否真正超时，活动频繁的对象只需更新自己的
+最后活动时间，不必每次都在时间轮中移动。
+"""
+from typing import Dict, Hashable, List, Set
+
+
+class TimingWheel:
+    def __init__(self, tick: float, slots: int, now: float) -> None:
+        self.tick = tick
+        self._slots: List[Set[Hashable]] = [set() for _ in range(max(2, slots))]
+        # 对象 → 所在格子的下标
+        self._where: Dict[Hashable, int] = {}
+        # 已处理到的 tick 序号（绝对值）
+        self._current = int(now // tick)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self._where
+
+    def schedule(self, item: Hashable, when: float) -> None:
+        """在 when 时刻（与 advance 使用同一时钟）之后取出 item；已在时间轮中时改为新的时刻。"""
+        self.cancel(item)
+        span = len(self._slots)
+        ticks = min(max(int(when // self.tick), self._current + 1), self._current + span - 1)
+        index = ticks % span
+        self._slots[index].add(item)
+        self._where[item] = index
+
+    def cancel(self, item: Hashable) -> None:
+        index = self._where.pop(item, None)
+        if index is not None:
+            self._slots[index].discard(item)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """推进到 now，返回期间到期的对象（已从时间轮移除）。"""
+        target = int(now // self.tick)
+        if target <= self._current:
+            return []
+        span = len(self._slots)
+        expired: List[Hashable] = []
+        if target - self._current >= span:
+            # 落后超过一整圈（事件循环长时间阻塞）：全部到期
+            indexes = range(span)
+        else:
+            indexes = [(self._current + step) % span for step in range(1, target - self._current + 1)]
+        for index in indexes:
+            bucket = self._slots[index]
+            if bucket:
+                self._slots[index] = set()
+                expired.extend(bucket)
+                for item in bucket:
+                    del self._where[item]
+        self._current = target
+        return expired
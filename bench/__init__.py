@@ -0,0 +1,7 @@
+"""
+性能基准脚本集合（不随服务部署），在仓库根目录以模块方式运行，例如：
+
+    python -m bench.persistence_throughput
+
+每个脚本将结果以 JSON 打印到标准输出，便于跨提交对比。
+"""
@@ -0,0 +1,91 @@
+"""
+频道权限判断的开销：--modules 个模组、每个 --subs 个子频道、每个子频道 userAccess 中 --users 个用户时，对比
+- 「逐条解析」：每条消息都在 modules 中找到子频道，再看 ownerId 与 userAccess（未做编译时的写法）；
+- 「编译 + 连接缓存」：channel_acl.rights，join 时解析一次，之后每条消息一次字典查找（未加入的频道每次现查编译后的表）；
+的单次耗时，以及修改一次 userAccess 后重新编译的耗时（--connections 个连接各缓存一个频道）。
+
+    python -m bench.acl_lookup --modules 200 --subs 5 --users 50
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from app import acl, channel_store
+from app.schemas import User
+
+
+def _naive(modules: List[Dict[str, Any]], user: User, channel_id: str) -> int:
+    for module in modules:
+        for sub in module["subChannels"]:
+            if sub["id"] != channel_id:
+                continue
+            if module.get("ownerId") in (str(user.id), user.username):
+                return acl.ALL
+            for key in (str(user.id), user.username):
+                level = sub["userAccess"].get(key)
+                if level is not None:
+                    return acl.LEVELS.get(level, 0)
+            return acl.LEVELS[acl.ACL_DEFAULT]
+    return acl.ALL
+
+
+def _per_call_us(func, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return round((time.perf_counter() - started) * 1e6 / rounds, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", type=int, default=200)
+    parser.add_argument("--subs", type=int, default=5)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    levels = list(acl.LEVELS)
+    channel_store.modules[:] = [
+        {
+            "id": f"m{m}",
+            "ownerId": f"kp{m}",
+            "subChannels": [
+                {"id": f"m{m}-{s}", "userAccess": {f"user{u}": rng.choice(levels) for u in range(args.users)}}
+                for s in range(args.subs)
+            ],
+        }
+        for m in range(args.modules)
+    ]
+    # 取表中靠后的子频道，逐条解析时需要走过大部分模组；该用户须可读，join 后才会缓存
+    channel_id = f"m{args.modules - 1}-{args.subs - 1}"
+    channel_store.modules[-1]["subChannels"][-1]["userAccess"]["user7"] = "full"
+    channel_store.mark_catalog_changed()
+    user = User(id=10**6, username="user7")
+    sid = "bench-sid"
+    channel_acl = acl.channel_acl
+    assert channel_acl.join(sid, channel_id, user) == _naive(channel_store.modules, user, channel_id)
+
+    for i in range(args.connections):
+        channel_acl.join(f"sid{i}", f"m{i % args.modules}-0", User(id=i, username=f"user{i % args.users}"))
+    started = time.perf_counter()
+    acl.set_user_access("m0-0", "user0", "none")
+    refresh_ms = (time.perf_counter() - started) * 1000
+
+    report = {
+        "params": {k: v for k, v in vars(args).items() if k != "rounds"},
+        "perMessageUs": {
+            "naive": _per_call_us(lambda: _naive(channel_store.modules, user, channel_id), args.rounds // 20),
+            "compiledCached": _per_call_us(lambda: channel_acl.rights(sid, channel_id, user), args.rounds),
+            "compiledNotJoined": _per_call_us(lambda: channel_acl.rights("bench-other", channel_id, user), args.rounds),
+        },
+        "recompileAfterChangeMs": round(refresh_ms, 2),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
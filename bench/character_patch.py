@@ -0,0 +1,103 @@
+"""
+角色卡自动保存：对比整卡 PUT 与 PATCH（JSON Patch 改一个 HP 值）的请求体字节数与服务端耗时。
+
+    python -m bench.character_patch --requests 500
+
+HTTP 请求经 httpx.ASGITransport 在进程内驱动 app.main.app；服务端耗时为单请求往返耗时。
+patch_minimal 一项额外带 Prefer: return=minimal，响应不回传整张角色卡。
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.main import app
+
+from .common import login, summarize
+
+SKILL_NAMES = [
+    "会计", "人类学", "估价", "考古学", "魅惑", "攀爬", "计算机使用", "信用评级", "克苏鲁神话", "乔装",
+    "闪避", "汽车驾驶", "电气维修", "电子学", "话术", "格斗（斗殴）", "射击（手枪）", "射击（步枪/霰弹枪）",
+    "急救", "历史", "恐吓", "跳跃", "母语", "法律", "图书馆使用", "聆听", "锁匠", "机械维修", "医学",
+    "博物学", "领航", "神秘学", "操作重型机械", "说服", "精神分析", "心理学", "骑术", "妙手", "侦查",
+    "潜行", "游泳", "投掷", "追踪", "生存", "外语（英语）", "艺术与手艺（摄影）", "科学（化学）",
+]
+
+
+def _sheet() -> dict:
+    return {
+        "campaign": "亡蝶葬仪",
+        "era": "1920s",
+        "name": "林秋",
+        "occupation": "记者",
+        "age": 28,
+        "str": 50, "dex": 60, "siz": 55, "app": 65, "con": 50, "int": 75, "pow": 60, "edu": 70, "luc": 45,
+        "hpCurrent": 10, "mpCurrent": 12, "sanCurrent": 60,
+        "skills": [{"name": n, "base": 5, "occupation": 20, "interest": 10, "value": 35} for n in SKILL_NAMES],
+        "weapons": [{"name": "徒手", "skill": "格斗（斗殴）", "damage": "1d3+db", "range": "-", "rate": 1}] * 4,
+        "possessions": {"items": ["笔记本", "钢笔", "相机", "手电筒", "旧地图"] * 6, "cash": "$12.5"},
+        "story": {k: "一段较长的背景描述。" * 20 for k in ("description", "ideology", "people", "places", "traits")},
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        auth = await login(client)
+        sheet = _sheet()
+        character_id = (await client.post("/api/characters", json=sheet, headers=auth)).json()["id"]
+
+        put_times, patch_times, minimal_times = [], [], []
+        put_bytes = patch_bytes = 0
+        for i in range(args.requests):
+            sheet["hpCurrent"] = i % 12
+            body = json.dumps(sheet, ensure_ascii=False).encode()
+            put_bytes = len(body)
+            started = time.perf_counter()
+            resp = await client.put(
+                f"/api/characters/{character_id}",
+                content=body,
+                headers={**auth, "Content-Type": "application/json"},
+            )
+            put_times.append((time.perf_counter() - started) * 1e6)
+            assert resp.status_code == 200
+
+            body = json.dumps([{"op": "replace", "path": "/hpCurrent", "value": i % 12}]).encode()
+            patch_bytes = len(body)
+            started = time.perf_counter()
+            resp = await client.patch(
+                f"/api/characters/{character_id}",
+                content=body,
+                headers={**auth, "Content-Type": "application/json-patch+json"},
+            )
+            patch_times.append((time.perf_counter() - started) * 1e6)
+            assert resp.status_code == 200
+
+            started = time.perf_counter()
+            resp = await client.patch(
+                f"/api/characters/{character_id}",
+                content=body,
+                headers={**auth, "Content-Type": "application/json-patch+json", "Prefer": "return=minimal"},
+            )
+            minimal_times.append((time.perf_counter() - started) * 1e6)
+            assert resp.status_code == 200
+
+    print(
+        json.dumps(
+            {
+                "put": {"request_bytes": put_bytes, **summarize(put_times)},
+                "patch": {"request_bytes": patch_bytes, **summarize(patch_times)},
+                "patch_minimal": {"request_bytes": patch_bytes, **summarize(minimal_times)},
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""基准脚本共用的工具：延迟统计、本地 uvicorn 子进程、登录。"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, Optional
+
+import httpx
+
+
+def summarize(samples_us: Iterable[float]) -> Dict[str, float]:
+    """微秒延迟样本 → 均值与 p50/p95/p99。"""
+    samples = sorted(samples_us)
+    if not samples:
+        return {"count": 0}
+
+    def pct(q: float) -> float:
+        return round(samples[min(len(samples) - 1, int(len(samples) * q))], 1)
+
+    return {
+        "count": len(samples),
+        "mean_us": round(statistics.mean(samples), 1),
+        "p50_us": pct(0.50),
+        "p95_us": pct(0.95),
+        "p99_us": pct(0.99),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """以子进程启动 uvicorn app.main:asgi_app（单 worker）。"""
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:asgi_app", "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ, **(env or {})),
+    )
+
+
+async def wait_healthy(port: int, timeout: float = 15.0) -> float:
+    """轮询 /health 直到返回 200，返回等待的秒数。"""
+    started = time.monotonic()
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(f"http://127.0.0.1:{port}/health")).status_code == 200:
+                    return time.monotonic() - started
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() - started > timeout:
+                raise RuntimeError(f"server on port {port} did not start")
+            await asyncio.sleep(0.01)
+
+
+async def login(client: httpx.AsyncClient, username: str = "admin", password: str = "123456") -> Dict[str, str]:
+    """登录并返回 Authorization 请求头。"""
+    resp = await client.post("/api/auth/login", json={"username": username, "password": password})
+    return {"Authorization": f"Bearer {resp.json()['token']}"}
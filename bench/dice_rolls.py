@@ -0,0 +1,55 @@
+"""
+掷骰引擎：对比逐次 roll() 与批量 roll_many() / check_many() 的耗时，以及表达式缓存命中与首次解析的耗时。
+
+    python -m bench.dice_rolls --times 10000
+"""
+import argparse
+import json
+import time
+
+from app import dice
+
+
+def _timed(func, repeat: int) -> float:
+    """repeat 次调用的平均耗时（毫秒）。"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return round((time.perf_counter() - started) * 1000 / repeat, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--times", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {"numpy": dice._np is not None, "times": args.times, "expressions": {}}
+    for text in ("1d100", "3d6*5", "2d10+1d4", "d100b2"):
+        expression = dice.compile_expression(text)
+        report["expressions"][text] = {
+            "loopMs": _timed(lambda: [expression.roll() for _ in range(args.times)], args.repeat),
+            "batchMs": _timed(lambda: expression.roll_many(args.times), args.repeat),
+        }
+    targets = [45] * args.times
+    report["sanChecks"] = {
+        "loopMs": _timed(lambda: [dice.check_many([t]) for t in targets], args.repeat),
+        "batchMs": _timed(lambda: dice.check_many(targets), args.repeat),
+    }
+
+    samples = ["(2d6+6)*5+%d" % i for i in range(1000)]
+    dice._compile.cache_clear()
+    started = time.perf_counter()
+    for text in samples:
+        dice.compile_expression(text)
+    parse_us = (time.perf_counter() - started) * 1e6 / len(samples)
+    started = time.perf_counter()
+    for text in samples:
+        dice.compile_expression(text)
+    cached_us = (time.perf_counter() - started) * 1e6 / len(samples)
+    report["compile"] = {"parseUs": round(parse_us, 2), "cachedUs": round(cached_us, 2)}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+高频频道的推送微批：启动本地 uvicorn 子进程，--clients 个 python-socketio 客户端加入同一频道，
+每个客户端以 --rate 条/秒发消息，持续 --seconds 秒；分别在逐条推送（TRPG_EMIT_BATCH_MS=0）与
+各 --windows 毫秒的微批下运行，输出
+- 服务端处理的消息数/秒、投递数/秒；
+- 服务端进程 CPU 时间（/proc/<pid>/stat 的 utime + stime）折合每条消息的微秒数；
+- 端到端投递延迟分位数（按消息内的发送时间计算）。
+
+    python -m bench.emit_batching --clients 50 --rate 20 --windows 5 --windows 20
+
+客户端与服务端在同一台机器上运行，投递数/秒与延迟会受客户端解码开销影响；每条消息的服务端 CPU 不受影响。
+需要 pip install aiohttp，且只能在 Linux 上读取进程 CPU 时间。
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List
+
+from .common import free_port, start_server, summarize, wait_healthy
+
+_TICK = os.sysconf("SC_CLK_TCK")
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # 括号后第 12、13 项为 utime、stime
+    return (int(fields[11]) + int(fields[12])) / _TICK
+
+
+async def _run(args: argparse.Namespace, window_ms: int) -> Dict[str, object]:
+    import socketio
+
+    port = free_port()
+    # 每连接 20 条/秒超过默认限速，关闭防刷
+    env = {"TRPG_EMIT_BATCH_MS": str(window_ms), "TRPG_EMIT_BATCH_MAX": str(args.batch_max), "TRPG_FLOOD": "0"}
+    proc = start_server(port, env)
+    try:
+        await wait_healthy(port)
+        url = f"http://127.0.0.1:{port}"
+        latencies: List[float] = []
+        frames = 0
+
+        def on_message(data):
+            nonlocal frames
+            frames += 1
+            latencies.append((time.time() - data["time"] / 1000) * 1e6)
+
+        def on_messages(data):
+            nonlocal frames
+            frames += 1
+            now = time.time()
+            for msg in data["messages"]:
+                latencies.append((now - msg["time"] / 1000) * 1e6)
+
+        clients = []
+        for _ in range(args.clients):
+            client = socketio.AsyncClient()
+            client.on("message", on_message)
+            client.on("messages", on_messages)
+            await client.connect(url, transports=["websocket"])
+            await client.emit("join", {"channelId": "bench-batch"})
+            clients.append(client)
+        await asyncio.sleep(0.5)
+
+        interval = 1 / args.rate
+        count = int(args.seconds * args.rate)
+
+        async def send(index: int) -> None:
+            client = clients[index]
+            # 各发送方错开起点，避免同一时刻齐发
+            await asyncio.sleep(interval * index / args.clients)
+            next_at = time.monotonic()
+            for k in range(count):
+                await client.emit(
+                    "message",
+                    {
+                        "id": f"b{index}-{k}",
+                        "channelId": "bench-batch",
+                        "userName": f"u{index}",
+                        "content": "掷骰 1d100=42",
+                        "time": time.time() * 1000,
+                        "type": "text",
+                    },
+                )
+                next_at += interval
+                await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+        cpu_before = _cpu_seconds(proc.pid)
+        started = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(args.clients)))
+        expected = args.clients * count * args.clients
+        deadline = time.monotonic() + 30
+        while len(latencies) < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        cpu = _cpu_seconds(proc.pid) - cpu_before
+        for client in clients:
+            await client.disconnect()
+        sent = args.clients * count
+        return {
+            "windowMs": window_ms,
+            "sent": sent,
+            "expectedDeliveries": expected,
+            "deliveries": len(latencies),
+            "framesReceived": frames,
+            "messagesPerSec": round(sent / elapsed, 1),
+            "deliveriesPerSec": round(len(latencies) / elapsed, 1),
+            "serverCpuS": round(cpu, 2),
+            "serverCpuUsPerMessage": round(cpu * 1e6 / sent, 1),
+            "latency": summarize(latencies),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, object]:
+    runs = [await _run(args, 0)]
+    for window_ms in args.windows or [10]:
+        runs.append(await _run(args, window_ms))
+    return {"params": {k: v for k, v in vars(args).items() if k != "windows"}, "runs": runs}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=20, help="每个客户端每秒发送条数")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--windows", type=int, action="append", help="微批窗口（毫秒），可重复；默认 10")
+    parser.add_argument("--batch-max", type=int, default=64)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_main(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
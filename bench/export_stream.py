@@ -0,0 +1,86 @@
+"""
+跑团记录导出的内存占用：向频道写入 --messages 条消息后，分别以
+- 「一次性」：按 limit / before 翻页取全部消息、拼成完整 NDJSON 后返回；
+- 「流式」：log_export.export_chunks 逐块产出；
+导出全部记录，输出耗时、字节数与 tracemalloc 记录的导出过程峰值内存（不含历史本身）。
+
+    python -m bench.export_stream --messages 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Dict
+
+from app import channel_store
+from app.log_export import export_chunks
+
+
+def _fill(channel_id: str, count: int) -> None:
+    for i in range(count):
+        channel_store.append_message(
+            {
+                "id": f"{channel_id}-{i}",
+                "channelId": channel_id,
+                "userName": f"player{i % 6}",
+                "content": f"第 {i} 条：调查员推开了积满灰尘的门，烛光在走廊尽头摇曳。",
+                "time": 1700000000000 + i * 1000,
+                "type": "text",
+            }
+        )
+
+
+async def _buffered(channel_id: str, page: int) -> int:
+    pages = []
+    before = None
+    while True:
+        batch = await channel_store.get_messages(channel_id, limit=page, before=before)
+        if not batch:
+            break
+        pages.append(batch)
+        if batch[0]["seq"] == 0:
+            break
+        before = batch[0]["id"]
+    body = "".join(json.dumps(m, ensure_ascii=False) + "\n" for batch in reversed(pages) for m in batch)
+    return len(body.encode("utf-8"))
+
+
+async def _streamed(channel_id: str, fmt: str) -> int:
+    total = 0
+    async for chunk in export_chunks(channel_id, fmt):
+        total += len(chunk)
+    return total
+
+
+def _measure(func) -> Dict[str, float]:
+    # tracemalloc 会显著拖慢执行，耗时与峰值内存分两次测
+    started = time.perf_counter()
+    size = func()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"bytes": size, "elapsedMs": round(elapsed * 1000, 1), "peakMB": round(peak / 1e6, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--page", type=int, default=100, help="一次性导出时每页条数")
+    args = parser.parse_args()
+
+    channel_store.HISTORY_CAPACITY = max(channel_store.HISTORY_CAPACITY, args.messages)
+    _fill("bench-export", args.messages)
+    report = {
+        "params": vars(args),
+        "bufferedNdjson": _measure(lambda: asyncio.run(_buffered("bench-export", args.page))),
+        "streamedNdjson": _measure(lambda: asyncio.run(_streamed("bench-export", "ndjson"))),
+        "streamedText": _measure(lambda: asyncio.run(_streamed("bench-export", "text"))),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
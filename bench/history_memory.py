@@ -0,0 +1,107 @@
+"""
+频道历史冷块压缩：对比全部以 dict 常驻（旧环形缓冲的做法）与热尾 + 压缩冷块时，
+每 10 万条消息的内存占用，以及按 before 翻页的读取延迟（热尾 / 冷块未命中 / 冷块命中）。
+
+    python -m bench.history_memory --messages 100000 --pages 2000
+
+内存用 tracemalloc 统计构造历史期间新增的分配量。
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app import history as history_module
+from app.history import ChannelHistory
+
+from .common import summarize
+
+
+def _message(i: int) -> Dict[str, object]:
+    return {
+        "id": f"m{i}-{random.getrandbits(32):08x}",
+        "channelId": "bench-history",
+        "userName": f"玩家{i % 6}",
+        "content": random.choice(["掷骰 1d100=42", "我检查一下书架上的旧日记。", "（潜入）", "SAN -1d6"]) + f" #{i}",
+        "time": 1700000000000 + i * 1500,
+        "type": "text",
+    }
+
+
+def _build(count: int, make: Callable[[], ChannelHistory]) -> Dict[str, object]:
+    random.seed(1)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    history = make()
+    for i in range(count):
+        history.append(_message(i))
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return {"history": history, "bytes": used}
+
+
+def _page_latency(history: ChannelHistory, ids: List[str], pages: int, limit: int) -> List[float]:
+    samples = []
+    for i in range(pages):
+        before = ids[i % len(ids)]
+        started = time.perf_counter()
+        page = history.page(limit, before)
+        samples.append((time.perf_counter() - started) * 1e6)
+        assert len(page) == limit
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--hot", type=int, default=1000)
+    parser.add_argument("--block", type=int, default=256)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    n = args.messages
+    # hot_size 不小于总数时不会冻结，即全部以 dict 常驻
+    plain = _build(n, lambda: ChannelHistory(n, hot_size=n, block_size=args.block))
+    cold = _build(n, lambda: ChannelHistory(n, hot_size=args.hot, block_size=args.block))
+    history: ChannelHistory = cold["history"]
+    all_ids = [m["id"] for m in history.slice(history.start, history.end)]
+    scale = 100000 / n
+
+    cache = history_module.block_cache
+    hot_ids = all_ids[-args.hot + args.limit :]
+    # 冷区随机翻页：每次落在不同的块上，先清空 LRU 以测未命中
+    cold_ids = random.sample(all_ids[args.limit : history.end - args.hot - args.block], min(args.pages, n // 2))
+    cache._entries.clear()
+    misses_before = cache.misses
+    cold_miss = _page_latency(history, cold_ids, len(cold_ids), args.limit)
+    miss_count = cache.misses - misses_before
+    # 同一小段区间反复翻页：块已在 LRU 中
+    warm_ids = all_ids[args.limit : args.limit + args.block * 4]
+    _page_latency(history, warm_ids, len(warm_ids), args.limit)
+    cold_hit = _page_latency(history, warm_ids, args.pages, args.limit)
+
+    report = {
+        "messages": n,
+        "hotSize": args.hot,
+        "blockSize": args.block,
+        "memoryPer100k": {
+            "allDictBytes": int(plain["bytes"] * scale),
+            "hotPlusColdBytes": int(cold["bytes"] * scale),
+            "savedBytes": int((plain["bytes"] - cold["bytes"]) * scale),
+            "ratio": round(plain["bytes"] / cold["bytes"], 2) if cold["bytes"] else None,
+        },
+        "stats": history.stats(),
+        "pageLatency": {
+            "hot": summarize(_page_latency(history, hot_ids, args.pages, args.limit)),
+            "coldMiss": dict(summarize(cold_miss), blockDecodes=miss_count),
+            "coldHit": summarize(cold_hit),
+        },
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
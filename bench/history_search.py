@@ -0,0 +1,151 @@
+"""
+频道历史全文搜索：向一个频道写入 --messages 条中英混合的跑团消息后，测量
+- 建索引耗时（首次搜索时在线程池中建立）与之后每条消息的增量索引耗时；
+- 索引内存（逐词统计的字节数与 /metrics 使用的估算值）；
+- 各类查询（罕见词、常见词、多词、英文）的延迟分位数：只查索引、查索引并取回结果消息（冷块已在缓存中）、
+  以及清空冷块缓存后首次取回结果；对照逐条子串扫描的耗时。
+
+    python -m bench.history_search --messages 1000000
+
+需要把 TRPG_HISTORY_CAPACITY 调到不小于 --messages，脚本内已自动设置。
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from app import channel_store, search
+from app import history as history_module
+
+from .common import summarize
+
+_PHRASES = [
+    "调查员推开了积满灰尘的门",
+    "烛光在走廊尽头摇曳",
+    "我检查一下书架上的旧日记",
+    "守卫似乎没有注意到我们",
+    "地下室传来奇怪的声音",
+    "我想和老板聊聊最近的失踪案",
+    "桌上放着一张泛黄的地图",
+    "窗外下起了大雨",
+    "我们决定先回旅馆休息",
+    "图书馆的管理员很不耐烦",
+    "（潜入）",
+    "过一个侦查",
+    "SAN check",
+    "roll for spot hidden",
+    "the door is locked",
+    "I search the desk drawers",
+    "掷骰 1d100",
+    "这封信的落款是一个陌生的名字",
+    "教堂的钟声响了十二下",
+    "他的眼神有些闪躲",
+]
+# 只在少量消息中出现的线索
+_CLUES = ["在壁炉里找到了一把生锈的钥匙", "brass key hidden under the floorboard", "神秘的符文刻在石碑上"]
+
+
+def _content(rng: random.Random, i: int) -> str:
+    parts = rng.sample(_PHRASES, rng.randint(1, 3))
+    if rng.random() < 0.001:
+        parts.append(rng.choice(_CLUES))
+    if rng.random() < 0.2:
+        parts.append(f"1d100={rng.randint(1, 100)}")
+    return "，".join(parts)
+
+
+def _fill(channel_id: str, count: int) -> None:
+    rng = random.Random(1)
+    for i in range(count):
+        channel_store.append_message(
+            {"id": f"s{i}", "channelId": channel_id, "userName": f"玩家{i % 6}", "content": _content(rng, i), "time": i}
+        )
+
+
+def _scan(channel_id: str, needle: str) -> int:
+    history = channel_store._messages_by_channel[channel_id]
+    found = 0
+    for lo in range(history.start, history.end, 256):
+        for msg in history.slice(lo, lo + 256, cache=False):
+            if needle in (msg.get("content") or "").lower():
+                found += 1
+    return found
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, object]:
+    channel_id = "bench-search"
+    started = time.perf_counter()
+    _fill(channel_id, args.messages)
+    fill_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = await search.get_index(channel_id)
+    build_s = time.perf_counter() - started
+
+    # 已建索引后的写入：append_message 含增量索引
+    extra = 20000
+    rng = random.Random(2)
+    started = time.perf_counter()
+    for i in range(extra):
+        channel_store.append_message({"id": f"x{i}", "channelId": channel_id, "content": _content(rng, i)})
+    append_us = (time.perf_counter() - started) * 1e6 / extra
+
+    queries = {"rareCjk": "钥匙", "singleCjk": "钥", "commonChar": "我", "rarePhrase": "神秘的符文", "commonCjk": "调查员", "twoTerms": "地图 大雨", "english": "brass key"}
+    history = channel_store._messages_by_channel[channel_id]
+    latency: Dict[str, object] = {}
+    for name, q in queries.items():
+        index_only: List[float] = []
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            index.search(q, history.start)
+            index_only.append((time.perf_counter() - t) * 1e6)
+        history_module.block_cache._entries.clear()
+        t = time.perf_counter()
+        result = await search.search_messages(channel_id, q, limit=20)
+        cold_ms = (time.perf_counter() - t) * 1000
+        full: List[float] = []
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            await search.search_messages(channel_id, q, limit=20)
+            full.append((time.perf_counter() - t) * 1e6)
+        latency[name] = {
+            "query": q,
+            "total": result["total"],
+            "truncated": result["truncated"],
+            "indexOnly": summarize(index_only),
+            "withMessages": summarize(full),
+            "firstPageColdMs": round(cold_ms, 2),
+        }
+
+    started = time.perf_counter()
+    scan_found = _scan(channel_id, "钥匙")
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    stats = index.stats()
+    exact = index.nbytes()
+    return {
+        "messages": args.messages,
+        "fillS": round(fill_s, 2),
+        "indexBuildS": round(build_s, 2),
+        "appendWithIndexUs": round(append_us, 2),
+        "index": dict(stats, exactBytes=exact, bytesPerMessage=round(exact / stats["messages"], 1)),
+        "historyColdBytes": channel_store._messages_by_channel[channel_id].stats()["coldBytes"],
+        "queryLatency": latency,
+        "linearScan": {"query": "钥匙", "found": scan_found, "ms": round(scan_ms, 1)},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    channel_store.HISTORY_CAPACITY = max(channel_store.HISTORY_CAPACITY, args.messages + 20000)
+    print(json.dumps(asyncio.run(_run(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+进程内压测：对 app.main.asgi_app 跑若干典型场景，输出吞吐与 p50/p95/p99 延迟（JSON），便于跨提交对比。
+
+    python -m bench.loadtest                       # 全部场景
+    python -m bench.loadtest -s lobby -s history   # 指定场景
+    python -m bench.loadtest --out before.json     # 结果另存为文件
+
+场景：
+- login：登录风暴，并发 POST /api/auth/login
+- lobby：大厅轮询，预置 --rooms 个房间，并发 GET /api/game-rooms（分页 + 关键词）
+- history：历史翻页，预置 --history 条消息，并发按 before 游标 GET /api/channels/:id/messages
+- autosave：角色卡自动保存，并发 PATCH /api/characters/:id 修改 HP/SAN
+- fanout：启动本地 uvicorn 子进程，--clients 个 python-socketio 客户端加入同一频道，
+  由若干发送方经 message 事件发消息，统计端到端投递延迟与投递速率（需 pip install aiohttp）
+
+HTTP 场景经 httpx.ASGITransport 在进程内驱动 asgi_app，不经过网络。
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from app import channel_store
+from app.main import asgi_app
+
+from .common import free_port, login, start_server, summarize, wait_healthy
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+async def _drive(client: httpx.AsyncClient, request: Request, total: int, concurrency: int) -> Dict[str, object]:
+    """concurrency 个协程共同发出 total 个请求，统计延迟、吞吐与错误数。"""
+    samples: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            resp = await request(client, i)
+            samples.append((time.perf_counter() - started) * 1e6)
+            if resp.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"requests": total, "errors": errors, "rps": round(total / elapsed, 1), "latency": summarize(samples)}
+
+
+def _client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app), base_url="http://bench")
+
+
+async def scenario_login(args) -> Dict[str, object]:
+    async with _client() as client:
+        body = {"username": "admin", "password": "123456"}
+        return await _drive(client, lambda c, i: c.post("/api/auth/login", json=body), args.requests, args.concurrency)
+
+
+async def scenario_lobby(args) -> Dict[str, object]:
+    async with _client() as client:
+        auth = await login(client)
+        modules = ["亡蝶葬仪", "致我不灭的", "自定义模组"]
+        for i in range(args.rooms):
+            await client.post(
+                "/api/game-rooms",
+                headers=auth,
+                json={"name": f"{random.choice(modules)} 第{i}团", "module": random.choice(modules), "description": "新手向 调查"},
+            )
+        queries = [{"limit": 20}, {"limit": 20, "keyword": "亡蝶"}, {"limit": 20, "status": "recruiting"}]
+        return await _drive(
+            client,
+            lambda c, i: c.get("/api/game-rooms", params=queries[i % len(queries)], headers=auth),
+            args.requests,
+            args.concurrency,
+        )
+
+
+async def scenario_history(args) -> Dict[str, object]:
+    channel_id = "bench-history"
+    for i in range(args.history):
+        channel_store.append_message(
+            {"id": f"h{i}", "channelId": channel_id, "userName": "admin", "content": f"消息 {i}", "time": i, "type": "text"}
+        )
+    async with _client() as client:
+        auth = await login(client)
+
+        def page(c: httpx.AsyncClient, i: int):
+            before = f"h{random.randrange(50, args.history)}"
+            return c.get(f"/api/channels/{channel_id}/messages", params={"limit": 50, "before": before}, headers=auth)
+
+        return await _drive(client, page, args.requests, args.concurrency)
+
+
+async def scenario_autosave(args) -> Dict[str, object]:
+    async with _client() as client:
+        auth = await login(client)
+        character_id = (
+            await client.post("/api/characters", headers=auth, json={"name": "压测", "hpCurrent": 10, "sanCurrent": 60})
+        ).json()["id"]
+        headers = {**auth, "Content-Type": "application/json-patch+json", "Prefer": "return=minimal"}
+
+        def save(c: httpx.AsyncClient, i: int):
+            field = "/hpCurrent" if i % 2 else "/sanCurrent"
+            body = json.dumps([{"op": "replace", "path": field, "value": i % 60}])
+            return c.patch(f"/api/characters/{character_id}", content=body, headers=headers)
+
+        return await _drive(client, save, args.requests, args.concurrency)
+
+
+async def scenario_fanout(args) -> Dict[str, object]:
+    import socketio
+
+    port = free_port()
+    # 压测需要超过单连接的限速，关闭防刷
+    proc = start_server(port, {"TRPG_FLOOD": "0"})
+    try:
+        await wait_healthy(port)
+        url = f"http://127.0.0.1:{port}"
+        latencies: List[float] = []
+        done = asyncio.Event()
+        expected = args.clients * args.senders * args.messages
+
+        def on_message(data):
+            latencies.append((time.time() - data["time"] / 1000) * 1e6)
+            if len(latencies) >= expected:
+                done.set()
+
+        clients = []
+        for _ in range(args.clients):
+            client = socketio.AsyncClient()
+            client.on("message", on_message)
+            await client.connect(url, transports=["websocket"])
+            await client.emit("join", {"channelId": "bench-fanout"})
+            clients.append(client)
+        await asyncio.sleep(0.3)
+
+        async def send(sender: int) -> None:
+            client = clients[sender]
+            for k in range(args.messages):
+                await client.emit(
+                    "message",
+                    {
+                        "id": f"f{sender}-{k}",
+                        "channelId": "bench-fanout",
+                        "userName": f"u{sender}",
+                        "content": "掷骰 1d100=42",
+                        "time": time.time() * 1000,
+                        "type": "text",
+                    },
+                )
+                await asyncio.sleep(args.interval)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(send(s) for s in range(args.senders)))
+        try:
+            await asyncio.wait_for(done.wait(), 30)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+        for client in clients:
+            await client.disconnect()
+        return {
+            "clients": args.clients,
+            "sent": args.senders * args.messages,
+            "expectedDeliveries": expected,
+            "deliveries": len(latencies),
+            "deliveriesPerSec": round(len(latencies) / elapsed, 1),
+            "latency": summarize(latencies),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+SCENARIOS = {
+    "login": scenario_login,
+    "lobby": scenario_lobby,
+    "history": scenario_history,
+    "autosave": scenario_autosave,
+    "fanout": scenario_fanout,
+}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="每个 HTTP 场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--senders", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=40, help="每个发送方的消息数")
+    parser.add_argument("--interval", type=float, default=0.01, help="发送间隔（秒）")
+    parser.add_argument("--out", help="结果另存为 JSON 文件")
+    args = parser.parse_args()
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": int(time.time()),
+        "params": {k: v for k, v in vars(args).items() if k not in ("scenario", "out")},
+        "results": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        report["results"][name] = await SCENARIOS[name](args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+大厅轮询与推送的对比：启动本地 uvicorn 子进程，预置 --rooms 个房间，--viewers 个停留在大厅页面的用户持续 --seconds 秒，
+期间每 --change-every 秒新建一个房间；分别在
+- 「轮询」：每个用户每 --poll 秒 GET /api/game-rooms（不分页，与大厅页面一致）；
+- 「推送」：每个用户一个 Socket.IO 连接，订阅 lobby 后只接收变更；
+下运行，输出请求 / 事件数、收到的字节数（JSON 正文）、服务端进程 CPU 时间，以及推送模式下各用户最终列表是否与服务端一致。
+
+    python -m bench.lobby_push --viewers 500 --seconds 20
+
+需要 pip install aiohttp，且只能在 Linux 上读取进程 CPU 时间。
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import httpx
+
+from .common import free_port, login, start_server, wait_healthy
+from .emit_batching import _cpu_seconds
+
+
+async def _seed(client: httpx.AsyncClient, auth: Dict[str, str], count: int, prefix: str) -> None:
+    for i in range(count):
+        await client.post(
+            "/api/game-rooms",
+            headers=auth,
+            json={"name": f"{prefix}{i} 亡蝶葬仪", "module": "亡蝶葬仪", "description": "新手向 调查", "tags": ["COC"]},
+        )
+
+
+async def _changes(client: httpx.AsyncClient, auth: Dict[str, str], args: argparse.Namespace) -> int:
+    made = 0
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() + args.change_every <= deadline:
+        await asyncio.sleep(args.change_every)
+        await _seed(client, auth, 1, f"新房间{made}-")
+        made += 1
+    return made
+
+
+async def _polling(args: argparse.Namespace, url: str, pid: int) -> Dict[str, object]:
+    limits = httpx.Limits(max_connections=args.viewers)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        auth = await login(client)
+        counters = {"requests": 0, "bytes": 0, "errors": 0}
+
+        async def viewer(index: int) -> None:
+            await asyncio.sleep(args.poll * index / args.viewers)
+            deadline = time.monotonic() + args.seconds
+            while time.monotonic() < deadline:
+                counters["requests"] += 1
+                try:
+                    resp = await client.get("/api/game-rooms", headers=auth)
+                    counters["bytes"] += len(resp.content)
+                except httpx.HTTPError:
+                    counters["errors"] += 1
+                await asyncio.sleep(args.poll)
+
+        cpu_before = _cpu_seconds(pid)
+        results = await asyncio.gather(_changes(client, auth, args), *(viewer(i) for i in range(args.viewers)))
+        return dict(counters, roomsCreated=results[0], serverCpuS=round(_cpu_seconds(pid) - cpu_before, 2))
+
+
+async def _push(args: argparse.Namespace, url: str, pid: int) -> Dict[str, object]:
+    import socketio
+
+    async with httpx.AsyncClient(base_url=url) as client:
+        auth = await login(client)
+        token = auth["Authorization"].split(" ", 1)[1]
+        counters = {"snapshots": 0, "deltas": 0, "bytes": 0}
+        views: List[Dict[str, Dict]] = []
+        clients = []
+        cpu_before = _cpu_seconds(pid)
+        for _ in range(args.viewers):
+            rooms: Dict[str, Dict] = {}
+            views.append(rooms)
+
+            def on_lobby(data, rooms=rooms):
+                counters["bytes"] += len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+                if data.get("full"):
+                    counters["snapshots"] += 1
+                    rooms.clear()
+                    rooms.update((room["id"], room) for room in data["rooms"])
+                    return
+                counters["deltas"] += 1
+                for change in data["changes"]:
+                    if change["op"] == "removed":
+                        rooms.pop(change["id"], None)
+                    else:
+                        rooms[change["id"]] = change["room"]
+
+            sio = socketio.AsyncClient()
+            sio.on("lobby", on_lobby)
+            await sio.connect(url, auth={"token": token}, transports=["websocket"])
+            await sio.call("lobby", {})
+            clients.append(sio)
+        connect_cpu = _cpu_seconds(pid) - cpu_before
+
+        cpu_before = _cpu_seconds(pid)
+        created = await _changes(client, auth, args)
+        await asyncio.sleep(0.5)
+        idle_cpu = _cpu_seconds(pid) - cpu_before
+
+        expected = {room["id"] for room in (await client.get("/api/game-rooms", headers=auth)).json()["list"]}
+        consistent = sum(1 for rooms in views if set(rooms) == expected)
+        for sio in clients:
+            await sio.disconnect()
+        return dict(
+            counters,
+            roomsCreated=created,
+            viewersConsistent=consistent,
+            subscribeCpuS=round(connect_cpu, 2),
+            serverCpuS=round(idle_cpu, 2),
+        )
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, object]:
+    report: Dict[str, object] = {"params": vars(args)}
+    for mode, run in (("polling", _polling), ("push", _push)):
+        port = free_port()
+        proc = start_server(port)
+        try:
+            await wait_healthy(port)
+            url = f"http://127.0.0.1:{port}"
+            async with httpx.AsyncClient(base_url=url) as client:
+                await _seed(client, await login(client), args.rooms, "房间")
+            report[mode] = await run(args, url, proc.pid)
+        finally:
+            proc.terminate()
+            proc.wait()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--viewers", type=int, default=500)
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--poll", type=float, default=5, help="轮询间隔（秒）")
+    parser.add_argument("--change-every", type=float, default=5, help="每隔多少秒新建一个房间")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_main(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
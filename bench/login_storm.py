@@ -0,0 +1,86 @@
+"""
+登录风暴下的事件循环延迟：并发发起 --logins 个 POST /api/auth/login，同时用一个每 --tick 毫秒醒来一次的
+协程测量事件循环的调度延迟（实际醒来时间 - 预期时间）。分别在「事件循环内校验」（TRPG_HASH_WORKERS=0 的行为）
+与「线程池校验」两种模式下运行，输出登录延迟、状态码分布与循环延迟分位数。
+
+    python -m bench.login_storm --logins 200
+
+HTTP 请求经 httpx.ASGITransport 在进程内驱动 app.main.app，不经过网络。
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+from app import passwords, routes_auth
+from app.main import app
+
+from .common import summarize
+
+
+async def _storm(logins: int, tick_ms: float) -> Dict[str, object]:
+    lag: List[float] = []
+    stop = asyncio.Event()
+
+    async def ticker() -> None:
+        interval = tick_ms / 1000
+        while not stop.is_set():
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lag.append((time.perf_counter() - expected) * 1e6)
+
+    latencies: List[float] = []
+    codes: Counter = Counter()
+    body = {"username": "admin", "password": "123456"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+
+        async def one() -> None:
+            started = time.perf_counter()
+            resp = await client.post("/api/auth/login", json=body)
+            latencies.append((time.perf_counter() - started) * 1e6)
+            codes[resp.status_code] += 1
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await tick
+    return {
+        "elapsedS": round(elapsed, 2),
+        "status": dict(codes),
+        "loginLatency": summarize(latencies),
+        "loopLag": dict(summarize(lag), max_us=round(max(lag), 1) if lag else 0),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--tick", type=float, default=5.0, help="循环延迟探测间隔（毫秒）")
+    parser.add_argument("--workers", type=int, default=passwords.HASH_WORKERS)
+    parser.add_argument("--queue", type=int, default=passwords.HASH_QUEUE)
+    parser.add_argument("--timeout", type=float, default=passwords.HASH_TIMEOUT)
+    args = parser.parse_args()
+
+    report: Dict[str, object] = {"params": vars(args)}
+    modes = {
+        "inline": passwords.PasswordHasher(workers=0),
+        # 队列与超时放宽到全部请求都能完成，只看循环延迟
+        "pool": passwords.PasswordHasher(workers=args.workers, max_queue=args.logins, timeout=3600),
+        # 默认的排队上限与超时：超出部分快速返回 503
+        "poolBounded": passwords.PasswordHasher(workers=args.workers, max_queue=args.queue, timeout=args.timeout),
+    }
+    for name, hasher in modes.items():
+        routes_auth.password_hasher = hasher
+        report[name] = await _storm(args.logins, args.tick)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""
+单条消息的内存占用与 payload 校验耗时：
+- 每条消息由 json.loads 得到（与 Socket.IO 收到的 payload 一样，字符串各自独立），
+  对比以 dict(data) 保存（旧做法）与 MessageRecord（__slots__ + 驻留字符串）保存时每条消息的字节数；
+- 对比 validate_message 的快速路径与 SocketMessage.model_validate 的单条耗时。
+
+    python -m bench.message_memory --messages 100000
+
+内存用 tracemalloc 统计保存期间新增的分配量（payload 本身在保存后即释放，不计入）。
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app.message_record import MessageRecord, validate_message
+from app.schemas import SocketMessage
+
+_NPCS = [("npc-1", "老板"), ("npc-2", "神秘人"), ("npc-3", "守卫")]
+
+
+def _payload(i: int, rng: random.Random) -> bytes:
+    msg: Dict[str, object] = {
+        "id": f"m{i}-{rng.getrandbits(32):08x}",
+        "channelId": "wangdie-1",
+        "userId": f"user{i % 6}",
+        "userName": f"玩家{i % 6}",
+        "content": rng.choice(["掷骰 1d100=42", "我检查一下书架上的旧日记。", "（潜入）", "SAN -1d6"]) + f" #{i}",
+        "time": 1700000000000 + i * 1500,
+        "type": "text",
+        "speakerRole": "kp" if i % 6 == 0 else "player",
+    }
+    if i % 6 == 0:
+        msg["speakerNpcId"], msg["speakerNpcName"] = _NPCS[i % len(_NPCS)]
+    return json.dumps(msg, ensure_ascii=False).encode("utf-8")
+
+
+def _bytes_per_message(payloads: List[bytes], store: Callable[[dict], object]) -> float:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    kept = []
+    for raw in payloads:
+        kept.append(store(json.loads(raw)))
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return round(used / len(payloads), 1)
+
+
+def _per_call_us(func: Callable[[dict], object], samples: List[dict]) -> float:
+    started = time.perf_counter()
+    for data in samples:
+        func(data)
+    return round((time.perf_counter() - started) * 1e6 / len(samples), 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    payloads = [_payload(i, rng) for i in range(args.messages)]
+    samples = [json.loads(raw) for raw in payloads[:20000]]
+    report = {
+        "messages": args.messages,
+        "bytesPerMessage": {
+            "dict": _bytes_per_message(payloads, dict),
+            "record": _bytes_per_message(payloads, MessageRecord.from_wire),
+        },
+        "validateUs": {
+            "fastPath": _per_call_us(validate_message, samples),
+            "pydantic": _per_call_us(SocketMessage.model_validate, samples),
+        },
+        "toWireUs": _per_call_us(lambda d: d.to_wire(), [MessageRecord.from_wire(d) for d in samples]),
+    }
+    d, r = report["bytesPerMessage"]["dict"], report["bytesPerMessage"]["record"]
+    report["bytesPerMessage"]["ratio"] = round(d / r, 2) if r else None
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
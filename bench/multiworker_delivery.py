@@ -0,0 +1,197 @@
+"""
+多 worker 投递正确性检查：启动若干个共享同一 Unix socket 总线的 uvicorn 进程（每个进程一个 worker），
+把 Socket.IO 客户端分散连接到不同 worker，从各个 worker 同时发消息，检查：
+
+- 每个频道的每个订阅者都收到了该频道的全部消息，且不重复；
+- 同一频道的所有订阅者看到的消息顺序完全一致，且同一发送方的消息保持发送顺序；
+- 消息的 seq 由总线统一分配：各 worker 推送的同一条消息 seq 相同，且按推送顺序连续、无空洞；
+- 每个 worker 上 GET /api/channels/:id/messages 返回的历史与推送顺序一致。
+
+--late-workers 大于 0 时，第一轮消息送达后再启动这些 worker（各频道各接入一个客户端），所有客户端再发一轮：
+后启动的 worker 推送与历史中的 seq 须与先启动的 worker 一致。
+
+    pip install aiohttp  # python-socketio AsyncClient 的 WebSocket 传输依赖
+    python -m bench.multiworker_delivery --workers 3 --clients 12 --messages 50 --late-workers 1
+
+注意：多 worker 部署时 Socket.IO 客户端需使用 websocket 传输（transports: ["websocket"]），
+长轮询请求可能落到不同 worker 上。
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import socketio
+
+from .common import free_port, start_server, wait_healthy
+
+CHANNELS = ("general", "wangdie-1", "zhivo-1")
+
+
+def _start_workers(n: int, bus_path: str) -> List[subprocess.Popen]:
+    procs = []
+    for _ in range(n):
+        port = free_port()
+        # 各客户端不间断连发，关闭防刷
+        proc = start_server(port, {"TRPG_BUS": "unix://" + bus_path, "TRPG_FLOOD": "0"})
+        proc.port = port  # type: ignore[attr-defined]
+        procs.append(proc)
+    return procs
+
+
+async def run(workers: int, clients: int, messages: int, late_workers: int = 0) -> Dict[str, object]:
+    bus_path = os.path.join(tempfile.mkdtemp(), "trpg-bus.sock")
+    procs = _start_workers(workers, bus_path)
+    try:
+        for p in procs:
+            await wait_healthy(p.port)
+
+        received: Dict[int, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+        seqs: Dict[int, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(list))
+        sios = []
+
+        async def join(port: int, channel: str) -> None:
+            i = len(sios)
+            client = socketio.AsyncClient()
+
+            def on_message(data, i=i):
+                received[i][data["channelId"]].append(data["id"])
+                seqs[i][data["channelId"]].append(data.get("seq"))
+
+            client.on("message", on_message)
+            await client.connect(f"http://127.0.0.1:{port}", transports=["websocket"])
+            await client.emit("join", {"channelId": channel})
+            sios.append((client, channel))
+
+        for i in range(clients):
+            # 同一频道的客户端分布在不同 worker 上
+            await join(procs[i % workers].port, CHANNELS[(i // workers) % len(CHANNELS)])
+        # 等待各 worker 同步完房间成员
+        await asyncio.sleep(0.5)
+
+        expected: Dict[str, int] = defaultdict(int)
+
+        async def send_round(round_: int) -> None:
+            async def send(i: int) -> None:
+                client, channel = sios[i]
+                for k in range(round_ * messages, (round_ + 1) * messages):
+                    await client.emit(
+                        "message",
+                        {"id": f"c{i}-{k}", "channelId": channel, "content": str(k), "userName": f"u{i}"},
+                    )
+
+            await asyncio.gather(*(send(i) for i in range(clients)))
+            for _, channel in sios[:clients]:
+                expected[channel] += messages
+            deadline = time.monotonic() + 15
+            while time.monotonic() < deadline:
+                if all(len(received[i][ch]) >= expected[ch] - base[i] for i, (_, ch) in enumerate(sios)):
+                    break
+                await asyncio.sleep(0.05)
+
+        # base[i]：客户端 i 接入前频道已发出的消息数
+        base: Dict[int, int] = defaultdict(int)
+        started = time.perf_counter()
+        await send_round(0)
+        if late_workers:
+            late = _start_workers(late_workers, bus_path)
+            procs.extend(late)
+            for p in late:
+                await wait_healthy(p.port)
+                for channel in CHANNELS[: max(1, min(len(CHANNELS), clients // workers))]:
+                    base[len(sios)] = expected[channel]
+                    await join(p.port, channel)
+            await asyncio.sleep(0.5)
+            await send_round(1)
+        elapsed = time.perf_counter() - started
+
+        errors = []
+        reference: Dict[str, List[str]] = {}
+        reference_seqs: Dict[str, List[int]] = {}
+        for i, (_, channel) in enumerate(sios):
+            got = received[i][channel]
+            want = expected[channel] - base[i]
+            if len(got) != want or len(set(got)) != len(got):
+                errors.append(f"client {i}: got {len(got)} messages on {channel}, expected {want}")
+            # 先接入的客户端排在前面，作为参照；后接入的只比较接入之后的部分
+            ref = reference.setdefault(channel, got)
+            if got != ref[base[i] :]:
+                errors.append(f"client {i}: order on {channel} differs from other subscribers")
+            got_seqs = seqs[i][channel]
+            if None in got_seqs:
+                errors.append(f"client {i}: messages on {channel} carry no seq")
+            elif got_seqs and got_seqs != list(range(got_seqs[0], got_seqs[0] + len(got_seqs))):
+                errors.append(f"client {i}: seqs on {channel} are not consecutive")
+            if got_seqs != reference_seqs.setdefault(channel, got_seqs)[base[i] :]:
+                errors.append(f"client {i}: seqs on {channel} differ from other subscribers")
+            last: Dict[str, int] = {}
+            for msg_id in got:
+                sender, k = msg_id[1:].split("-")
+                if int(k) <= last.get(sender, -1):
+                    errors.append(f"client {i}: sender {sender} out of order on {channel}")
+                    break
+                last[sender] = int(k)
+
+        async with httpx.AsyncClient() as http:
+            for p in procs:
+                token = (
+                    await http.post(
+                        f"http://127.0.0.1:{p.port}/api/auth/login", json={"username": "admin", "password": "123456"}
+                    )
+                ).json()["token"]
+                for channel, ref in reference.items():
+                    history = (
+                        await http.get(
+                            f"http://127.0.0.1:{p.port}/api/channels/{channel}/messages",
+                            params={"limit": len(ref)},
+                            headers={"Authorization": f"Bearer {token}"},
+                        )
+                    ).json()["messages"]
+                    # 后启动的 worker 只有启动之后的消息
+                    skip = len(ref) - len(history) if p in procs[workers:] else 0
+                    if [m["id"] for m in history] != ref[skip:]:
+                        errors.append(f"worker :{p.port}: history of {channel} differs from delivery order")
+                    if [m.get("seq") for m in history] != reference_seqs[channel][skip:]:
+                        errors.append(f"worker :{p.port}: history seqs of {channel} differ from delivered seqs")
+
+        for client, _ in sios:
+            await client.disconnect()
+        total = sum(expected[ch] - base[i] for i, (_, ch) in enumerate(sios))
+        return {
+            "workers": workers,
+            "lateWorkers": late_workers,
+            "clients": clients,
+            "messagesPerClient": messages,
+            "deliveries": total,
+            "seconds": round(elapsed, 3),
+            "ok": not errors,
+            "errors": errors[:20],
+        }
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--clients", type=int, default=12)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--late-workers", type=int, default=0, help="第一轮消息之后再启动的 worker 数")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.workers, args.clients, args.messages, args.late_workers))
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
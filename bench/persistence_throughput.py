@@ -0,0 +1,69 @@
+"""
+聊天历史写入吞吐：对比关闭 / 开启 SQLite write-behind 持久化时的 messages/sec。
+
+    python -m bench.persistence_throughput --messages 100000 --channels 20
+
+“开启”一项的耗时包含最后一次 flush，即全部消息真正落库为止。
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from app import channel_store
+
+
+def _message(i: int, channels: int) -> dict:
+    return {
+        "id": f"m{i}",
+        "channelId": f"ch-{i % channels}",
+        "userId": "1",
+        "userName": "admin",
+        "content": f"第 {i} 条消息：调查员检查了书架。",
+        "time": 1700000000000 + i,
+        "type": "text",
+        "speakerRole": "player",
+    }
+
+
+async def _run(n: int, channels: int, url: str = "") -> float:
+    channel_store._messages_by_channel.clear()
+    if url:
+        await channel_store.start_persistence(url)
+    started = time.perf_counter()
+    for i in range(n):
+        channel_store.append_message(_message(i, channels))
+        if i % 500 == 0:
+            # 模拟事件循环中穿插的其他任务，让后台写入任务有机会运行
+            await asyncio.sleep(0)
+    await channel_store.stop_persistence()
+    return time.perf_counter() - started
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--channels", type=int, default=20)
+    args = parser.parse_args()
+
+    off = await _run(args.messages, args.channels)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = "sqlite:///" + os.path.join(tmp, "bench.db")
+        on = await _run(args.messages, args.channels, url)
+    print(
+        json.dumps(
+            {
+                "messages": args.messages,
+                "channels": args.channels,
+                "persistence_off_msgs_per_sec": round(args.messages / off),
+                "persistence_on_msgs_per_sec": round(args.messages / on),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
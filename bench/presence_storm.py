@@ -0,0 +1,80 @@
+"""
+在线状态广播风暴：--players 人的频道断线后在 --spread 毫秒内陆续重连，期间每人还发出若干次输入状态变化。
+分别以「每次变更立即广播」（窗口为 0，每个事件在各自的循环轮次中处理）与合并窗口（--window 秒）运行
+PresenceTracker，统计广播的 diff 条数与送达次数（每条 diff × 当时频道人数）。
+
+    python -m bench.presence_storm --players 30
+
+直接驱动 app.presence.PresenceTracker，不经过网络与 Socket.IO。
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict
+
+from app.presence import PresenceTracker
+
+
+async def _run(players: int, spread_ms: float, typing_events: int, window: float) -> Dict[str, float]:
+    tracker = PresenceTracker(window=window)
+    counts = {"diffs": 0, "deliveries": 0}
+
+    async def emit(diff, channel_id) -> None:
+        counts["diffs"] += 1
+        counts["deliveries"] += len(tracker.members(channel_id)) + len(diff["left"])
+
+    tracker.bind(emit)
+    channel = "bench"
+    for i in range(players):
+        tracker.join(channel, f"sid-{i}", f"u:player{i}", f"player{i}", "角色")
+    # 初始在线列表广播完毕后开始计数
+    await asyncio.sleep(window + 0.05)
+    counts.update(diffs=0, deliveries=0)
+
+    rng = random.Random(1)
+    events = []
+    for i in range(players):
+        events.append((0.0, "leave", i))
+        events.append((rng.uniform(0, spread_ms / 1000), "join", i))
+        for _ in range(typing_events):
+            events.append((spread_ms / 1000 + rng.uniform(0, 0.2), "typing", i))
+    events.sort(key=lambda e: e[0])
+
+    started = time.perf_counter()
+    for at, kind, i in events:
+        delay = at - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            # 每个事件在独立的循环轮次中处理，与真实的 Socket.IO 事件一致
+            await asyncio.sleep(0)
+        if kind == "leave":
+            tracker.disconnect(f"sid-{i}")
+        elif kind == "join":
+            tracker.join(channel, f"sid-{i}-r", f"u:player{i}", f"player{i}")
+        else:
+            tracker.update(channel, f"sid-{i}-r", typing=rng.random() < 0.5)
+    await asyncio.sleep(window + 0.05)
+    return {"changes": tracker.changes, "diffs": counts["diffs"], "deliveries": counts["deliveries"]}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=30)
+    parser.add_argument("--spread", type=float, default=200.0, help="重连分散在多少毫秒内")
+    parser.add_argument("--typing", type=int, default=3, help="重连后每人的输入状态变化次数")
+    parser.add_argument("--window", type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = {
+        "params": vars(args),
+        "perChange": await _run(args.players, args.spread, args.typing, 0),
+        "coalesced": await _run(args.players, args.spread, args.typing, args.window),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+快照恢复：构造大数据量（多用户角色卡、大厅房间、多频道长历史）写成快照，再分别以
+不带快照 / 延迟解码 / 启动即全部解码 三种方式启动 uvicorn 子进程，测量从进程启动到
+/health 可用、到第一条鉴权请求（角色卡列表、频道历史）返回的耗时。
+
+    python -m bench.snapshot_restore --users 2000 --rooms 5000 --channels 40 --messages 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from app import channel_store, snapshot
+from app.routes_characters import _characters_by_user, _versions
+from app.routes_game_rooms import _index
+
+from .common import free_port, start_server
+
+
+def _populate(args) -> None:
+    skills = [{"name": name, "total": 20 + i} for i, name in enumerate(["侦查", "聆听", "图书馆使用", "闪避", "潜行"] * 8)]
+    for u in range(args.users):
+        username = "admin" if u == 0 else f"user{u}"
+        characters = {}
+        for k in range(args.characters):
+            cid = f"{username}-c{k}"
+            characters[cid] = {"id": cid, "name": f"调查员{k}", "pow": 60, "hpCurrent": 11, "skills": skills}
+            _versions[cid] = 1
+        _characters_by_user[username] = characters
+    for r in range(args.rooms):
+        _index.add({"id": f"room{r}", "name": f"亡蝶葬仪 第{r}团", "module": "亡蝶葬仪", "status": "recruiting", "tags": ["COC"]})
+    for c in range(args.channels):
+        channel_id = "general" if c == 0 else f"ch{c}"
+        for i in range(args.messages):
+            channel_store.append_message(
+                {"id": f"{channel_id}-{i}", "channelId": channel_id, "userName": "admin", "content": f"消息 {i}", "time": i, "type": "text"}
+            )
+
+
+async def _measure(path: Optional[str], lazy: bool) -> Dict[str, float]:
+    env = {"TRPG_SNAPSHOT_INTERVAL": "0", "TRPG_SNAPSHOT_LAZY": "1" if lazy else "0"}
+    if path:
+        env["TRPG_SNAPSHOT_PATH"] = path
+    port = free_port()
+    started = time.monotonic()
+    proc = start_server(port, env)
+    url = f"http://127.0.0.1:{port}"
+    result: Dict[str, float] = {}
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.005)
+            result["healthMs"] = round((time.monotonic() - started) * 1000, 1)
+            token = (await client.post("/api/auth/login", json={"username": "admin", "password": "123456"})).json()["token"]
+            auth = {"Authorization": f"Bearer {token}"}
+            t = time.monotonic()
+            await client.get("/api/characters", headers=auth)
+            result["firstCharactersMs"] = round((time.monotonic() - t) * 1000, 1)
+            t = time.monotonic()
+            await client.get("/api/channels/general/messages", headers=auth)
+            result["firstHistoryMs"] = round((time.monotonic() - t) * 1000, 1)
+            t = time.monotonic()
+            await client.get("/api/channels/general/messages", headers=auth)
+            result["secondHistoryMs"] = round((time.monotonic() - t) * 1000, 1)
+            result["firstResponseMs"] = round((time.monotonic() - started) * 1000, 1)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return result
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--characters", type=int, default=3, help="每个用户的角色卡数")
+    parser.add_argument("--rooms", type=int, default=5000)
+    parser.add_argument("--channels", type=int, default=40)
+    parser.add_argument("--messages", type=int, default=20000, help="每个频道的消息数")
+    args = parser.parse_args()
+
+    _populate(args)
+    workdir = tempfile.mkdtemp(prefix="trpg-snapshot-")
+    try:
+        source = os.path.join(workdir, "state.snap")
+        t = time.perf_counter()
+        size = snapshot.write_snapshot(source)
+        write_s = time.perf_counter() - t
+
+        runs = {}
+        for name, path, lazy in (("empty", None, True), ("lazy", source, True), ("eager", source, False)):
+            copy = None
+            if path:
+                # 子进程关闭时会写回快照，每次用一份副本
+                copy = os.path.join(workdir, f"{name}.snap")
+                shutil.copyfile(path, copy)
+            runs[name] = await _measure(copy, lazy)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "params": vars(args),
+        "snapshot": {"bytes": size, "writeMs": round(write_s * 1000, 1)},
+        "startup": runs,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+冷启动耗时：分别以 app.main:asgi_app（启动即导入全部）与 app.boot:asgi_app（先绑定端口、后台加载）
+启动 uvicorn 子进程，测量从进程启动到 /health 返回 200、到第一个业务请求（登录）返回的耗时，取多次中位数。
+
+    python -m bench.startup_time --runs 5
+    python -m bench.startup_time --profile    # 另附 TRPG_STARTUP_PROFILE 的导入耗时报告
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from .common import free_port
+
+
+async def _poll(client: httpx.AsyncClient, method: str, path: str, **kwargs) -> None:
+    while True:
+        try:
+            resp = await client.request(method, path, **kwargs)
+            if resp.status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.002)
+
+
+async def _run_once(target: str, env: Optional[Dict[str, str]] = None) -> Dict[str, float]:
+    port = free_port()
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ, **(env or {})),
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            await _poll(client, "GET", "/health")
+            health = time.monotonic() - started
+            await _poll(client, "POST", "/api/auth/login", json={"username": "admin", "password": "123456"})
+            ready = time.monotonic() - started
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"healthMs": health * 1000, "firstLoginMs": ready * 1000}
+
+
+def _median(samples: List[Dict[str, float]]) -> Dict[str, float]:
+    return {key: round(statistics.median(s[key] for s in samples), 1) for key in samples[0]}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
+    report: Dict[str, object] = {"runs": args.runs}
+    for name, target in (("eager", "app.main:asgi_app"), ("boot", "app.boot:asgi_app")):
+        report[name] = _median([await _run_once(target) for _ in range(args.runs)])
+
+    if args.profile:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "profile.json")
+            await _run_once("app.boot:asgi_app", {"TRPG_STARTUP_PROFILE": "1", "TRPG_STARTUP_PROFILE_OUT": out})
+            with open(out, encoding="utf-8") as f:
+                profile = json.load(f)
+            profile.pop("allModules", None)
+            profile["topSelfMs"] = profile["topSelfMs"][:10]
+            report["profile"] = profile
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+已验证 token 缓存：对比关闭 / 开启缓存时 GET /api/auth/me 的单请求耗时与 get_current_user 自身耗时。
+
+    python -m bench.token_cache --requests 2000 --tokens 20
+
+HTTP 请求经 httpx.ASGITransport 在进程内驱动 app.main.app，不经过网络。
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app import routes_auth
+from app.main import app
+
+from .common import summarize
+
+
+async def _http_latency(tokens, n):
+    transport = httpx.ASGITransport(app=app)
+    samples = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(n):
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            started = time.perf_counter()
+            resp = await client.get("/api/auth/me", headers=headers)
+            samples.append((time.perf_counter() - started) * 1e6)
+            assert resp.status_code == 200
+    return samples
+
+
+async def _dependency_latency(tokens, n):
+    samples = []
+    for i in range(n):
+        started = time.perf_counter()
+        await routes_auth.get_current_user(tokens[i % len(tokens)])
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--tokens", type=int, default=20)
+    args = parser.parse_args()
+
+    tokens = [routes_auth.create_access_token({"sub": "admin", "uid": 1, "n": i}) for i in range(args.tokens)]
+    result = {}
+    for label, size in (("cache_off", 0), ("cache_on", routes_auth.TOKEN_CACHE_SIZE or 4096)):
+        routes_auth.token_cache.maxsize = size
+        routes_auth.token_cache.clear()
+        dep = await _dependency_latency(tokens, args.requests)
+        http = await _http_latency(tokens, args.requests)
+        result[label] = {
+            "get_current_user": summarize(dep),
+            "http_me": summarize(http),
+            "cache": routes_auth.token_cache.stats(),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""
+原始 WebSocket 空闲回收的开销（进程内，不启动服务，用不收发网络数据的假连接）：
+- 「时间轮」：RoomConnectionManager 的共用时间轮与一个定时协程；
+- 「逐连接定时任务」：对照组，每个连接一个 while 循环 sleep 到期限再检查的协程；
+两者都接入 --connections 个连接（分布在 --rooms 个房间），其中 --silent 比例的连接一直不发消息，
+其余连接每 --activity 秒活动一次；运行 --seconds 秒（应大于 --timeout），输出回收数、期间进程 CPU 时间、
+每个连接用于空闲检测的内存（tracemalloc），以及时间轮每次 tick 的平均耗时。
+
+    python -m bench.ws_reaping --connections 20000 --timeout 4 --seconds 6
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+from typing import Dict, List
+
+from app.realtime import RoomConnectionManager
+
+
+class _FakeWebSocket:
+    __slots__ = ("closed",)
+
+    def __init__(self) -> None:
+        self.closed = None
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        pass
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = code
+
+
+async def _activity(touch, active: List, args: argparse.Namespace) -> None:
+    """每 --activity 秒依次让活跃连接各活动一次（分散在整个周期内）。"""
+    deadline = time.monotonic() + args.seconds
+    batch = max(1, len(active) // 20)
+    while time.monotonic() < deadline:
+        for start in range(0, len(active), batch):
+            for item in active[start : start + batch]:
+                touch(item)
+            await asyncio.sleep(args.activity / 20)
+
+
+async def _wheel(args: argparse.Namespace, sockets: List[_FakeWebSocket], silent: set) -> Dict[str, object]:
+    manager = RoomConnectionManager(idle_timeout=args.timeout, tick=args.tick)
+    ticks = {"count": 0, "seconds": 0.0}
+    check_idle = manager.check_idle
+
+    def timed(now: float) -> None:
+        started = time.perf_counter()
+        check_idle(now)
+        ticks["count"] += 1
+        ticks["seconds"] += time.perf_counter() - started
+
+    manager.check_idle = timed
+    rooms = [f"room-{i % args.rooms}" for i in range(len(sockets))]
+    for room_id, websocket in zip(rooms, sockets):
+        await manager.connect(room_id, websocket)
+    active = [(r, w) for r, w in zip(rooms, sockets) if id(w) not in silent]
+
+    cpu_before = time.process_time()
+    await _activity(lambda item: manager.touch(*item), active, args)
+    cpu = time.process_time() - cpu_before
+    await asyncio.sleep(0.1)
+    reaped = manager.reaped
+    for room_id, websocket in zip(rooms, sockets):
+        manager.disconnect(room_id, websocket)
+    return {
+        "reaped": reaped,
+        "pings": manager.pings,
+        "cpuS": round(cpu, 2),
+        "ticks": ticks["count"],
+        "tickMsAvg": round(ticks["seconds"] * 1000 / max(1, ticks["count"]), 3),
+    }
+
+
+async def _per_task(args: argparse.Namespace, sockets: List[_FakeWebSocket], silent: set) -> Dict[str, object]:
+    last_active: Dict[int, float] = {}
+    reaped = [0]
+
+    async def watchdog(websocket: _FakeWebSocket) -> None:
+        key = id(websocket)
+        while True:
+            remaining = last_active[key] + args.timeout - time.monotonic()
+            if remaining <= 0:
+                reaped[0] += 1
+                await websocket.close(1001)
+                return
+            await asyncio.sleep(remaining)
+
+    now = time.monotonic()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tasks = []
+    for websocket in sockets:
+        last_active[id(websocket)] = now
+        tasks.append(asyncio.ensure_future(watchdog(websocket)))
+    await asyncio.sleep(0)
+    task_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    active = [w for w in sockets if id(w) not in silent]
+
+    def touch(websocket: _FakeWebSocket) -> None:
+        last_active[id(websocket)] = time.monotonic()
+
+    cpu_before = time.process_time()
+    await _activity(touch, active, args)
+    cpu = time.process_time() - cpu_before
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {"bytesPerConnection": round(task_bytes / len(sockets), 1), "reaped": reaped[0], "cpuS": round(cpu, 2)}
+
+
+async def _wheel_memory(args: argparse.Namespace) -> float:
+    """时间轮登记每个连接的内存：只计 schedule 本身（连接对象与写协程两种方式都需要，不计入）。"""
+    from app.timing_wheel import TimingWheel
+
+    items = [object() for _ in range(args.connections)]
+    wheel = TimingWheel(args.tick, int(args.timeout / args.tick) + 2, time.monotonic())
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for index, item in enumerate(items):
+        wheel.schedule(item, time.monotonic() + args.timeout * (index % 100) / 100)
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return round(used / len(items), 1)
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, object]:
+    random.seed(1)
+    report: Dict[str, object] = {"params": vars(args)}
+    for mode, run in (("wheel", _wheel), ("perTask", _per_task)):
+        sockets = [_FakeWebSocket() for _ in range(args.connections)]
+        silent = {id(w) for w in random.sample(sockets, int(len(sockets) * args.silent))}
+        report[mode] = await run(args, sockets, silent)
+        report[mode]["expectedReaped"] = len(silent)
+    report["wheel"]["bytesPerConnection"] = await _wheel_memory(args)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=20000)
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--silent", type=float, default=0.1, help="一直不发消息的连接比例")
+    parser.add_argument("--timeout", type=float, default=4, help="空闲超时（秒）")
+    parser.add_argument("--tick", type=float, default=0.5, help="时间轮每格（秒）")
+    parser.add_argument("--activity", type=float, default=1, help="活跃连接的活动间隔（秒）")
+    parser.add_argument("--seconds", type=float, default=6)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_main(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import channel_store
+from app.acl import KP, READ, WRITE, ChannelAcl, compile_tables, set_module_owner, set_user_access, speak_denied
+
+KP_USER = SimpleNamespace(id=1, username="kp")
+ALICE = SimpleNamespace(id=2, username="alice")
+BOB = SimpleNamespace(id=3, username="bob")
+
+
+@pytest.fixture
+def modules(monkeypatch):
+    modules = [
+        {
+            "id": "case",
+            "ownerId": "1",
+            "subChannels": [{"id": "case-1", "userAccess": {"alice": "full", "bob": "readonly", "eve": "none"}}],
+        },
+        {"id": "open", "ownerId": "", "subChannels": [{"id": "open-1", "userAccess": {}}]},
+    ]
+    monkeypatch.setattr(channel_store, "modules", modules)
+    channel_store.mark_catalog_changed()
+    yield modules
+    monkeypatch.undo()
+    channel_store.mark_catalog_changed()
+
+
+def test_compiled_rights():
+    tables = compile_tables(
+        [{"ownerId": "1", "subChannels": [{"id": "c", "userAccess": {"alice": "readonly"}}]}], default_level="none"
+    )
+    assert tables["c"].lookup(("1", "kp")) == READ | WRITE | KP
+    assert tables["c"].lookup(("2", "alice")) == READ
+    assert tables["c"].lookup(()) == 0
+
+
+def test_rights_per_user(modules):
+    acl = ChannelAcl()
+    assert acl.check(KP_USER, "case-1") == READ | WRITE | KP
+    assert acl.check(ALICE, "case-1") == READ | WRITE
+    assert acl.check(BOB, "case-1") == READ
+    assert acl.check(SimpleNamespace(id=9, username="eve"), "case-1") == 0
+    # 模组没有 owner 时不限制 KP 身份；公共频道不限制
+    assert acl.check(None, "open-1") & KP
+    assert acl.check(None, "general") == READ | WRITE | KP
+
+
+def test_speak_denied():
+    assert speak_denied(READ | WRITE, None) is None
+    assert speak_denied(READ, None) == "没有在该频道发言的权限"
+    assert speak_denied(READ | WRITE, "kp") == "只有 KP 可以以 KP 身份发言"
+    assert speak_denied(READ | WRITE | KP, "kp") is None
+
+
+def test_joined_rights_follow_access_changes(modules):
+    async def run():
+        acl = ChannelAcl()
+        revoked = []
+
+        async def revoke(sid, channel_id):
+            revoked.append((sid, channel_id))
+
+        acl.bind(revoke)
+        assert acl.join("s1", "case-1", ALICE) == READ | WRITE
+        assert acl.join("s2", "case-1", SimpleNamespace(id=9, username="eve")) == 0
+        # 没有 READ 的频道不缓存
+        assert acl.stats()["connections"] == 2
+
+        modules[0]["subChannels"][0]["userAccess"]["alice"] = "readonly"
+        channel_store.mark_catalog_changed()
+        assert acl.rights("s1", "case-1") == READ
+        assert revoked == []
+
+        modules[0]["subChannels"][0]["userAccess"]["alice"] = "none"
+        channel_store.mark_catalog_changed()
+        assert acl.rights("s1", "case-1") == 0
+        await asyncio.sleep(0)
+        assert revoked == [("s1", "case-1")]
+        acl.forget("s1")
+        acl.forget("s2")
+
+    asyncio.run(run())
+
+
+def test_setters_validate_and_recompile(modules):
+    assert not set_user_access("case-1", "alice", "admin")
+    assert not set_user_access("missing", "alice", "full")
+    assert set_user_access("case-1", "alice", "readonly")
+    assert modules[0]["subChannels"][0]["userAccess"]["alice"] == "readonly"
+    assert set_user_access("case-1", "alice", None)
+    assert "alice" not in modules[0]["subChannels"][0]["userAccess"]
+    assert set_module_owner("case", "2")
+    assert ChannelAcl().check(ALICE, "case-1") & KP
+    assert not set_module_owner("missing", "2")
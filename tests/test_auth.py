@@ -0,0 +1,48 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes_auth import TokenCache, create_access_token, token_cache, verify_token
+from app.schemas import User
+
+
+def test_token_cache_is_lru_and_honours_exp():
+    cache = TokenCache(maxsize=2)
+    user = User(id=1, username="a")
+    cache.put("t1", user, time.time() + 60)
+    cache.put("t2", user, time.time() + 60)
+    assert cache.get("t1") is user
+    cache.put("t3", user, time.time() + 60)
+    # t2 最久未用，被挤出
+    assert cache.get("t2") is None and cache.get("t1") is user
+    cache.put("old", user, time.time() - 1)
+    assert cache.get("old") is None
+
+
+def test_revoked_token_stays_rejected_after_eviction():
+    cache = TokenCache(maxsize=1)
+    user = User(id=1, username="a")
+    cache.put("t1", user, time.time() + 60)
+    cache.revoke("t1")
+    cache.put("t2", user, time.time() + 60)
+    assert cache.is_revoked("t1") and cache.get("t1") is None
+
+
+def test_verify_token_uses_cache():
+    token = create_access_token({"sub": "admin", "uid": 1, "jti": "cache-test"})
+    hits = token_cache.hits
+    assert verify_token(token).username == "admin"
+    assert verify_token(token).username == "admin"
+    assert token_cache.hits == hits + 1
+    assert verify_token(token + "x") is None
+
+
+def test_logout_revokes_token():
+    client = TestClient(app)
+    # 独立的 jti：同一秒签发的相同载荷 token 完全相同，吊销时不能波及其他测试的 token
+    token = create_access_token({"sub": "admin", "uid": 1, "jti": "logout-test"})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    assert client.post("/api/auth/logout", headers=headers).json() == {"ok": True}
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
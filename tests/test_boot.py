@@ -0,0 +1,37 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import boot
+
+
+def test_lifespan_completes_and_requests_are_forwarded_once_loaded():
+    with TestClient(boot.LazyApp()) as client:
+        assert client.get("/health").status_code == 200
+        resp = client.post("/api/auth/login", json={"username": "admin", "password": "123456"})
+        assert resp.status_code == 200 and resp.json()["ok"] is True
+        assert client.app.ready
+
+
+def test_health_answers_before_the_app_is_loaded():
+    async def run():
+        lazy = boot.LazyApp()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "path": "/health", "method": "GET", "headers": []}
+        await lazy(scope, None, send)
+        return lazy, sent
+
+    lazy, sent = asyncio.run(run())
+    assert not lazy.ready
+    assert sent[0]["status"] == 200 and sent[1]["body"] == b'{"status":"ok"}'
+
+
+def test_load_failure_returns_503(monkeypatch):
+    monkeypatch.setattr(boot, "TARGET_MODULE", "app.does_not_exist")
+    client = TestClient(boot.LazyApp())
+    resp = client.get("/api/auth/me")
+    assert resp.status_code == 503 and resp.json()["ok"] is False
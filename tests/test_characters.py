@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+JSON_PATCH = {"Content-Type": "application/json-patch+json"}
+MERGE_PATCH = {"Content-Type": "application/merge-patch+json"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    client = TestClient(app)
+    token = client.post("/api/auth/login", json={"username": "admin", "password": "123456"}).json()["token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
+
+
+@pytest.fixture
+def character(client):
+    resp = client.post("/api/characters", json={"name": "调查员", "hpCurrent": 10, "sanCurrent": 60})
+    assert resp.headers["ETag"] == '"1"'
+    return resp.json()["id"]
+
+
+def test_json_patch_and_merge_patch_bump_etag(client, character):
+    ops = [{"op": "test", "path": "/hpCurrent", "value": 10}, {"op": "replace", "path": "/hpCurrent", "value": 9}]
+    resp = client.patch(f"/api/characters/{character}", json=ops, headers=JSON_PATCH)
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] == '"2"'
+    assert resp.json()["character"]["hpCurrent"] == 9
+
+    resp = client.patch(f"/api/characters/{character}", json={"sanCurrent": 55}, headers=MERGE_PATCH)
+    assert resp.headers["ETag"] == '"3"'
+    assert resp.json()["character"]["sanCurrent"] == 55
+    assert client.get(f"/api/characters/{character}").json()["character"]["hpCurrent"] == 9
+
+
+def test_failed_test_op_leaves_character_unchanged(client, character):
+    ops = [{"op": "replace", "path": "/hpCurrent", "value": 1}, {"op": "test", "path": "/sanCurrent", "value": 0}]
+    resp = client.patch(f"/api/characters/{character}", json=ops, headers=JSON_PATCH)
+    assert resp.status_code == 409
+    body = client.get(f"/api/characters/{character}")
+    assert body.headers["ETag"] == '"1"'
+    assert body.json()["character"]["hpCurrent"] == 10
+
+
+def test_if_match_mismatch_returns_412(client, character):
+    headers = {**MERGE_PATCH, "If-Match": '"1"'}
+    assert client.patch(f"/api/characters/{character}", json={"hpCurrent": 8}, headers=headers).status_code == 200
+    resp = client.patch(f"/api/characters/{character}", json={"hpCurrent": 7}, headers=headers)
+    assert resp.status_code == 412
+    assert resp.headers["ETag"] == '"2"'
+
+
+def test_invalid_field_and_readonly_field_rejected(client, character):
+    resp = client.patch(f"/api/characters/{character}", json={"hpCurrent": "很多"}, headers=MERGE_PATCH)
+    assert resp.status_code == 422
+    resp = client.patch(f"/api/characters/{character}", json={"id": "x"}, headers=MERGE_PATCH)
+    assert resp.status_code == 422
+
+
+async def _slow_body(payload: bytes):
+    # 请求体分两段到达，让并发请求在读取请求体时交错
+    await asyncio.sleep(0.05)
+    yield payload[:1]
+    await asyncio.sleep(0.05)
+    yield payload[1:]
+
+
+def _concurrent(client, *requests):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=client.headers) as ac:
+            return await asyncio.gather(*(request(ac) for request in requests))
+
+    return asyncio.run(run())
+
+
+def test_concurrent_patches_with_same_if_match_do_not_both_apply(client, character):
+    def patch(value):
+        headers = {**MERGE_PATCH, "If-Match": '"1"'}
+        body = f'{{"hpCurrent": {value}}}'.encode()
+        return lambda ac: ac.patch(f"/api/characters/{character}", content=_slow_body(body), headers=headers)
+
+    statuses = sorted(resp.status_code for resp in _concurrent(client, patch(5), patch(6)))
+    assert statuses == [200, 412]
+    assert client.get(f"/api/characters/{character}").headers["ETag"] == '"2"'
+
+
+def test_delete_during_patch_body_read_returns_404(client, character):
+    async def slow_patch(ac):
+        body = _slow_body(b'{"hpCurrent": 5}')
+        return await ac.patch(f"/api/characters/{character}", content=body, headers=MERGE_PATCH)
+
+    async def delete(ac):
+        await asyncio.sleep(0.02)
+        return await ac.delete(f"/api/characters/{character}")
+
+    patched, deleted = _concurrent(client, slow_patch, delete)
+    assert deleted.status_code == 200
+    assert patched.status_code == 404
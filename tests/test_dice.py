@@ -0,0 +1,71 @@
+import pytest
+
+from app import dice
+
+
+def test_expression_totals_stay_in_range():
+    expression = dice.compile_expression("(2D6 + 6) * 5")
+    assert expression.text == "(2d6+6)*5"
+    for _ in range(200):
+        result = expression.roll()
+        assert 40 <= result["total"] <= 90 and (result["total"] % 5) == 0
+        assert result["detail"].startswith("(2d6+6)*5=")
+    assert all(40 <= total <= 90 for total in expression.roll_many(500))
+
+
+def test_constants_and_integer_division():
+    assert dice.compile_expression("7/2").roll()["total"] == 3
+    assert dice.compile_expression("1d1*3-1").roll_many(3) == [2, 2, 2]
+
+
+def test_compiled_expressions_are_cached():
+    assert dice.compile_expression("3d6") is dice.compile_expression(" 3D6 ")
+
+
+def test_bonus_and_penalty_dice():
+    for expr in ("d100b2", "d%p1", "1d100"):
+        assert all(1 <= total <= 100 for total in dice.compile_expression(expr).roll_many(300))
+
+
+@pytest.mark.parametrize("text", ["", "3x6", "3d6+", "(1d6", "1d0", "2001d6", "1d6" * 100, None])
+def test_invalid_expressions_raise(text):
+    with pytest.raises(dice.DiceError):
+        dice.compile_expression(text)
+
+
+def test_batch_limits():
+    with pytest.raises(dice.DiceError):
+        dice.compile_expression("1d6").roll_many(dice.MAX_TIMES + 1)
+    with pytest.raises(dice.DiceError):
+        dice.compile_expression("1000d6").roll_many(dice.MAX_TIMES)
+
+
+@pytest.mark.parametrize(
+    "roll,target,level",
+    [
+        (1, 50, "大成功"),
+        (100, 99, "大失败"),
+        (97, 40, "大失败"),
+        (97, 60, "失败"),
+        (10, 50, "极难成功"),
+        (25, 50, "困难成功"),
+        (50, 50, "成功"),
+        (51, 50, "失败"),
+    ],
+)
+def test_success_levels(roll, target, level):
+    assert dice.success_level(roll, target) == level
+
+
+def test_skill_values_from_character():
+    character = {"str": "60", "sanCurrent": 55, "skills": [{"name": "侦查", "base": 25, "occupation": 30}]}
+    assert dice.skill_value(character, "力量") == 60
+    assert dice.skill_value(character, "SAN") == 55
+    assert dice.skill_value(character, "侦查") == 55
+    assert dice.skill_value(character, "图书馆") is None
+
+
+def test_check_many():
+    results = dice.check_many([50, 70, 20], bonus=-1)
+    assert [r["target"] for r in results] == [50, 70, 20]
+    assert all(r["level"] == dice.success_level(r["roll"], r["target"]) for r in results)
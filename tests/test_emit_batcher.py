@@ -0,0 +1,84 @@
+import asyncio
+
+from app.emit_batcher import EmitBatcher
+
+
+def _batcher(window=0.02, max_size=64):
+    batcher = EmitBatcher(window=window, max_size=max_size)
+    sent = []
+
+    async def emit(channel_id, messages):
+        sent.append((channel_id, [m["seq"] for m in messages]))
+
+    batcher.bind(emit)
+    return batcher, sent
+
+
+def test_disabled_by_default():
+    assert not EmitBatcher(window=0).enabled
+
+
+def test_messages_within_window_go_out_as_one_batch():
+    async def run():
+        batcher, sent = _batcher()
+        for seq in range(3):
+            batcher.add("a", {"seq": seq})
+        batcher.add("b", {"seq": 0})
+        assert sent == [] and batcher.stats()["pending"] == 4
+        await asyncio.sleep(0.05)
+        assert sorted(sent) == [("a", [0, 1, 2]), ("b", [0])]
+        assert batcher.stats() == {"batches": 2, "messages": 4, "pending": 0}
+
+    asyncio.run(run())
+
+
+def test_full_batch_flushes_immediately_in_order():
+    async def run():
+        batcher, sent = _batcher(window=10, max_size=2)
+        for seq in range(5):
+            batcher.add("a", {"seq": seq})
+        await asyncio.sleep(0)
+        assert sent == [("a", [0, 1]), ("a", [2, 3])]
+        batcher.flush("a")
+        await asyncio.sleep(0)
+        assert sent[-1] == ("a", [4])
+
+    asyncio.run(run())
+
+
+def test_pending_from_covers_buffered_and_inflight_batches():
+    async def run():
+        batcher, sent = _batcher(window=10, max_size=2)
+        assert batcher.pending_from("a") is None
+        batcher.add("a", {"seq": 5})
+        assert batcher.pending_from("a") == 5
+        # 已取出但推送任务尚未开始的批仍算未推送
+        batcher.add("a", {"seq": 6})
+        batcher.add("a", {"seq": 7})
+        assert batcher.pending_from("a") == 5
+        await asyncio.sleep(0)
+        assert batcher.pending_from("a") == 7
+        batcher.flush("a")
+        await asyncio.sleep(0)
+        assert batcher.pending_from("a") is None
+
+    asyncio.run(run())
+
+
+def test_emit_failure_does_not_break_later_batches():
+    async def run():
+        batcher = EmitBatcher(window=10, max_size=1)
+        sent = []
+
+        async def emit(channel_id, messages):
+            if messages[0]["seq"] == 0:
+                raise RuntimeError("boom")
+            sent.append(messages[0]["seq"])
+
+        batcher.bind(emit)
+        batcher.add("a", {"seq": 0})
+        batcher.add("a", {"seq": 1})
+        await asyncio.sleep(0)
+        assert sent == [1]
+
+    asyncio.run(run())
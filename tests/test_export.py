@@ -0,0 +1,90 @@
+import json
+import uuid
+from datetime import timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.channel_store import append_message
+from app.log_export import ExportFilter, format_text_line
+from app.main import app
+
+# 2024-01-01 12:00:00 UTC
+NOON = 1704110400000
+
+
+@pytest.fixture(scope="module")
+def client():
+    client = TestClient(app)
+    token = client.post("/api/auth/login", json={"username": "admin", "password": "123456"}).json()["token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
+
+
+@pytest.fixture
+def channel_id():
+    channel_id = f"export-{uuid.uuid4().hex[:8]}"
+    for i in range(6):
+        append_message(
+            {
+                "id": f"m{i}",
+                "channelId": channel_id,
+                "content": f"第{i}句",
+                "userName": "kp" if i % 2 else "pl",
+                "speakerRole": "kp" if i % 2 else "pl",
+                "time": NOON + i * 60000,
+            },
+            persist=False,
+        )
+    return channel_id
+
+
+def _lines(resp):
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+def test_ndjson_export_streams_every_message(client, channel_id):
+    resp = client.get(f"/api/channels/{channel_id}/export")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert f"{channel_id}.ndjson" in resp.headers["content-disposition"]
+    assert [m["seq"] for m in _lines(resp)] == list(range(6))
+
+
+def test_export_filters(client, channel_id):
+    url = f"/api/channels/{channel_id}/export"
+    assert [m["seq"] for m in _lines(client.get(url, params={"fromSeq": 2, "toSeq": 4}))] == [2, 3, 4]
+    assert [m["seq"] for m in _lines(client.get(url, params={"speakerRole": "kp"}))] == [1, 3, 5]
+    params = {"since": NOON + 60000, "until": NOON + 180000}
+    assert [m["seq"] for m in _lines(client.get(url, params=params))] == [1, 2, 3]
+
+
+def test_text_export_uses_tz(client, channel_id):
+    resp = client.get(f"/api/channels/{channel_id}/export", params={"format": "text", "toSeq": 0})
+    assert resp.headers["content-type"].startswith("text/plain")
+    assert resp.text == "[2024-01-01 20:00:00] pl: 第0句\n"
+    resp = client.get(f"/api/channels/{channel_id}/export", params={"format": "text", "toSeq": 0, "tz": 0})
+    assert resp.text == "[2024-01-01 12:00:00] pl: 第0句\n"
+
+
+def test_invalid_parameters_are_rejected_before_streaming(client, channel_id):
+    url = f"/api/channels/{channel_id}/export"
+    assert client.get(url, params={"format": "csv"}).status_code == 400
+    assert client.get(url, params={"tz": 1440}).status_code == 400
+    assert client.get(url, params={"tz": -1440}).status_code == 400
+
+
+def test_text_line_formatting():
+    tz = timezone.utc
+    msg = {"userName": "alice", "speakerNpcName": "管家", "content": "第一行\n第二行", "time": "2024-01-01T00:00:00Z"}
+    assert format_text_line(msg, tz) == "[2024-01-01 00:00:00] 管家（alice）: 第一行\n    第二行\n"
+    # 无法表示的时间原样输出，不中断导出
+    assert format_text_line({"content": "x", "time": 1e20}, tz) == "[1e+20] 匿名: x\n"
+    assert format_text_line({"content": "x"}, tz) == "[-] 匿名: x\n"
+
+
+def test_filter_without_npc_does_not_match_npc_filter():
+    accept = ExportFilter(speaker_npc_id="npc-1")
+    assert accept({"speakerNpcId": "npc-1"})
+    assert not accept({})
+    assert not ExportFilter(since=0)({"time": "not a time"})
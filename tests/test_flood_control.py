@@ -0,0 +1,74 @@
+import pytest
+
+from app import flood_control as flood_module
+from app.flood_control import FloodControl, TokenBuckets
+
+
+def test_bucket_allows_burst_then_refills_at_rate():
+    buckets = TokenBuckets(rate=2, burst=3)
+    for _ in range(3):
+        assert buckets.wait("k", 100.0) == 0
+        buckets.take("k", 100.0)
+    assert buckets.wait("k", 100.0) == pytest.approx(0.5)
+    assert buckets.wait("k", 100.5) == 0
+    # 装满之后与不存在的键等价
+    buckets.sweep(102.0)
+    assert len(buckets) == 0
+
+
+def test_sweep_bounds_table_size():
+    buckets = TokenBuckets(rate=1, burst=1)
+    for i in range(5000):
+        buckets.take(f"k{i}", float(i))
+    # 只保留仍未装满的桶，表大小与最近活跃的键数同量级
+    assert len(buckets) <= 2048
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(flood_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_each_scope_limits_independently(clock):
+    flood = FloodControl(enabled=True, sid=(1, 2), user=(1, 3), channel=(1, 4))
+    assert flood.check("s1", "alice", "general") is None
+    assert flood.check("s1", "alice", "general") is None
+    assert flood.check("s1", "alice", "general")[0] == "sid"
+    # 同一用户换一个连接：用户级还剩一个令牌
+    assert flood.check("s2", "alice", "general") is None
+    assert flood.check("s2", "alice", "general")[0] == "user"
+    # 其他用户受频道级限制
+    assert flood.check("s3", "bob", "general") is None
+    assert flood.check("s3", "bob", "general") == ("channel", pytest.approx(1.0))
+    assert flood.stats()["dropped"] == {"sid": 1, "user": 1, "channel": 1}
+    assert flood.allowed == 4
+    clock[0] += 1
+    assert flood.check("s3", "bob", "general") is None
+
+
+def test_rejected_message_does_not_consume_tokens(clock):
+    flood = FloodControl(enabled=True, sid=(1, 5), user=(1, 1), channel=(0, 0))
+    assert flood.check("s1", "alice", None) is None
+    assert flood.check("s1", "alice", None)[0] == "user"
+    # 用户级超限时连接级没有扣减：不计用户时该连接仍剩 4 个令牌
+    for _ in range(4):
+        assert flood.check("s1", None, None) is None
+
+
+def test_disabled_allows_everything(clock):
+    flood = FloodControl(enabled=False, sid=(1, 1))
+    assert all(flood.check("s1", "alice", "general") is None for _ in range(10))
+
+
+def test_notices_are_rate_limited_and_forgotten(clock):
+    flood = FloodControl(enabled=True, notice_interval=1)
+    assert flood.should_notice("s1")
+    assert not flood.should_notice("s1")
+    clock[0] += 1
+    assert flood.should_notice("s1")
+    flood.check("s1", None, None)
+    flood.forget("s1")
+    assert flood.should_notice("s1")
+    assert flood.stats()["buckets"]["sid"] == 0
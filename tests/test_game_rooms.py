@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    client = TestClient(app)
+    token = client.post("/api/auth/login", json={"username": "admin", "password": "123456"}).json()["token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
+
+
+@pytest.mark.parametrize("cursor", ["-1", "-2", "abc", "1.5", " 1"])
+def test_invalid_cursor_is_rejected(client, cursor):
+    resp = client.get("/api/game-rooms", params={"limit": 2, "cursor": cursor})
+    assert resp.status_code == 400
+    assert resp.json()["ok"] is False
+
+
+def test_cursor_pages_without_duplicates(client):
+    for i in range(3):
+        client.post("/api/game-rooms", json={"name": f"分页测试{i}", "module": "亡蝶葬仪"})
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/game-rooms", params=params).json()
+        ids.extend(room["id"] for room in body["list"])
+        cursor = body["nextCursor"]
+        if cursor is None:
+            break
+    assert len(ids) == len(set(ids))
+    assert ids == [room["id"] for room in client.get("/api/game-rooms").json()["list"]]
@@ -0,0 +1,67 @@
+from app.history import ChannelHistory
+
+
+def _ids(messages):
+    return [m["id"] for m in messages]
+
+
+def _fill(history, count, prefix="m"):
+    for i in range(count):
+        history.append({"id": f"{prefix}{i}", "channelId": "c", "content": str(i)})
+
+
+def test_ring_buffer_evicts_oldest_beyond_capacity():
+    history = ChannelHistory(capacity=5, hot_size=100)
+    _fill(history, 8)
+    assert (history.start, history.end, len(history)) == (3, 8, 5)
+    assert _ids(history.slice(0, 100)) == ["m3", "m4", "m5", "m6", "m7"]
+    assert history.stats()["evicted"] == 3
+
+
+def test_id_index_follows_eviction():
+    history = ChannelHistory(capacity=5, hot_size=100)
+    _fill(history, 8)
+    assert history.position("m6") == 6
+    assert history.position("m2") is None
+
+
+def test_page_before_id():
+    history = ChannelHistory(capacity=5, hot_size=100)
+    _fill(history, 8)
+    assert _ids(history.page(2)) == ["m6", "m7"]
+    assert _ids(history.page(2, before="m6")) == ["m4", "m5"]
+    # 起点之前只剩内存中的部分
+    assert _ids(history.page(10, before="m5")) == ["m3", "m4"]
+    # 已淘汰或不存在的 id 按最新一页处理
+    assert _ids(history.page(1, before="m0")) == ["m7"]
+
+
+def test_cold_blocks_freeze_and_read_back_across_the_boundary():
+    history = ChannelHistory(capacity=100, hot_size=4, block_size=3)
+    _fill(history, 12)
+    stats = history.stats()
+    assert stats["coldBlocks"] == 2 and stats["hot"] == 6
+    assert _ids(history.slice(0, 12)) == [f"m{i}" for i in range(12)]
+    assert _ids(history.slice(4, 8)) == ["m4", "m5", "m6", "m7"]
+    assert history.slice(2, 3)[0] == {"id": "m2", "channelId": "c", "content": "2", "seq": 2}
+    assert _ids(history.page(2, before="m4")) == ["m2", "m3"]
+
+
+def test_eviction_drops_whole_cold_blocks():
+    history = ChannelHistory(capacity=8, hot_size=4, block_size=3)
+    _fill(history, 14)
+    # 淘汰以冷块为单位，内存中至多 capacity 条
+    assert history.start % 3 == 0 and len(history) <= 8
+    assert history.position(f"m{history.start - 1}") is None
+    assert _ids(history.slice(0, 100)) == [f"m{i}" for i in range(history.start, 14)]
+
+
+def test_export_and_load_keep_cold_blocks_compressed():
+    history = ChannelHistory(capacity=100, hot_size=4, block_size=3)
+    _fill(history, 12)
+    start, blocks, hot = history.export()
+    restored = ChannelHistory(capacity=100, start=start, hot_size=4, block_size=3)
+    restored.load(blocks, hot)
+    assert restored.stats()["coldBlocks"] == 2
+    assert restored.slice(0, 100) == history.slice(0, 100)
+    assert restored.position("m1") == 1
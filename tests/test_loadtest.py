@@ -0,0 +1,23 @@
+import argparse
+import asyncio
+
+import pytest
+
+from bench import loadtest
+from bench.common import summarize
+
+
+def test_summarize_percentiles():
+    stats = summarize(float(i) for i in range(1, 101))
+    assert stats["count"] == 100
+    assert (stats["p50_us"], stats["p95_us"], stats["p99_us"]) == (51.0, 96.0, 100.0)
+    assert summarize([]) == {"count": 0}
+
+
+@pytest.mark.parametrize("name", ["login", "lobby", "history", "autosave"])
+def test_http_scenarios_run_without_errors(name):
+    args = argparse.Namespace(requests=8, concurrency=4, rooms=5, history=100)
+    result = asyncio.run(loadtest.SCENARIOS[name](args))
+    assert result["requests"] == 8
+    assert result["errors"] == 0
+    assert result["latency"]["count"] == 8
@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+
+from app import socket_io
+from app.lobby import lobby_feed
+from app.main import app
+
+
+def _run(scenario):
+    async def run():
+        sent = []
+
+        async def capture(payload, group):
+            sent.append((group, payload))
+
+        lobby_feed.bind(capture)
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                login = await ac.post("/api/auth/login", json={"username": "admin", "password": "123456"})
+                ac.headers["Authorization"] = f"Bearer {login.json()['token']}"
+                await scenario(ac, sent)
+        finally:
+            lobby_feed.bind(socket_io._emit_lobby)
+            lobby_feed.unsubscribe("test-sid")
+
+    asyncio.run(run())
+
+
+async def _changes(sent):
+    # 变更在本轮事件循环结束时合并推送
+    await asyncio.sleep(0.01)
+    changes = [change for _, payload in sent for change in payload["changes"]]
+    sent.clear()
+    return changes
+
+
+def test_subscriber_receives_update_and_removal_deltas():
+    async def scenario(ac, sent):
+        room = (await ac.post("/api/game-rooms", json={"name": "推送测试团", "module": "亡蝶葬仪"})).json()["room"]
+        _, group = lobby_feed.subscribe("test-sid", "推送测试", "recruiting", None)
+        assert [r["id"] for r in lobby_feed.snapshot(group)["rooms"]] == [room["id"]]
+
+        resp = await ac.patch(f"/api/game-rooms/{room['id']}", json={"currentPlayers": 3})
+        assert resp.status_code == 200
+        changes = await _changes(sent)
+        assert [(c["op"], c["id"], c["room"]["currentPlayers"]) for c in changes] == [("updated", room["id"], 3)]
+        assert sent == []
+
+        # 不再满足订阅条件（status=recruiting）时推送 removed，恢复后推送 added
+        await ac.patch(f"/api/game-rooms/{room['id']}", json={"status": "started"})
+        assert [(c["op"], c["id"]) for c in await _changes(sent)] == [("removed", room["id"])]
+        await ac.patch(f"/api/game-rooms/{room['id']}", json={"status": "recruiting"})
+        assert [(c["op"], c["id"]) for c in await _changes(sent)] == [("added", room["id"])]
+
+        assert (await ac.delete(f"/api/game-rooms/{room['id']}")).status_code == 200
+        assert [(c["op"], c["id"]) for c in await _changes(sent)] == [("removed", room["id"])]
+        assert (await ac.get(f"/api/game-rooms/{room['id']}")).status_code == 404
+
+    _run(scenario)
+
+
+def test_room_changes_are_validated():
+    async def scenario(ac, sent):
+        room = (await ac.post("/api/game-rooms", json={"name": "校验测试团", "maxPlayers": 4})).json()["room"]
+        url = f"/api/game-rooms/{room['id']}"
+        assert (await ac.patch(url, json={"currentPlayers": 5})).status_code == 400
+        assert (await ac.patch(url, json={"status": "paused"})).status_code == 422
+        assert (await ac.patch("/api/game-rooms/missing", json={"currentPlayers": 1})).status_code == 404
+        assert (await ac.delete(url)).status_code == 200
+
+    _run(scenario)
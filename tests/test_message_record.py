@@ -0,0 +1,56 @@
+import pytest
+from pydantic import ValidationError
+
+from app.message_record import MessageRecord, validate_message
+
+
+def test_round_trip_keeps_keys_and_extra_fields():
+    data = {"id": "m1", "channelId": "general", "content": "hi", "speakerNpcId": None, "dice": {"total": 7}, "seq": 99}
+    record = MessageRecord.from_wire(data)
+    assert not hasattr(record, "__dict__")
+    assert record.msg_id == "m1"
+    assert record.get("dice") == {"total": 7}
+    assert record.get("userName", "匿名") == "匿名"
+    # 缺失的字段还原时省略，显式的 null 保留；seq 由历史写入时分配
+    assert record.to_wire() == {
+        "id": "m1",
+        "channelId": "general",
+        "content": "hi",
+        "speakerNpcId": None,
+        "dice": {"total": 7},
+        "seq": -1,
+    }
+
+
+def test_repeated_strings_are_interned():
+    a = MessageRecord.from_wire({"channelId": "".join(["gen", "eral"]), "userName": "".join(["k", "p"])})
+    b = MessageRecord.from_wire({"channelId": "".join(["gene", "ral"]), "userName": "".join(["kp"])})
+    assert a.channelId is b.channelId
+    assert a.userName is b.userName
+
+
+def test_well_typed_payload_passes_through():
+    data = {"id": "m1", "content": "hi", "time": 1704067200000}
+    assert validate_message(data) is data
+
+
+@pytest.mark.parametrize(
+    "time, expected",
+    [
+        (1704067200000.7, 1704067200000),
+        ("1704067200000", 1704067200000),
+        ("2024-01-01T00:00:00Z", 1704067200000),
+        ("2024-01-01T08:00:00+08:00", 1704067200000),
+        ("2024-01-01T00:00:00", 1704067200000),
+    ],
+)
+def test_time_is_normalized_to_integer_ms(time, expected):
+    fixed = validate_message({"id": "m1", "time": time, "x": 1})
+    assert fixed["time"] == expected and type(fixed["time"]) is int
+    assert fixed["x"] == 1
+
+
+@pytest.mark.parametrize("payload", [{"time": "yesterday"}, {"content": ["not", "text"]}, "not a dict"])
+def test_invalid_payload_raises(payload):
+    with pytest.raises(ValidationError):
+        validate_message(payload)
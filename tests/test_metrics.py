@@ -0,0 +1,24 @@
+import re
+
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.main import app
+
+
+def test_every_series_has_help_and_type():
+    text = metrics.render()
+    helped = set(re.findall(r"^# HELP (\S+) ", text, re.M))
+    typed = set(re.findall(r"^# TYPE (\S+) ", text, re.M))
+    assert typed and helped == typed
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name = re.match(r"[a-z_]+", line).group()
+            assert name in typed or re.sub(r"_(bucket|sum|count)$", "", name) in typed, line
+
+
+def test_requests_are_counted_by_route():
+    client = TestClient(app)
+    client.get("/health")
+    text = client.get("/metrics").text
+    assert re.search(r'trpg_http_requests_total\{[^}]*route="/health"[^}]*\} [1-9]', text)
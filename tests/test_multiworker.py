@@ -0,0 +1,14 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp", reason="python-socketio AsyncClient 的 WebSocket 传输依赖 aiohttp")
+
+from bench.multiworker_delivery import run  # noqa: E402
+
+
+def test_messages_are_ordered_with_gap_free_seqs_across_workers():
+    # 3 个 uvicorn 进程共享一个 Unix socket 总线，同频道的客户端分布在不同 worker 上并同时发消息；
+    # 第一轮之后再启动 1 个 worker，它分配到的 seq 须与其他 worker 一致
+    result = asyncio.run(run(workers=3, clients=9, messages=20, late_workers=1))
+    assert result["ok"], result["errors"]
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import passwords
+from app.main import app
+from app.passwords import HasherBusy, PasswordHasher, hash_password, verify_password_sync
+
+
+def test_hash_round_trip():
+    hashed = hash_password("123456", rounds=4)
+    assert verify_password_sync("123456", hashed)
+    assert not verify_password_sync("654321", hashed)
+    assert not verify_password_sync("123456", "not-a-hash")
+    # bcrypt 只使用前 72 字节
+    long_hash = hash_password("x" * 100, rounds=4)
+    assert verify_password_sync("x" * 72, long_hash)
+
+
+def _blocking(monkeypatch):
+    """让校验阻塞到 release 被设置，返回 release。"""
+    release = threading.Event()
+
+    def verify(password, hashed):
+        release.wait(5)
+        return True
+
+    monkeypatch.setattr(passwords, "verify_password_sync", verify)
+    return release
+
+
+def test_verify_runs_off_the_event_loop(monkeypatch):
+    release = _blocking(monkeypatch)
+
+    async def run():
+        hasher = PasswordHasher(workers=1)
+        task = asyncio.ensure_future(hasher.verify("pw", "$2b$hash"))
+        # 校验在工作线程中阻塞时事件循环仍能调度其他协程
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        release.set()
+        assert await task is True
+        # 用户不存在时仍做一次校验，但结果总是 False
+        assert await hasher.verify("pw", None) is False
+        assert hasher.stats()["completed"] == 2
+
+    asyncio.run(run())
+
+
+def test_full_queue_is_rejected(monkeypatch):
+    release = _blocking(monkeypatch)
+
+    async def run():
+        hasher = PasswordHasher(workers=1, max_queue=1, timeout=5)
+        first = asyncio.ensure_future(hasher.verify("pw", "$2b$hash"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HasherBusy):
+            await hasher.verify("pw", "$2b$hash")
+        release.set()
+        assert await first is True
+        assert hasher.stats()["rejected"] == 1
+
+    asyncio.run(run())
+
+
+def test_waiting_for_a_worker_times_out(monkeypatch):
+    release = _blocking(monkeypatch)
+
+    async def run():
+        hasher = PasswordHasher(workers=1, max_queue=4, timeout=0.05)
+        first = asyncio.ensure_future(hasher.verify("pw", "$2b$hash"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HasherBusy):
+            await hasher.verify("pw", "$2b$hash")
+        release.set()
+        assert await first is True
+        assert hasher.stats()["timeouts"] == 1
+        assert hasher.stats()["pending"] == 0
+
+    asyncio.run(run())
+
+
+def test_login_returns_503_when_hasher_is_busy(monkeypatch):
+    async def busy(password, hashed):
+        raise HasherBusy()
+
+    monkeypatch.setattr(passwords.password_hasher, "verify", busy)
+    resp = TestClient(app).post("/api/auth/login", json={"username": "admin", "password": "123456"})
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert resp.json()["ok"] is False
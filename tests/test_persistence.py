@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.persistence import MessagePersistence
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MessagePersistence(f"sqlite:///{tmp_path / 'trpg.db'}", batch_size=10, max_retries=1)
+    yield store
+    asyncio.run(store.close())
+
+
+def _enqueue(store, channel_id, seqs):
+    for seq in seqs:
+        store.enqueue(channel_id, seq, {"id": f"{channel_id}-{seq}", "content": str(seq)})
+
+
+def test_flush_round_trip(store):
+    _enqueue(store, "c", range(25))
+    asyncio.run(store.flush())
+    assert store.pending == 0 and store.written == 25
+    assert [m["id"] for m in store.fetch_range("c", 20, 30)] == [f"c-{s}" for s in range(20, 25)]
+    assert store.position("c", "c-7") == 7
+    [(channel_id, start, tail)] = list(store.load_tails(3))
+    assert (channel_id, start, [m["id"] for m in tail]) == ("c", 22, ["c-22", "c-23", "c-24"])
+
+
+def test_constraint_violation_writes_rows_individually(store):
+    _enqueue(store, "c", [0, 1])
+    asyncio.run(store.flush())
+    _enqueue(store, "c", [1, 2, 3])
+    asyncio.run(store.flush())
+    assert store.dropped == 1
+    assert [m["id"] for m in store.fetch_range("c", 0, 10)] == ["c-0", "c-1", "c-2", "c-3"]
+
+
+def test_failed_batch_is_retried_then_written_row_by_row(store, monkeypatch):
+    calls = []
+
+    def broken(batch):
+        calls.append(len(batch))
+        raise OSError("disk busy")
+
+    monkeypatch.setattr(store, "_write", broken)
+    _enqueue(store, "c", range(3))
+    # 第一次失败：整批放回队首，交给 _run 退避重试
+    with pytest.raises(OSError):
+        asyncio.run(store.flush())
+    assert store.pending == 3
+    # 超过 max_retries 后逐条写入，不再堵住队列
+    asyncio.run(store.flush())
+    assert calls == [3, 3]
+    assert store.pending == 0 and store.dropped == 0
+    assert len(store.fetch_range("c", 0, 10)) == 3
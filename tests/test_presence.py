@@ -0,0 +1,101 @@
+import asyncio
+
+from app.presence import PresenceTracker
+
+
+def _tracker(window=0.02, typing_ttl=6):
+    tracker = PresenceTracker(window=window, typing_ttl=typing_ttl)
+    sent = []
+
+    async def emit(diff, channel_id):
+        sent.append(diff)
+
+    tracker.bind(emit)
+    return tracker, sent
+
+
+async def _settle(tracker):
+    await asyncio.sleep(tracker.window + 0.02)
+
+
+def test_changes_within_a_window_coalesce_into_one_diff():
+    async def run():
+        tracker, sent = _tracker()
+        tracker.join("ch", "s1", "u:alice", "alice")
+        tracker.join("ch", "s2", "u:bob", "bob")
+        tracker.update("ch", "s1", typing=True)
+        tracker.update("ch", "s2", character="侦探")
+        await _settle(tracker)
+        assert len(sent) == 1
+        assert sent[0]["joined"] == [
+            {"id": "u:alice", "userName": "alice", "character": None, "typing": True},
+            {"id": "u:bob", "userName": "bob", "character": "侦探", "typing": False},
+        ]
+        assert sent[0]["updated"] == [] and sent[0]["left"] == []
+        assert tracker.stats() == {"channels": 1, "members": 2, "changes": 4, "broadcasts": 1}
+
+        tracker.update("ch", "s1", typing=False)
+        tracker.leave("ch", "s2")
+        await _settle(tracker)
+        assert sent[1]["updated"] == [{"id": "u:alice", "userName": "alice", "character": None, "typing": False}]
+        assert sent[1]["left"] == ["u:bob"]
+
+    asyncio.run(run())
+
+
+def test_reconnect_within_window_produces_no_event():
+    async def run():
+        tracker, sent = _tracker()
+        tracker.join("ch", "s1", "u:alice", "alice")
+        await _settle(tracker)
+        sent.clear()
+        tracker.disconnect("s1")
+        tracker.join("ch", "s2", "u:alice", "alice")
+        await _settle(tracker)
+        assert sent == []
+        assert [m["id"] for m in tracker.members("ch")] == ["u:alice"]
+
+    asyncio.run(run())
+
+
+def test_multiple_connections_are_one_member():
+    async def run():
+        tracker, sent = _tracker()
+        tracker.join("ch", "s1", "u:alice", "alice")
+        tracker.join("ch", "s2", "u:alice", "alice")
+        await _settle(tracker)
+        assert [m["id"] for m in sent[0]["joined"]] == ["u:alice"]
+        # 关掉其中一个连接不算离开
+        tracker.leave("ch", "s1")
+        await _settle(tracker)
+        assert len(sent) == 1
+        tracker.leave("ch", "s2")
+        await _settle(tracker)
+        assert sent[1]["left"] == ["u:alice"]
+        assert tracker.snapshot("ch") == {"channelId": "ch", "full": True, "members": []}
+
+    asyncio.run(run())
+
+
+def test_typing_expires_after_ttl():
+    async def run():
+        tracker, sent = _tracker(typing_ttl=0.05)
+        tracker.join("ch", "s1", "u:alice", "alice")
+        tracker.update("ch", "s1", typing=True)
+        await _settle(tracker)
+        assert sent[0]["joined"][0]["typing"] is True
+        await asyncio.sleep(0.1)
+        assert sent[1]["updated"][0]["typing"] is False
+
+    asyncio.run(run())
+
+
+def test_updates_from_unjoined_sid_are_ignored():
+    async def run():
+        tracker, sent = _tracker()
+        tracker.update("ch", "ghost", typing=True)
+        tracker.leave("ch", "ghost")
+        await _settle(tracker)
+        assert sent == [] and tracker.changes == 0
+
+    asyncio.run(run())
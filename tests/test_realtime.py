@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+from app.realtime import PING_TEXT, RoomConnectionManager, room_manager
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent = []
+        self.closed = None
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(text)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = code
+
+
+def test_idle_reaping_is_off_by_default():
+    assert room_manager.idle_timeout == 0
+
+
+def test_idle_connection_is_pinged_then_reaped():
+    async def run():
+        manager = RoomConnectionManager(idle_timeout=10, tick=1)
+        quiet, active = FakeWebSocket(), FakeWebSocket()
+        await manager.connect("room", quiet)
+        await manager.connect("room", active)
+        start = time.monotonic()
+        manager.check_idle(start + 6)
+        await asyncio.sleep(0.01)
+        assert quiet.sent == [PING_TEXT] and active.sent == [PING_TEXT]
+
+        # 回 pong（或任何消息）之后重新计时
+        manager.rooms["room"][active].last_active = start + 7
+        manager.rooms["room"][active].pinged = False
+        manager.check_idle(start + 11)
+        await asyncio.sleep(0.01)
+        assert quiet.closed == 1001
+        assert active.closed is None
+        assert list(manager.rooms["room"]) == [active]
+        assert manager.reaped == 1
+        manager.disconnect("room", active)
+
+    asyncio.run(run())
+
+
+def test_admission_limits_reject_with_1013():
+    async def run():
+        manager = RoomConnectionManager(max_per_room=1, max_connections=2)
+        sockets = [FakeWebSocket() for _ in range(4)]
+        results = [
+            await manager.connect("a", sockets[0]),
+            await manager.connect("a", sockets[1]),
+            await manager.connect("b", sockets[2]),
+            await manager.connect("c", sockets[3]),
+        ]
+        assert results == [True, False, True, False]
+        assert sockets[1].closed == 1013 and sockets[3].closed == 1013
+        assert manager.rejected == 2
+        manager.disconnect("a", sockets[0])
+        manager.disconnect("b", sockets[2])
+
+    asyncio.run(run())
+
+
+class StalledWebSocket(FakeWebSocket):
+    """send_text 一直等到 release 被设置，模拟慢客户端。"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def send_text(self, text: str) -> None:
+        await self.release.wait()
+        self.sent.append(text)
+
+
+def _fanout(policy):
+    async def run():
+        manager = RoomConnectionManager(queue_size=2, policy=policy)
+        slow, fast = StalledWebSocket(), FakeWebSocket()
+        await manager.connect("room", slow)
+        await manager.connect("room", fast)
+        for i in range(6):
+            await manager.broadcast("room", str(i))
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        queued = list(manager.rooms["room"][slow].queue) if slow in manager.rooms["room"] else None
+        slow.release.set()
+        await asyncio.sleep(0.01)
+        stats = manager.stats()
+        for websocket in (slow, fast):
+            manager.disconnect("room", websocket)
+        return slow, fast, queued, stats
+
+    return asyncio.run(run())
+
+
+def test_slow_consumer_does_not_stall_the_room():
+    slow, fast, queued, stats = _fanout("drop_oldest")
+    assert fast.sent == ["0", "1", "2", "3", "4", "5"]
+    # 第一条已在写协程中等待发送，其余只保留最新的 queue_size 条
+    assert queued == ["4", "5"]
+    assert slow.sent == ["0", "4", "5"]
+    assert stats["dropped"] == 3
+
+
+def test_coalesce_discards_backlog_when_full():
+    slow, fast, queued, stats = _fanout("coalesce")
+    assert fast.sent == ["0", "1", "2", "3", "4", "5"]
+    # 队列满时丢弃全部积压：1、2 在 3 入队时丢弃，3、4 在 5 入队时丢弃
+    assert queued == ["5"]
+    assert stats["dropped"] == 4
+
+
+def test_disconnect_policy_closes_slow_consumer():
+    slow, fast, queued, stats = _fanout("disconnect")
+    assert fast.sent == ["0", "1", "2", "3", "4", "5"]
+    assert queued is None
+    assert slow.closed == 1013
+    assert stats["slowDisconnects"] == 1
@@ -0,0 +1,57 @@
+import gzip
+import json
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.response_cache import ResponseCache
+
+
+def _request(**headers):
+    raw = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_builds_once_and_answers_if_none_match_with_304():
+    cache = ResponseCache()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"ok": True, "tags": ["恐怖"]}
+
+    first = cache.respond(_request(), "k", build)
+    assert json.loads(first.body) == {"ok": True, "tags": ["恐怖"]}
+    second = cache.respond(_request(if_none_match=first.headers["etag"]), "k", build)
+    assert second.status_code == 304 and second.headers["etag"] == first.headers["etag"]
+    assert len(calls) == 1
+
+
+def test_version_change_rebuilds():
+    cache = ResponseCache()
+    first = cache.respond(_request(), "k", lambda: {"v": 1}, version=1)
+    second = cache.respond(_request(if_none_match=first.headers["etag"]), "k", lambda: {"v": 2}, version=2)
+    assert second.status_code == 200 and json.loads(second.body) == {"v": 2}
+
+
+def test_large_bodies_are_gzipped_with_their_own_etag():
+    cache = ResponseCache(min_compress_size=16)
+    payload = {"items": ["调查员"] * 100}
+    plain = cache.respond(_request(), "k", lambda: payload)
+    zipped = cache.respond(_request(accept_encoding="gzip;q=1, br;q=0"), "k", lambda: payload)
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(zipped.body)) == payload
+    assert zipped.headers["etag"] != plain.headers["etag"]
+    again = cache.respond(_request(if_none_match=zipped.headers["etag"]), "k", lambda: payload)
+    assert again.status_code == 304
+
+
+def test_catalog_endpoint_returns_etag_and_304():
+    client = TestClient(app)
+    token = client.post("/api/auth/login", json={"username": "admin", "password": "123456"}).json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    first = client.get("/api/game-rooms/tags", headers=headers)
+    assert first.status_code == 200 and first.headers["etag"]
+    second = client.get("/api/game-rooms/tags", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
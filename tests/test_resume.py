@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+
+from app import socket_io
+from app.channel_store import append_message, get_messages_since, next_seq
+
+
+def _channel(count):
+    channel_id = f"resume-{uuid.uuid4().hex[:8]}"
+    for i in range(count):
+        append_message({"id": f"m{i}", "channelId": channel_id, "content": str(i), "userName": "kp"}, persist=False)
+    return channel_id
+
+
+def _seqs(messages):
+    return [m["seq"] for m in messages]
+
+
+def test_messages_carry_consecutive_seq():
+    channel_id = _channel(3)
+    msg = append_message({"id": "m3", "channelId": channel_id, "content": "3"}, persist=False)
+    assert msg["seq"] == 3
+    assert next_seq(channel_id) == 4
+
+
+def test_resume_returns_only_missed_messages():
+    channel_id = _channel(10)
+    messages, truncated = get_messages_since(channel_id, 6)
+    assert _seqs(messages) == [7, 8, 9] and not truncated
+    assert get_messages_since(channel_id, 9) == ([], False)
+    # 没有任何消息的客户端从头取
+    assert _seqs(get_messages_since(channel_id, -1)[0]) == list(range(10))
+
+
+def test_resume_beyond_limit_is_truncated():
+    channel_id = _channel(10)
+    messages, truncated = get_messages_since(channel_id, 1, limit=4)
+    assert _seqs(messages) == [6, 7, 8, 9] and truncated
+    messages, truncated = get_messages_since(channel_id, 1, limit=4, upto=8)
+    assert _seqs(messages) == [4, 5, 6, 7] and truncated
+
+
+def test_client_ahead_of_server_resumes_from_scratch():
+    channel_id = _channel(3)
+    messages, truncated = get_messages_since(channel_id, 42)
+    assert _seqs(messages) == [0, 1, 2] and not truncated
+
+
+def _join(monkeypatch, channel_id, last_seq):
+    sent = []
+
+    async def get_session(sid):
+        return {}
+
+    async def enter_room(sid, room):
+        pass
+
+    async def emit(event, data, **kwargs):
+        sent.append((event, data))
+
+    monkeypatch.setattr(socket_io.sio, "get_session", get_session)
+    monkeypatch.setattr(socket_io.sio, "enter_room", enter_room)
+    monkeypatch.setattr(socket_io.sio, "emit", emit)
+    sid = f"sid-{uuid.uuid4().hex[:8]}"
+    try:
+        asyncio.run(socket_io.join(sid, {"channelId": channel_id, "lastSeq": last_seq}))
+    finally:
+        socket_io.presence_tracker.disconnect(sid)
+        socket_io.channel_acl.forget(sid)
+    return {event: data for event, data in sent}
+
+
+def test_join_with_last_seq_sends_one_batch(monkeypatch):
+    channel_id = _channel(5)
+    batch = _join(monkeypatch, channel_id, 2)["messages"]
+    assert _seqs(batch["messages"]) == [3, 4]
+    assert (batch["lastSeq"], batch["truncated"], batch["reset"]) == (4, False, False)
+
+
+def test_join_ahead_of_server_flags_reset(monkeypatch):
+    channel_id = _channel(2)
+    batch = _join(monkeypatch, channel_id, 9)["messages"]
+    assert _seqs(batch["messages"]) == [0, 1]
+    assert batch["reset"] is True
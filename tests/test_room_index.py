@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from app.room_index import RoomIndex, room_matches
+
+MODULES = ["亡蝶葬仪", "克苏鲁的呼唤", "黄衣之王", "雪山疑案"]
+STATUSES = ["recruiting", "running", "ended"]
+
+
+def _room(rng, i):
+    return {
+        "id": f"r{i}",
+        "name": f"{rng.choice(['新人', '老手', '周末'])}团{i}",
+        "description": rng.choice(["欢迎新人", "长期团", ""]),
+        "owner": f"kp{i % 5}",
+        "module": rng.choice(MODULES),
+        "moduleIcon": "",
+        "status": rng.choice(STATUSES),
+    }
+
+
+def _pages(index, limit, **filters):
+    seen, after = [], -1
+    while True:
+        page, after = index.query(after=after, limit=limit, **filters)
+        seen.extend(room["id"] for room in page)
+        if after is None:
+            return seen
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = random.Random(7)
+    index = RoomIndex({})
+    for i in range(400):
+        index.add(_room(rng, i))
+    for i in rng.sample(range(400), 60):
+        index.update(f"r{i}", {"status": rng.choice(STATUSES), "currentPlayers": rng.randint(0, 5)})
+    for i in rng.sample(range(400), 20):
+        index.update(f"r{i}", {"name": f"改名团{i}", "module": rng.choice(MODULES)})
+    for i in rng.sample(range(400), 50):
+        index.remove(f"r{i}")
+    return index
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"statuses": {"recruiting"}},
+        {"statuses": {"recruiting", "ended"}},
+        {"module": "黄衣"},
+        {"module": "亡"},
+        {"keyword": "新人"},
+        {"keyword": "改名"},
+        {"keyword": "团1", "statuses": {"running"}, "module": "雪山"},
+        {"statuses": {"missing"}},
+        {"keyword": "不存在"},
+    ],
+)
+def test_filtered_pages_match_linear_scan(index, filters):
+    expected = [room_id for room_id, room in index.rooms.items() if room_matches(room, **filters)]
+    expected.sort(key=lambda room_id: index._seq_by_id[room_id])
+    assert index.query(**filters)[0] == [index.rooms[room_id] for room_id in expected]
+    for limit in (1, 7, 50):
+        assert _pages(index, limit, **filters) == expected
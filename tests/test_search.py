@@ -0,0 +1,36 @@
+from app.search import SearchIndex
+
+
+def _seqs(index, query):
+    hits, _ = index.search(query, 0)
+    return sorted(seq for _, seq in hits)
+
+
+def test_single_cjk_character_matches_longer_runs():
+    index = SearchIndex()
+    index.add(0, "桌上有一把钥匙")
+    index.add(1, "钥")
+    index.add(2, "门锁着")
+    assert _seqs(index, "钥") == [0, 1]
+    assert _seqs(index, "钥匙") == [0]
+    assert _seqs(index, "锁") == [2]
+    assert _seqs(index, "钥 门") == []
+
+
+def test_single_character_expansion_follows_prune():
+    index = SearchIndex()
+    index.add(0, "钥匙")
+    index.add(1, "开门")
+    index.prune(1)
+    assert _seqs(index, "钥") == []
+    assert _seqs(index, "门") == [1]
+
+
+def test_single_character_counts_each_message_once():
+    index = SearchIndex()
+    index.add(0, "钥匙，另一把钥匙")
+    index.add(1, "匙")
+    hits, truncated = index.search("匙", 0)
+    assert sorted(seq for _, seq in hits) == [0, 1]
+    assert not truncated
+    assert list(index._postings["匙"]) == [0, 1]
@@ -0,0 +1,71 @@
+from app import channel_store, metrics
+from app.history import ChannelHistory
+from app.routes_characters import _characters_by_user
+
+
+def test_render_leaves_pending_entries_undecoded():
+    decoded = []
+
+    def loader(kind):
+        def load():
+            decoded.append(kind)
+            return ChannelHistory(10) if kind == "history" else {}
+
+        return load
+
+    channel_store._messages_by_channel.defer("lazy-channel", loader("history"))
+    _characters_by_user.defer("lazy-user", loader("characters"))
+    try:
+        text = metrics.render()
+        assert decoded == []
+        assert "lazy-channel" in channel_store._messages_by_channel.pending()
+        assert "lazy-user" in _characters_by_user.pending()
+        assert 'trpg_snapshot_pending_entries{kind="history"} 1' in text
+        assert 'trpg_snapshot_pending_entries{kind="characters"} 1' in text
+        assert "lazy-channel" not in channel_store.get_history_stats()
+    finally:
+        channel_store._messages_by_channel.pop("lazy-channel", None)
+        _characters_by_user.pop("lazy-user", None)
+
+
+def test_write_and_lazy_restore_round_trip(tmp_path):
+    from app import snapshot
+    from app.routes_characters import _versions
+    from app.routes_game_rooms import _index, _rooms
+
+    path = str(tmp_path / "state.snap")
+    for i in range(600):
+        channel_store.append_message({"id": f"snap-{i}", "channelId": "snap-channel", "content": f"第{i}条"})
+    _characters_by_user["snap-user"] = {"c1": {"id": "c1", "name": "调查员", "hpCurrent": 9}}
+    _versions["c1"] = 4
+    _index.add({"id": "snap-room", "name": "快照团", "status": "recruiting"})
+    try:
+        assert snapshot.write_snapshot(path) > 0
+        expected = channel_store._messages_by_channel["snap-channel"].slice(0, 1000)
+        channel_store._messages_by_channel.pop("snap-channel")
+        _characters_by_user.pop("snap-user")
+        _versions.pop("c1")
+        _index.remove("snap-room")
+
+        assert snapshot.restore_snapshot(path, lazy=True)
+        assert "snap-room" in _rooms
+        # 历史与角色卡在第一次访问时才解码
+        assert "snap-channel" in channel_store._messages_by_channel.pending()
+        assert "snap-user" in _characters_by_user.pending()
+        assert channel_store._messages_by_channel["snap-channel"].slice(0, 1000) == expected
+        assert _characters_by_user["snap-user"]["c1"]["hpCurrent"] == 9
+        assert _versions["c1"] == 4
+    finally:
+        channel_store._messages_by_channel.pop("snap-channel", None)
+        _characters_by_user.pop("snap-user", None)
+        _versions.pop("c1", None)
+        _index.remove("snap-room")
+
+
+def test_unreadable_snapshot_starts_empty(tmp_path):
+    from app import snapshot
+
+    path = tmp_path / "broken.snap"
+    path.write_bytes(b"not a snapshot")
+    assert snapshot.restore_snapshot(str(path)) is False
+    assert snapshot.restore_snapshot(str(tmp_path / "missing.snap")) is False